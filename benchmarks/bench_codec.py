@@ -0,0 +1,102 @@
+"""
+Benchmark del coste de CPU de (de)serializar las peticiones de predicción.
+
+Compara, por petición, el camino anterior (validación pydantic del
+cuerpo + serialización del response_model con jsonable_encoder y
+JSONResponse) con el códec de src/api/codec.py, en JSON y, para el
+lote, en filas binarias float32. No incluye la inferencia.
+
+Uso:
+    python -m benchmarks.bench_codec [--iterations 20000] [--batch-size 256]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.api import codec
+from src.api.models import (
+    FEATURE_NAMES,
+    PredictionInput,
+    PredictionOutput,
+    BatchPredictionInput,
+    BatchPredictionOutput,
+)
+
+
+def _cpu_us(fn, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def run(iterations, batch_size):
+    rng = np.random.default_rng(0)
+    row = dict(zip(FEATURE_NAMES, rng.normal(size=len(FEATURE_NAMES)).tolist()))
+    single_body = json.dumps(row).encode()
+
+    matrix = rng.normal(size=(batch_size, len(FEATURE_NAMES)))
+    batch_body = json.dumps({"transactions": [dict(zip(FEATURE_NAMES, r)) for r in matrix.tolist()]}).encode()
+    binary_body = matrix.astype(codec.BINARY_DTYPE).tobytes()
+    predictions = (rng.random(batch_size) > 0.5).astype(np.int64)
+    probabilities = rng.random(batch_size)
+
+    def single_pydantic():
+        data = PredictionInput(**json.loads(single_body))
+        features = np.array([[getattr(data, name) for name in FEATURE_NAMES]])
+        output = PredictionOutput(prediction=int(features[0, 0] > 0), probability=0.25, model_version="abc")
+        JSONResponse(content=jsonable_encoder(output, exclude_none=True))
+
+    def single_codec():
+        features = codec.decode_prediction(single_body)
+        codec.encode_prediction(int(features[0, 0] > 0), 0.25, "abc")
+
+    def batch_pydantic():
+        data = BatchPredictionInput(**json.loads(batch_body))
+        np.array([[getattr(t, name) for name in FEATURE_NAMES] for t in data.transactions], dtype=np.float64)
+        output = BatchPredictionOutput(
+            predictions=[
+                PredictionOutput(prediction=int(p), probability=float(q))
+                for p, q in zip(predictions.tolist(), probabilities.tolist())
+            ],
+            count=batch_size,
+            model_version="abc",
+        )
+        JSONResponse(content=jsonable_encoder(output, exclude_none=True))
+
+    def batch_codec_json():
+        codec.decode_batch(batch_body, "application/json")
+        codec.encode_batch(predictions, probabilities, "abc")
+
+    def batch_codec_binary():
+        codec.decode_batch(binary_body, codec.BINARY_MEDIA_TYPE)
+        codec.encode_batch(predictions, probabilities, "abc")
+
+    batch_iterations = max(1, iterations // batch_size * 10)
+    return [
+        ("predict_pydantic", _cpu_us(single_pydantic, iterations), len(single_body)),
+        ("predict_codec", _cpu_us(single_codec, iterations), len(single_body)),
+        ("batch_pydantic", _cpu_us(batch_pydantic, batch_iterations), len(batch_body)),
+        ("batch_codec_json", _cpu_us(batch_codec_json, batch_iterations), len(batch_body)),
+        ("batch_codec_f32", _cpu_us(batch_codec_binary, batch_iterations), len(binary_body)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    print(f"orjson: {'sí' if codec.orjson is not None else 'no'}; lote de {args.batch_size} filas")
+    print(f"{'escenario':<20}{'CPU µs/petición':>17}{'bytes cuerpo':>14}")
+    for name, cpu_us, body_bytes in run(args.iterations, args.batch_size):
+        print(f"{name:<20}{cpu_us:>17.1f}{body_bytes:>14}")
+
+
+if __name__ == "__main__":
+    main()
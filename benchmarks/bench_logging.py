@@ -0,0 +1,114 @@
+"""
+Benchmark del coste del logging en el camino caliente de /predict.
+
+Reproduce los mensajes que se emiten por petición (muestra de drift,
+array de features, resultado). Cada escenario configura el logging con
+setup_logging, igual que la app (RawQueueHandler + QueueListener cuando
+es asíncrono), y escribe en un archivo temporal:
+
+- sync_eager: handler síncrono y f-strings (comportamiento anterior)
+- async_eager: mismos mensajes y nivel que sync_eager, con la cola
+- sync_lazy: handler síncrono + formato diferido, sin muestreo
+- async_lazy: mismos mensajes y nivel que sync_lazy, con la cola
+- async_info: igual, pero con nivel INFO (los mensajes DEBUG no se formatean)
+- async_sampled: cola + formato diferido, muestreo 1%
+
+La columna "vs sync" compara cada escenario asíncrono con el síncrono que
+emite los mismos mensajes al mismo nivel.
+
+Uso:
+    python -m benchmarks.bench_logging [--requests 20000]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from src.utils.logging_utils import SampledLogger, setup_logging, shutdown_logging
+
+HOT_EVENTS = ("drift_sample", "drift_add_sample", "predict_features", "predict_done")
+
+
+def _request_eager(logger, sample, features, n):
+    logger.info(f"Muestra registrada: {sample}")
+    logger.info(f"Total de muestras acumuladas: {n}")
+    logger.info(f"✓ Muestra registrada para monitoreo. Total acumulado: {n}")
+    logger.info(f"Procesando predicción con features: {features}")
+    logger.info(f"✓ Predicción completada: {0}, prob: {0.0123}")
+
+
+def _request_lazy(hot_log, sample, features, n):
+    hot_log.debug("drift_add_sample", "Muestra registrada: %s. Total acumulado: %d", sample, n)
+    hot_log.info("drift_sample", "✓ Muestra registrada para monitoreo. Total acumulado: %d", n)
+    hot_log.debug("predict_features", "Procesando predicción con features: %s", features)
+    hot_log.info("predict_done", "✓ Predicción completada: %s, prob: %s", 0, 0.0123)
+
+
+def run(n_requests):
+    rng = np.random.default_rng(0)
+    rows = rng.normal(size=(n_requests, 5))
+    names = ["V14", "V10", "V4", "V12", "V1"]
+    logger = logging.getLogger("bench.hot_path")
+
+    # (nombre, cola, tasa de muestreo o None para f-strings, nivel, escenario síncrono equivalente)
+    scenarios = [
+        ("sync_eager", False, None, "DEBUG", None),
+        ("async_eager", True, None, "DEBUG", "sync_eager"),
+        ("sync_lazy", False, 1.0, "DEBUG", None),
+        ("async_lazy", True, 1.0, "DEBUG", "sync_lazy"),
+        ("async_info", True, 1.0, "INFO", None),
+        ("async_sampled", True, 0.01, "DEBUG", None),
+    ]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, use_queue, rate, level, pair in scenarios:
+            log_path = os.path.join(tmp, f"{name}.log")
+            with open(log_path, "w") as log_file:
+                setup_logging(level=level, async_logging=use_queue, stream=log_file, force=True)
+                hot_log = SampledLogger(logger, rates={e: rate for e in HOT_EVENTS}) if rate is not None else None
+
+                latencies = np.empty(n_requests)
+                for i in range(n_requests):
+                    features = rows[i:i + 1]
+                    sample = dict(zip(names, features[0].tolist()))
+                    start = time.perf_counter()
+                    if hot_log is None:
+                        _request_eager(logger, sample, features, i)
+                    else:
+                        _request_lazy(hot_log, sample, features, i)
+                    latencies[i] = time.perf_counter() - start
+
+                # Vacía la cola antes de medir el archivo
+                shutdown_logging()
+
+            latencies *= 1e6
+            results[name] = {
+                "mean_us": latencies.mean(),
+                "p50_us": np.percentile(latencies, 50),
+                "p99_us": np.percentile(latencies, 99),
+                "log_bytes": os.path.getsize(log_path),
+                "pair": pair,
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    results = run(args.requests)
+    baseline = results["sync_eager"]["mean_us"]
+    print(f"{'escenario':<15}{'media µs':>10}{'p50 µs':>10}{'p99 µs':>10}{'log KB':>10}"
+          f"{'speedup':>9}{'vs sync':>9}")
+    for name, r in results.items():
+        pair = f"{results[r['pair']]['mean_us'] / r['mean_us']:>8.1f}x" if r["pair"] else f"{'-':>9}"
+        print(f"{name:<15}{r['mean_us']:>10.2f}{r['p50_us']:>10.2f}{r['p99_us']:>10.2f}"
+              f"{r['log_bytes'] / 1024:>10.0f}{baseline / r['mean_us']:>8.1f}x{pair}")
+
+if __name__ == "__main__":
+    main()
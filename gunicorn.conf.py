@@ -0,0 +1,21 @@
+# gunicorn.conf.py - gunicorn lo carga automáticamente desde el directorio de trabajo
+import os
+
+from src.utils.logging_utils import setup_logging
+from src.utils.memory_report import process_memory
+
+# Logging de la app configurado en el master antes de importarla (también con
+# preload_app); los workers heredan los handlers y reinician la cola tras el fork
+setup_logging()
+
+# Con MODEL_LOAD_MODE=preload la app (y el modelo) se importan una vez en el
+# master y los workers comparten esas páginas tras el fork
+preload_app = os.getenv("MODEL_LOAD_MODE", "lazy").lower() == "preload"
+
+
+def when_ready(server):
+    server.log.info(f"Master listo. Memoria: {process_memory()}")
+
+
+def post_worker_init(worker):
+    worker.log.info(f"Worker {worker.pid} inicializado. Memoria: {process_memory()}")
@@ -1,48 +1,174 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+import asyncio
+import functools
+import gc
+import time
 import mlflow
 import numpy as np
 import logging
-from src.api.models import PredictionInput, PredictionOutput
-import json
+from src.api.models import (
+    PredictionOutput,
+    BatchPredictionOutput,
+    ModelSwapRequest,
+    PredictionInput,
+    BatchPredictionInput,
+    FEATURE_NAMES,
+    openapi_request_body,
+)
+import re
 from datetime import datetime
+from typing import Optional
 import os
 import requests
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+from src.monitoring.capture_policy import CapturePolicy
 from src.monitoring.drift_detector import DriftDetector
+from src.monitoring.drift_aggregator import DriftAggregator
+from src.monitoring.drift_queue import DriftIngestQueue
+from src.monitoring.drift_scheduler import DriftScheduler
+from src.monitoring.time_buckets import parse_duration, parse_windows
+from src.monitoring.history_store import DriftHistoryStore, make_cursor, parse_cursor
 import traceback
 import joblib
 from src.monitoring.drift_visualizer import DriftVisualizer
-from fastapi.responses import HTMLResponse
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+from src.monitoring.dashboard_cache import DashboardCache, etag_matches, make_etag
+from src.models.serving_model import ServingModel, file_version
+from src.models.shared_model import load_mmap_forest
+from src.utils.memory_report import process_memory, log_memory_report
+from src.utils.model_downloader import download_model, is_valid_file, read_manifest
+from src.api.inference_pool import InferencePool, PoolSaturatedError
+from src.api.micro_batcher import MicroBatcher
+from src.api.prediction_cache import PredictionCache
+from src.api.codec import (
+    BINARY_MEDIA_TYPE, FastJSONResponse, parse_prediction, decode_batch, encode_prediction, encode_batch,
+    encode_ndjson_line,
+)
+from src.monitoring.metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from src.utils.logging_utils import SampledLogger, setup_logging
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 logger = logging.getLogger(__name__)
+# Mensajes del camino caliente: diferidos y muestreados por evento (LOG_SAMPLE_RATES)
+hot_log = SampledLogger.from_env(logger)
 
 # Variables globales
-model = None
+# current_model es una instantánea inmutable (ServingModel); se reemplaza entera
+current_model = None
 drift_detector = None
-def load_model():
-    global model
+drift_scheduler = None
+drift_queue = None
+# Gráficas del dashboard de drift renderizadas, por versión del historial
+dashboard_cache = DashboardCache()
+# Tabla de salida del modelo, regenerada como mucho cada DRIFT_DASHBOARD_OUTPUT_REFRESH segundos
+output_table_cache = DashboardCache("Tabla de salida del modelo")
+
+# Usar el evaluador compilado del bosque en lugar de scikit-learn
+FAST_INFERENCE = os.getenv("FAST_INFERENCE", "true").lower() in ("1", "true", "yes")
+
+# Modo de carga del modelo:
+#   lazy    - cada worker carga el pickle en la primera petición (comportamiento original)
+#   preload - se carga al importar la app; con gunicorn preload_app los workers
+#             heredan el modelo del master y comparten sus páginas (copy-on-write)
+#   mmap    - el bosque compilado se guarda en MODEL_MMAP_DIR y cada worker lo
+#             mapea en memoria, compartiendo el page cache del sistema
+MODEL_LOAD_MODE = os.getenv("MODEL_LOAD_MODE", "lazy").lower()
+
+# Tamaño máximo de lote aceptado por /predict/batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+
+# Pool acotado para inferencia y carga del modelo fuera del event loop
+inference_pool = InferencePool.from_env()
+MODEL_LOAD_TIMEOUT = float(os.getenv("MODEL_LOAD_TIMEOUT", "120"))
+_model_lock = None
+
+# Caché opcional de resultados para transacciones reintentadas
+PREDICTION_CACHE_ENABLED = os.getenv("PREDICTION_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+prediction_cache = PredictionCache.from_env() if PREDICTION_CACHE_ENABLED else None
+
+# Estado del último reemplazo de modelo en caliente
+swap_status = {"state": "idle"}
+_swap_task = None
+
+# Métricas de la ruta de servicio, exportadas en /metrics
+STAGE_LATENCY = REGISTRY.histogram(
+    "fraud_api_stage_duration_seconds",
+    "Duración de cada etapa del procesamiento de una predicción",
+    ("endpoint", "stage")
+)
+REQUEST_LATENCY = REGISTRY.histogram(
+    "fraud_api_request_duration_seconds",
+    "Duración total de las peticiones de predicción",
+    ("endpoint",)
+)
+REQUEST_ERRORS = REGISTRY.counter(
+    "fraud_api_request_errors_total",
+    "Peticiones de predicción terminadas con error, por código HTTP",
+    ("endpoint", "status")
+)
+MODEL_UNAVAILABLE = REGISTRY.counter(
+    "fraud_api_model_unavailable_total",
+    "Respuestas 503 porque el modelo no está cargado",
+    ("endpoint",)
+)
+MODEL_LOAD_SECONDS = REGISTRY.gauge(
+    "fraud_api_model_load_duration_seconds",
+    "Duración de la última carga de modelo (descarga, deserialización y prueba)"
+)
+DRIFT_CHECK_SECONDS = REGISTRY.histogram(
+    "fraud_api_drift_check_duration_seconds",
+    "Duración de las verificaciones de drift en segundo plano"
+)
+
+# Verificación de drift en segundo plano (si no, add_sample verifica cada 50 muestras)
+DRIFT_SCHEDULER_ENABLED = os.getenv("DRIFT_SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Con varios workers, sumar los histogramas de todos vía archivos en DRIFT_SHARED_DIR
+# (requiere el planificador: es quien publica y elige el worker que verifica)
+DRIFT_AGGREGATE_WORKERS = os.getenv("DRIFT_AGGREGATE_WORKERS", "true").lower() in ("1", "true", "yes")
+# Puntos máximos por gráfica del dashboard de drift (los historiales largos se reducen)
+DRIFT_DASHBOARD_MAX_POINTS = int(os.getenv("DRIFT_DASHBOARD_MAX_POINTS", "500"))
+# Segundos durante los que se reutiliza la tabla de salida del modelo del dashboard
+DRIFT_DASHBOARD_OUTPUT_REFRESH = float(os.getenv("DRIFT_DASHBOARD_OUTPUT_REFRESH", "10"))
+# Filas máximas por página de /api/drift/history
+DRIFT_HISTORY_PAGE_SIZE = int(os.getenv("DRIFT_HISTORY_PAGE_SIZE", "1000"))
+# Encolar las muestras de drift y registrarlas por lotes desde una tarea de fondo
+DRIFT_QUEUE_ENABLED = os.getenv("DRIFT_QUEUE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+def get_default_model_path():
+    """Ruta del modelo configurada por MODEL_PATH / MODEL_DIR."""
+    model_dir = os.getenv("MODEL_DIR", "/app/models")
+    return os.getenv("MODEL_PATH", os.path.join(model_dir, "model.pkl"))
+
+
+def load_model(model_path=None, model_url=None, sha256=None):
     try:
         logger.info("=== INICIO PROCESO DE CARGA DEL MODELO ===")
-                 
-        # Verificar primero en la ubicación específica para desarrollo local
-        local_path = r"D:\Proyectos Personales ML\Fraud detection\mlartifacts\426660670654388389\fa4a6618c80747fdab8e573b58f17030\artifacts\random_forest_model\model.pkl"
-        if os.path.exists(local_path):
-            logger.info(f"Encontrado modelo en ruta local de desarrollo: {local_path}")
-            model = joblib.load(local_path)
-            return model
+        
+        if model_path is None and model_url is None:
+            # Verificar primero en la ubicación específica para desarrollo local
+            local_path = r"D:\Proyectos Personales ML\Fraud detection\mlartifacts\426660670654388389\fa4a6618c80747fdab8e573b58f17030\artifacts\random_forest_model\model.pkl"
+            if os.path.exists(local_path):
+                logger.info(f"Encontrado modelo en ruta local de desarrollo: {local_path}")
+                return joblib.load(local_path)
             
+        # Checksum esperado: el indicado, o el manifiesto configurado para el modelo por defecto
+        if sha256 is not None:
+            expected = {"sha256": sha256.lower(), "size": None}
+        elif model_url is None:
+            expected = read_manifest()
+        else:
+            expected = {"sha256": None, "size": None}
+        
         # Rutas y URLs del modelo
-        model_dir = os.getenv("MODEL_DIR", "/app/models")
-        model_path = os.getenv("MODEL_PATH", os.path.join(model_dir, "model.pkl"))
-        model_url = os.getenv("MODEL_URL", None)
+        model_path = model_path or get_default_model_path()
+        model_url = model_url or os.getenv("MODEL_URL", None)
         
         # Crear directorio para el modelo si no existe
         os.makedirs(os.path.dirname(model_path), exist_ok=True)
         
         # MODIFICADO: Verificar primero si el modelo existe localmente
-        if os.path.exists(model_path):
+        if os.path.exists(model_path) and not is_valid_file(model_path, expected["sha256"], expected["size"]):
+            logger.warning("⚠ El modelo local no coincide con el checksum esperado, se descargará de nuevo")
+        elif os.path.exists(model_path):
             file_size = os.path.getsize(model_path)
             logger.info(f"✓ Modelo encontrado localmente ({file_size} bytes)")
             
@@ -65,22 +191,28 @@ def load_model():
             try:
                 logger.info(f"Intentando descargar modelo desde: {model_url}")
                 
-                # Configurar timeout para evitar bloqueos
-                response = requests.get(model_url, timeout=60)
-                
-                if response.status_code == 200:
-                    with open(model_path, 'wb') as f:
-                        f.write(response.content)
-                    logger.info(f"✓ Modelo descargado exitosamente a: {model_path}")
-                else:
-                    logger.error(f"✗ Error al descargar modelo. Código: {response.status_code}")
-                    logger.error(f"Respuesta: {response.text[:200]}...")
+                # Descarga por bloques con reanudación, verificación y caché por contenido
+                cache_dir = os.getenv("MODEL_CACHE_DIR", os.path.join(os.path.dirname(model_path), ".cache"))
+                download_model(
+                    model_url,
+                    model_path,
+                    sha256=expected["sha256"],
+                    size=expected["size"],
+                    cache_dir=cache_dir,
+                    timeout=60
+                )
+                logger.info(f"✓ Modelo descargado exitosamente a: {model_path}")
             except Exception as e:
                 logger.error(f"✗ Error en la descarga del modelo: {str(e)}")
                 # Continuar con la carga local si falla la descarga
         else:
             logger.info("No se proporcionó MODEL_URL, intentando carga local")
         
+        # Nunca deserializar un archivo que no coincide con el checksum esperado
+        if os.path.exists(model_path) and not is_valid_file(model_path, expected["sha256"], expected["size"]):
+            logger.error(f"✗ El archivo {model_path} no coincide con el checksum esperado; no se carga")
+            return None
+        
         # Verificar existencia del archivo (ya sea cargado localmente o descargado)
         if os.path.exists(model_path):
             file_size = os.path.getsize(model_path)
@@ -110,10 +242,338 @@ def load_model():
         logger.error("Traceback completo:", exc_info=True)
         return None
 
+def load_serving_model(model_path=None, model_url=None, version=None, sha256=None):
+    """
+    Carga el modelo según MODEL_LOAD_MODE y lo valida con una predicción de prueba.
+    
+    Args:
+        model_path: Ruta del pickle (por defecto, la configurada)
+        model_url: URL de descarga si el archivo no existe
+        version: Versión explícita (por defecto, MODEL_VERSION o el hash del archivo)
+        sha256: Checksum esperado del pickle (por defecto, el del manifiesto)
+        
+    Returns:
+        ServingModel listo para servir, o None si la carga o la prueba fallan
+    """
+    load_start = time.perf_counter()
+    default_path = get_default_model_path()
+    model_path = model_path or default_path
+    loaded_model = None
+    
+    if MODEL_LOAD_MODE == "mmap":
+        if model_path == default_path and os.getenv("MODEL_MMAP_DIR"):
+            mmap_dir = os.getenv("MODEL_MMAP_DIR")
+        else:
+            mmap_dir = os.path.splitext(model_path)[0] + "_flat"
+        
+        loaded_model = load_mmap_forest(model_path, mmap_dir, loader=lambda: load_model(model_path, model_url, sha256))
+        if loaded_model is None:
+            logger.warning("⚠ Modo mmap no disponible, se carga el pickle completo")
+    
+    if loaded_model is None:
+        loaded_model = load_model(model_path, model_url, sha256)
+    if loaded_model is None:
+        return None
+    
+    if version is None and model_path == default_path:
+        version = os.getenv("MODEL_VERSION")
+    version = version or file_version(model_path) or datetime.now().strftime("%Y%m%d%H%M%S")
+    
+    try:
+        serving = ServingModel.build(loaded_model, version, source=model_path, compile_model=FAST_INFERENCE)
+        serving.smoke_test(len(FEATURE_NAMES))
+        MODEL_LOAD_SECONDS.set(time.perf_counter() - load_start)
+        logger.info(f"✓ Modelo versión {version} verificado con predicción de prueba")
+        return serving
+    except Exception as e:
+        logger.error(f"✗ El modelo versión {version} no superó la predicción de prueba: {str(e)}")
+        return None
+
+
+def set_model(serving):
+    """
+    Publica un modelo en servicio reemplazando la referencia global.
+    
+    La asignación es atómica: las peticiones en curso conservan la instantánea
+    que tomaron al empezar y terminan con la versión anterior.
+    
+    Args:
+        serving: ServingModel ya validado o None
+    """
+    global current_model
+    previous = current_model
+    current_model = serving
+    if serving is not None and previous is not None and previous.version != serving.version:
+        logger.info(f"✓ Modelo reemplazado: {previous.version} -> {serving.version}")
+        # Las claves ya incluyen la versión; vaciar libera la memoria de la anterior
+        if prediction_cache is not None:
+            prediction_cache.clear()
+
+
+def predict_matrix(serving, features, endpoint="predict"):
+    """
+    Ejecuta una única pasada de inferencia sobre una matriz de features.
+
+    Args:
+        serving: ServingModel a usar
+        features: Matriz contigua (n_muestras x n_features) de tipo float
+        endpoint: Etiqueta de la métrica de la etapa "predict"
+
+    Returns:
+        Tupla (predicciones, probabilidades de la clase positiva)
+    """
+    with STAGE_LATENCY.labels(endpoint, "predict").time():
+        return serving.predict_matrix(features)
+
+
+async def ensure_model():
+    """
+    Devuelve el modelo, cargándolo en el pool si aún no está disponible.
+    
+    La carga (descarga + joblib.load + compilación) se ejecuta una sola vez
+    aunque lleguen varias peticiones concurrentes, y nunca en el event loop.
+    
+    Returns:
+        El ServingModel vigente o None si no se pudo cargar
+    """
+    global _model_lock
+    if current_model is not None:
+        return current_model
+    
+    if _model_lock is None:
+        _model_lock = asyncio.Lock()
+    
+    async with _model_lock:
+        if current_model is None:
+            logger.info("Modelo no cargado, intentando cargar bajo demanda")
+            try:
+                await inference_pool.run(lambda: set_model(load_serving_model()), timeout=MODEL_LOAD_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.error(f"✗ La carga del modelo excedió {MODEL_LOAD_TIMEOUT}s")
+            except PoolSaturatedError as e:
+                logger.error(f"✗ No se pudo encolar la carga del modelo: {str(e)}")
+    return current_model
+
+
+async def run_inference(serving, features, endpoint="predict"):
+    """
+    Ejecuta predict_matrix en el pool, traduciendo saturación y timeouts a HTTP.
+    
+    Args:
+        serving: ServingModel a usar
+        features: Matriz de features
+        endpoint: Etiqueta para las métricas de latencia
+        
+    Returns:
+        Tupla (predicciones, probabilidades)
+    """
+    try:
+        return await inference_pool.run(predict_matrix, serving, features, endpoint)
+    except PoolSaturatedError as e:
+        logger.warning(f"⚠ Petición rechazada: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor saturado - Reintente más tarde",
+            headers={"Retry-After": "1"}
+        )
+    except asyncio.TimeoutError:
+        logger.error(f"✗ La inferencia excedió {inference_pool.timeout}s")
+        raise HTTPException(
+            status_code=504,
+            detail="Tiempo de inferencia agotado"
+        )
+
+
+async def infer_current_model(features):
+    """Inferencia con el modelo vigente; usada por el micro-batcher."""
+    serving = await ensure_model()
+    predictions, probabilities = await run_inference(serving, features, endpoint="micro_batch")
+    return predictions, probabilities, serving.version
+
+
+async def swap_model(model_path=None, model_url=None, version=None, sha256=None):
+    """
+    Carga, valida y publica un modelo nuevo en segundo plano.
+    
+    El modelo vigente sigue sirviendo mientras se carga el candidato; solo
+    si supera la predicción de prueba se reemplaza la referencia global.
+    
+    Args:
+        model_path: Ruta del nuevo pickle
+        model_url: URL de descarga del nuevo pickle
+        version: Versión explícita del candidato
+        sha256: Checksum esperado del nuevo pickle
+    """
+    global swap_status
+    try:
+        candidate = await inference_pool.run(
+            load_serving_model, model_path, model_url, version, sha256,
+            timeout=MODEL_LOAD_TIMEOUT
+        )
+        if candidate is None:
+            raise ValueError("No se pudo cargar o validar el modelo candidato")
+        
+        previous_version = current_model.version if current_model is not None else None
+        set_model(candidate)
+        swap_status = {
+            **swap_status,
+            "state": "completed",
+            "previous_version": previous_version,
+            "version": candidate.version,
+            "finished_at": datetime.now().isoformat(),
+        }
+    except Exception as e:
+        logger.error(f"✗ Error en el reemplazo del modelo: {str(e)}")
+        swap_status = {
+            **swap_status,
+            "state": "failed",
+            "error": str(e),
+            "finished_at": datetime.now().isoformat(),
+        }
+
+
+def start_model_swap(model_path=None, model_url=None, version=None, sha256=None):
+    """
+    Lanza swap_model como tarea de fondo si no hay otro reemplazo en curso.
+    
+    Args:
+        model_path: Ruta del nuevo pickle
+        model_url: URL de descarga del nuevo pickle
+        version: Versión explícita del candidato
+        sha256: Checksum esperado del nuevo pickle
+        
+    Returns:
+        True si se lanzó la tarea, False si ya había uno en curso
+    """
+    global _swap_task, swap_status
+    if _swap_task is not None and not _swap_task.done():
+        return False
+    
+    swap_status = {
+        "state": "loading",
+        "model_path": model_path,
+        "model_url": model_url,
+        "requested_version": version,
+        "started_at": datetime.now().isoformat(),
+    }
+    _swap_task = asyncio.get_running_loop().create_task(swap_model(model_path, model_url, version, sha256))
+    return True
+
+
+# Agrupación dinámica de peticiones individuales concurrentes
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "true").lower() in ("1", "true", "yes")
+micro_batcher = MicroBatcher.from_env(infer_current_model) if MICROBATCH_ENABLED else None
+
+# Métricas que se leen de otros componentes en el momento de exportar
+REGISTRY.callback(
+    "fraud_api_model_info", "Versión del modelo en servicio", "gauge",
+    lambda: {(current_model.version,): 1} if current_model is not None else None,
+    ("version",)
+)
+REGISTRY.callback(
+    "fraud_api_drift_samples", "Muestras acumuladas en el detector de drift", "gauge",
+    lambda: len(drift_detector.samples) if drift_detector is not None else None
+)
+REGISTRY.callback(
+    "fraud_api_drift_capture_total", "Peticiones vistas y capturadas por la política de captura de drift", "counter",
+    lambda: {("seen",): drift_detector.capture.seen, ("captured",): drift_detector.capture.captured}
+    if drift_detector is not None else None,
+    ("result",)
+)
+REGISTRY.callback(
+    "fraud_api_drift_queue_pending", "Entradas en la cola de muestras de drift pendientes de registrar", "gauge",
+    lambda: len(drift_queue) if drift_queue is not None else None
+)
+REGISTRY.callback(
+    "fraud_api_drift_queue_rows_total", "Filas de la cola de muestras de drift por resultado", "counter",
+    lambda: {(key,): drift_queue.stats_counters[key] for key in ("enqueued", "ingested", "dropped")}
+    if drift_queue is not None else None,
+    ("result",)
+)
+REGISTRY.callback(
+    "fraud_api_drift_dashboard_renders_total", "Peticiones del dashboard de drift servidas desde caché o renderizadas", "counter",
+    lambda: {("hit",): dashboard_cache.hits, ("miss",): dashboard_cache.misses},
+    ("result",)
+)
+REGISTRY.callback(
+    "fraud_api_drift_check_lag_seconds", "Segundos desde la última verificación de drift completada", "gauge",
+    lambda: drift_scheduler.lag_seconds() if drift_scheduler is not None else None
+)
+REGISTRY.callback(
+    "fraud_api_drift_check_lag_samples", "Muestras recibidas desde la última verificación de drift", "gauge",
+    lambda: drift_scheduler.lag_samples() if drift_scheduler is not None else None
+)
+REGISTRY.callback(
+    "fraud_api_drift_checks_total", "Verificaciones de drift en segundo plano por resultado", "counter",
+    lambda: {(key,): value for key, value in drift_scheduler.stats_counters.items()} if drift_scheduler is not None else None,
+    ("result",)
+)
+REGISTRY.callback(
+    "fraud_api_inference_pending", "Tareas en ejecución o en cola en el pool de inferencia", "gauge",
+    lambda: inference_pool.stats()["pending"]
+)
+REGISTRY.callback(
+    "fraud_api_inference_tasks_total", "Tareas del pool de inferencia por resultado", "counter",
+    lambda: {(key,): value for key, value in inference_pool.stats_counters.items()},
+    ("result",)
+)
+REGISTRY.callback(
+    "fraud_api_micro_batches_total", "Lotes ejecutados por el micro-batcher", "counter",
+    lambda: micro_batcher.stats()["batches"] if micro_batcher is not None else None
+)
+REGISTRY.callback(
+    "fraud_api_prediction_cache_total", "Consultas a la caché de predicciones por resultado", "counter",
+    lambda: {
+        ("hit",): prediction_cache.stats_counters["hits"],
+        ("miss",): prediction_cache.stats_counters["misses"],
+    } if prediction_cache is not None else None,
+    ("result",)
+)
+
+PREDICT_STAGES = {
+    stage: STAGE_LATENCY.labels("predict", stage)
+    for stage in ("validation", "feature_assembly", "drift_add_sample", "output_monitor", "serialization")
+}
+BATCH_STAGES = {
+    stage: STAGE_LATENCY.labels("predict_batch", stage)
+    for stage in ("validation", "drift_add_sample", "output_monitor", "serialization")
+}
+
+
+def track_request(endpoint):
+    """
+    Decorador que mide la duración total de un endpoint y cuenta sus errores por código.
+    
+    Args:
+        endpoint: Etiqueta del endpoint en las métricas
+    """
+    latency = REQUEST_LATENCY.labels(endpoint)
+    
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await handler(*args, **kwargs)
+            except HTTPException as e:
+                REQUEST_ERRORS.labels(endpoint, e.status_code).inc()
+                raise
+            except Exception:
+                REQUEST_ERRORS.labels(endpoint, 500).inc()
+                raise
+            finally:
+                latency.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Configurar logging (LOG_LEVEL, LOG_FORMAT=text|json, LOG_ASYNC); con
+    # gunicorn ya lo hizo gunicorn.conf.py y la llamada no cambia nada
+    setup_logging()
     logger.info("=== INICIANDO APLICACIÓN ===")
-    global model, drift_detector
+    global drift_detector, drift_scheduler, drift_queue
     
     try:
         # Inicializar el detector de drift
@@ -123,13 +583,55 @@ async def lifespan(app: FastAPI):
         if os.path.exists(reference_path):
             logger.info(f"✓ Archivo de referencia encontrado")
             
-            # Configurar ruta para el historial de drift
+            # Configurar ruta para el historial de drift (SQLite; el JSON anterior se migra)
             dir_path = os.path.dirname(reference_path)
             history_path = os.path.join(dir_path, "drift_history.json")
+            history_store = DriftHistoryStore.from_env(
+                os.getenv("DRIFT_HISTORY_DB", os.path.join(dir_path, "drift_history.db")),
+                legacy_json_path=history_path
+            )
+            
+            aggregator = None
+            if DRIFT_SCHEDULER_ENABLED and DRIFT_AGGREGATE_WORKERS:
+                aggregator = DriftAggregator.from_env(os.path.join(dir_path, "drift_workers"))
             
-            # Inicializar el detector con la ruta para el historial
-            drift_detector = DriftDetector(reference_path, history_path=history_path)
+            # Inicializar el detector con el historial y una ventana acotada
+            window_size = int(os.getenv("DRIFT_WINDOW_SIZE", "10000"))
+            drift_detector = DriftDetector(
+                reference_path,
+                history_path=history_path,
+                history_store=history_store,
+                window_size=window_size,
+                auto_check=not DRIFT_SCHEDULER_ENABLED,
+                aggregator=aggregator,
+                windows=parse_windows(os.getenv("DRIFT_WINDOWS", "15m,1h,24h")),
+                bucket_seconds=float(os.getenv("DRIFT_BUCKET_SECONDS", "60")),
+                decay_half_life=parse_duration(os.getenv("DRIFT_DECAY_HALF_LIFE", "1h")),
+                sketch_k=int(os.getenv("DRIFT_SKETCH_K", "128")),
+                sketch_block_seconds=float(os.getenv("DRIFT_SKETCH_BLOCK_SECONDS", "300")),
+                reference_sketch_path=os.getenv(
+                    "REFERENCE_SKETCH_PATH", os.path.join(dir_path, "reference_sketches.json")
+                ),
+                output_reference_path=os.getenv(
+                    "OUTPUT_REFERENCE_PATH", os.path.join(dir_path, "output_reference.json")
+                ),
+                capture_policy=CapturePolicy.from_env(window_size)
+            )
             logger.info(f"✓ Detector de drift inicializado correctamente")
+            
+            if DRIFT_SCHEDULER_ENABLED:
+                drift_scheduler = DriftScheduler.from_env(
+                    drift_detector, duration_metric=DRIFT_CHECK_SECONDS, aggregator=aggregator
+                )
+                drift_scheduler.start()
+            
+            if DRIFT_QUEUE_ENABLED:
+                # Mismo hilo que las verificaciones: la ventana no se escribe mientras se verifica
+                drift_queue = DriftIngestQueue.from_env(
+                    drift_detector, FEATURE_NAMES,
+                    executor=drift_scheduler.executor if drift_scheduler is not None else None
+                )
+                drift_queue.start()
         else:
             logger.error(f"✗ Archivo de referencia NO encontrado en {reference_path}")
             # Imprimir los archivos en el directorio para debugging
@@ -140,12 +642,26 @@ async def lifespan(app: FastAPI):
         logger.error(f"Error al inicializar detector de drift: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
     
+    # En modo mmap el modelo se mapea al arrancar para que el reporte de memoria sea representativo
+    if MODEL_LOAD_MODE == "mmap":
+        await ensure_model()
+    if MODEL_LOAD_MODE in ("preload", "mmap"):
+        log_memory_report(f"startup {MODEL_LOAD_MODE}")
+    
     yield
     
     # Mostrar estadísticas al cerrar
     if drift_detector:
         logger.info(f"Muestras acumuladas al cerrar: {len(drift_detector.samples) if hasattr(drift_detector, 'samples') else 'N/A'}")
     
+    # Registrar lo pendiente antes de la última verificación del planificador
+    if drift_queue is not None:
+        await drift_queue.stop()
+    if drift_scheduler is not None:
+        await drift_scheduler.stop()
+    if micro_batcher is not None:
+        await micro_batcher.stop()
+    inference_pool.shutdown()
     logger.info("=== CERRANDO APLICACIÓN ===")
 
 
@@ -169,13 +685,18 @@ async def health_check():
             "status": "healthy",  # Siempre devolver healthy
             "timestamp": datetime.now().isoformat(),
             "model_status": {
-                "is_loaded": model is not None,
+                "is_loaded": current_model is not None,
+                "version": current_model.version if current_model is not None else None,
+                "loaded_at": current_model.loaded_at if current_model is not None else None,
                 "model_path": model_path,
                 "model_url": model_url,
                 "model_exists": model_exists,
                 "model_file_size": model_size,
             },
-            "environment": os.getenv("ENVIRONMENT", "production")
+            "environment": os.getenv("ENVIRONMENT", "production"),
+            "model_load_mode": MODEL_LOAD_MODE,
+            "memory": process_memory(),
+            "inference_pool": inference_pool.stats()
         }
         
         return status_info  # Siempre devuelve 200
@@ -183,6 +704,34 @@ async def health_check():
         logger.error(f"Error en health check: {str(e)}")
         return {"status": "error", "error": str(e)}  # Aún devuelve 200
 
+@app.get("/monitoring/inference")
+async def inference_stats():
+    """
+    Endpoint con métricas del pool de inferencia, del micro-batcher y de la caché.
+    
+    Returns:
+        Contadores de tareas, rechazos, timeouts, tiempos de espera en cola,
+        histograma de tamaños de lote y tasa de aciertos de la caché
+    """
+    stats = inference_pool.stats()
+    if micro_batcher is not None:
+        stats["micro_batching"] = micro_batcher.stats()
+    if prediction_cache is not None:
+        stats["prediction_cache"] = prediction_cache.stats()
+    return stats
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Métricas del proceso en formato de texto de Prometheus.
+    
+    Incluye histogramas de latencia por etapa (validation, feature_assembly,
+    drift_add_sample, predict, serialization), contadores de errores y de
+    503 por modelo no cargado, y gauges de carga del modelo y de drift.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/monitoring/drift")
 async def check_drift():
     try:
@@ -226,7 +775,15 @@ async def check_drift():
             }
         
         # Usar el método de la clase si existe
-        drift_result = drift_detector.check_drift()
+        # Incluir las muestras todavía en cola
+        if drift_queue is not None:
+            await drift_queue.flush_async()
+        # La verificación escribe el historial: se ejecuta fuera del event loop
+        drift_result = await asyncio.get_running_loop().run_in_executor(drift_executor(), drift_detector.check_drift)
+        if drift_scheduler is not None:
+            drift_result["scheduler"] = drift_scheduler.stats()
+        if drift_queue is not None:
+            drift_result["queue"] = drift_queue.stats()
         
         if drift_result["status"] == "drift_detected":
             logger.warning(f"¡ALERTA! Data drift detectado: {drift_result}")
@@ -247,18 +804,79 @@ async def check_drift():
 def read_root():
     return {"message": "Fraud Detection API"}
 
-@app.post("/predict", response_model=PredictionOutput)
-async def predict(input_data: PredictionInput):
-    global model, drift_detector
+def drift_executor():
+    """
+    Hilo donde se escriben las muestras de drift y se verifica.
+
+    El del planificador o, sin él, el de la cola; así una verificación bajo
+    demanda no se ejecuta a la vez que un vaciado de la cola. None (executor
+    por defecto) si no hay ninguno.
+    """
+    if drift_scheduler is not None and drift_scheduler.executor is not None:
+        return drift_scheduler.executor
+    if drift_queue is not None:
+        return drift_queue.executor
+    return None
+
+def capture_drift_sample(row, prediction=None):
+    """
+    Registra una fila en el detector de drift si la política de captura la acepta.
+
+    La decisión se toma antes de tocar la fila, así que una petición
+    descartada solo cuesta un número aleatorio. Con la cola activa, la fila
+    aceptada solo se encola; la tarea de fondo la registra por lotes.
+    """
+    try:
+        with PREDICT_STAGES["drift_add_sample"].time():
+            weight = drift_detector.capture.decide(prediction)
+            if not weight:
+                return
+            if drift_queue is not None:
+                drift_queue.put(row, weight)
+                return
+            # Convertir a diccionario para evitar incompatibilidades de tipo
+            drift_detector.add_sample(dict(zip(FEATURE_NAMES, row.tolist())), weight=weight)
+        hot_log.info("drift_sample", "✓ Muestra registrada para monitoreo. Total acumulado: %d", len(drift_detector.samples))
+    except Exception as drift_error:
+        logger.error(f"✗ Error al registrar muestra para monitoreo: {str(drift_error)}")
+
+def capture_drift_batch(features, predictions=None):
+    """Registra un lote en el detector de drift; la política de captura filtra las filas."""
+    try:
+        with BATCH_STAGES["drift_add_sample"].time():
+            if drift_queue is None:
+                drift_detector.add_samples(features, FEATURE_NAMES, predictions)
+                return
+            weights = drift_detector.capture.decide_many(len(features), predictions)
+            captured = weights > 0
+            drift_queue.put_many(features[captured], weights[captured])
+    except Exception as drift_error:
+        logger.error(f"✗ Error al registrar lote para monitoreo: {str(drift_error)}")
+
+@app.post(
+    "/predict",
+    response_class=FastJSONResponse,
+    responses={200: {"model": PredictionOutput}},
+    openapi_extra={"requestBody": openapi_request_body(PredictionInput)},
+)
+@track_request("predict")
+async def predict(request: Request):
+    global drift_detector
+    
+    # Decodificación rápida del esquema PredictionInput (422 si no lo cumple)
+    body = await request.body()
+    with PREDICT_STAGES["validation"].time():
+        row = parse_prediction(body)
+    with PREDICT_STAGES["feature_assembly"].time():
+        features = np.array([row], dtype=np.float64)
+    
+    # Cargar el modelo bajo demanda si no está cargado (fuera del event loop)
+    serving = await ensure_model()
     
-    # Cargar el modelo bajo demanda si no está cargado
-    if model is None:
-        logger.info("Modelo no cargado, intentando cargar bajo demanda")
-        model = load_model()
-        
     # Verificar si se pudo cargar el modelo
-    if model is None:
+    if serving is None:
         logger.error("Estado del modelo: No inicializado")
+        MODEL_UNAVAILABLE.labels("predict").inc()
         raise HTTPException(
             status_code=503,
             detail="Modelo no disponible - Error en la inicialización"
@@ -266,44 +884,52 @@ async def predict(input_data: PredictionInput):
     
     try:
         # Registrar datos para monitoreo de drift ANTES de la predicción
-        # (esto nos permite capturar datos incluso si la predicción falla)
+        # (esto nos permite capturar datos incluso si la predicción falla);
+        # la captura estratificada por clase espera a tener la predicción
         if drift_detector:
-            # Convertir a diccionario para evitar incompatibilidades de tipo
-            sample_data = {
-                "V14": float(input_data.V14),
-                "V10": float(input_data.V10),
-                "V4": float(input_data.V4),
-                "V12": float(input_data.V12),
-                "V1": float(input_data.V1)
-            }
-            
-            try:
-                drift_detector.add_sample(sample_data)
-                logger.info(f"✓ Muestra registrada para monitoreo. Total acumulado: {len(drift_detector.samples)}")
-            except Exception as drift_error:
-                logger.error(f"✗ Error al registrar muestra para monitoreo: {str(drift_error)}")
+            if not drift_detector.capture.needs_prediction:
+                capture_drift_sample(features[0])
         else:
             logger.warning("⚠ Detector de drift no inicializado. No se registró la muestra.")
         
         # Ahora procesamos la predicción
-        features = np.array([[
-            input_data.V14,
-            input_data.V10,
-            input_data.V4,
-            input_data.V12,
-            input_data.V1
-        ]])
-        logger.info(f"Procesando predicción con features: {features}")
-        
-        prediction = model.predict(features)[0]
-        probability = model.predict_proba(features)[0][1]
-        
-        logger.info(f"✓ Predicción completada: {prediction}, prob: {probability}")
-        
-        return PredictionOutput(
-            prediction=int(prediction),
-            probability=float(probability)
-        )
+        hot_log.debug("predict_features", "Procesando predicción con features: %s", features)
+        
+        cache_key = None
+        cached = None
+        if prediction_cache is not None:
+            cache_key = prediction_cache.make_key(features[0], serving.version)
+            cached = prediction_cache.get(cache_key)
+        
+        if cached is not None:
+            # Reintento de una transacción ya evaluada por esta versión del modelo
+            prediction, probability, model_version = cached
+        elif micro_batcher is not None:
+            # Se agrupa con otras peticiones concurrentes en una sola inferencia
+            prediction, probability, model_version = await micro_batcher.submit(features[0])
+        else:
+            predictions, probabilities = await run_inference(serving, features)
+            prediction = predictions[0]
+            probability = probabilities[0]
+            model_version = serving.version
+        
+        # Solo se guarda si lo calculó la versión de la clave (pudo haber un reemplazo)
+        if cache_key is not None and cached is None and model_version == serving.version:
+            prediction_cache.put(cache_key, (prediction, probability, model_version))
+        
+        hot_log.info("predict_done", "✓ Predicción completada: %s, prob: %s", prediction, probability)
+        
+        # Distribución de salida y tasa de fraude, con las mismas ventanas que el drift de entrada
+        if drift_detector:
+            with PREDICT_STAGES["output_monitor"].time():
+                drift_detector.add_predictions(prediction, probability)
+            if drift_detector.capture.needs_prediction:
+                capture_drift_sample(features[0], prediction)
+        
+        with PREDICT_STAGES["serialization"].time():
+            return encode_prediction(prediction, probability, model_version)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"✗ Error en predicción: {str(e)}")
         raise HTTPException(
@@ -311,6 +937,73 @@ async def predict(input_data: PredictionInput):
             detail=f"Error en predicción: {str(e)}"
         )
 
+@app.post(
+    "/predict/batch",
+    response_class=FastJSONResponse,
+    responses={200: {"model": BatchPredictionOutput}},
+    openapi_extra={"requestBody": openapi_request_body(
+        BatchPredictionInput,
+        {BINARY_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}}},
+    )},
+)
+@track_request("predict_batch")
+async def predict_batch(request: Request):
+    global drift_detector
+
+    # JSON con el esquema BatchPredictionInput o filas binarias float32 (application/x-float32-rows)
+    body = await request.body()
+    with BATCH_STAGES["validation"].time():
+        features = decode_batch(body, request.headers.get("content-type"))
+
+    # Cargar el modelo bajo demanda si no está cargado (fuera del event loop)
+    serving = await ensure_model()
+
+    if serving is None:
+        logger.error("Estado del modelo: No inicializado")
+        MODEL_UNAVAILABLE.labels("predict_batch").inc()
+        raise HTTPException(
+            status_code=503,
+            detail="Modelo no disponible - Error en la inicialización"
+        )
+
+    n_transactions = len(features)
+    if n_transactions == 0:
+        return encode_batch([], [], serving.version)
+
+    if n_transactions > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El lote excede el máximo permitido de {MAX_BATCH_SIZE} transacciones"
+        )
+
+    try:
+        # Registrar el lote completo para monitoreo de drift en una sola llamada
+        if drift_detector:
+            if not drift_detector.capture.needs_prediction:
+                capture_drift_batch(features)
+        else:
+            logger.warning("⚠ Detector de drift no inicializado. No se registró el lote.")
+
+        predictions, probabilities = await run_inference(serving, features, endpoint="predict_batch")
+        hot_log.info("batch_done", "✓ Lote de %d predicciones completado", n_transactions)
+
+        if drift_detector:
+            with BATCH_STAGES["output_monitor"].time():
+                drift_detector.add_predictions(predictions, probabilities)
+            if drift_detector.capture.needs_prediction:
+                capture_drift_batch(features, predictions)
+
+        with BATCH_STAGES["serialization"].time():
+            return encode_batch(predictions, probabilities, serving.version)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"✗ Error en predicción por lote: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error en predicción por lote: {str(e)}"
+        )
+
 @app.get("/debug")
 async def debug_info():
     return {
@@ -326,7 +1019,8 @@ async def debug_info():
             "models_directory_contents": os.listdir("/app/models") if os.path.exists("/app/models") else []
         },
         "model_status": {
-            "is_loaded": model is not None,
+            "is_loaded": current_model is not None,
+            "version": current_model.version if current_model is not None else None,
             "can_access_url": check_url_access(os.getenv("MODEL_URL", ""))
         }
     }
@@ -351,28 +1045,112 @@ def check_url_access(url):
 
 
 @app.post("/load-model")
-async def load_model_endpoint():
-    global model
+async def load_model_endpoint(force: bool = False):
+    """
+    Carga el modelo configurado.
+    
+    Args:
+        force: Si ya hay un modelo cargado, lo recarga desde la configuración
+            actual en segundo plano y lo reemplaza en caliente
+    """
     try:
-        if model is not None:
-            return {"status": "success", "message": "Modelo ya está cargado"}
+        if current_model is not None:
+            if not force:
+                return {"status": "success", "message": "Modelo ya está cargado", "version": current_model.version}
+            if not start_model_swap():
+                return {"status": "error", "message": "Ya hay un reemplazo de modelo en curso", "swap": swap_status}
+            return {"status": "accepted", "message": "Recarga del modelo iniciada", "version": current_model.version}
             
-        loaded_model = load_model()
-        if loaded_model is not None:
-            model = loaded_model
-            return {"status": "success", "message": "Modelo cargado exitosamente"}
+        serving = await ensure_model()
+        if serving is not None:
+            return {"status": "success", "message": "Modelo cargado exitosamente", "version": serving.version}
         else:
             return {"status": "error", "message": "No se pudo cargar el modelo"}
     except Exception as e:
         logger.error(f"Error cargando modelo: {str(e)}")
         return {"status": "error", "message": f"Error: {str(e)}"}
+
+
+# Versiones que pueden formar parte de un nombre de archivo en MODEL_DIR
+SAFE_VERSION_PATTERN = re.compile(r"^[A-Za-z0-9._-]+$")
+
+
+@app.post("/models/swap", status_code=202)
+async def swap_model_endpoint(swap_request: ModelSwapRequest):
+    """
+    Reemplaza el modelo en caliente sin cortar el servicio.
+    
+    El candidato se carga y valida en segundo plano; el modelo vigente sigue
+    atendiendo hasta que el candidato supera la predicción de prueba.
+    
+    Returns:
+        Estado del reemplazo (consultable en /models/current)
+    """
+    model_dir = os.path.realpath(os.getenv("MODEL_DIR", "/app/models"))
+    model_path = swap_request.model_path
+    
+    if swap_request.model_url is not None:
+        allowed_prefixes = [p for p in os.getenv("MODEL_SWAP_URL_PREFIXES", "").split(",") if p]
+        if not any(swap_request.model_url.startswith(prefix) for prefix in allowed_prefixes):
+            raise HTTPException(status_code=400, detail="model_url no permitida (ver MODEL_SWAP_URL_PREFIXES)")
+        if model_path is None:
+            # Descargar a un archivo propio para no pisar el modelo vigente
+            suffix = swap_request.version or datetime.now().strftime("%Y%m%d%H%M%S")
+            if not SAFE_VERSION_PATTERN.match(suffix):
+                raise HTTPException(status_code=400, detail="version solo admite letras, dígitos, '.', '_' y '-'")
+            model_path = os.path.join(model_dir, f"model-{suffix}.pkl")
+    
+    if model_path is not None:
+        # Solo archivos dentro de MODEL_DIR: joblib.load puede ejecutar código arbitrario
+        model_path = os.path.realpath(model_path)
+        if os.path.commonpath([model_dir, model_path]) != model_dir:
+            raise HTTPException(status_code=400, detail=f"model_path debe estar dentro de {model_dir}")
+    
+    if not start_model_swap(model_path, swap_request.model_url, swap_request.version, swap_request.sha256):
+        raise HTTPException(status_code=409, detail="Ya hay un reemplazo de modelo en curso")
+    
+    return {"status": "accepted", "swap": swap_status}
+
+
+@app.get("/models/current")
+async def current_model_info():
+    """
+    Endpoint con la versión del modelo en servicio y el estado del último reemplazo.
+    """
+    return {
+        "model": current_model.describe() if current_model is not None else None,
+        "swap": swap_status
+    }
     
 
+def render_drift_plots(history_store, reference_path):
+    """
+    Renderiza las gráficas del dashboard de drift a partir del historial.
+    
+    Returns:
+        Tupla (HTML de las gráficas, instante de la última verificación)
+    """
+    visualizer = DriftVisualizer(
+        history_path=history_store.path,
+        history_store=history_store,
+        reference_path=reference_path,
+        max_points=DRIFT_DASHBOARD_MAX_POINTS
+    )
+    timestamps = visualizer.history.get("timestamps", [])
+    last_check = datetime.fromisoformat(timestamps[-1]).strftime('%Y-%m-%d %H:%M:%S') if timestamps else "—"
+    return visualizer.generate_drift_dashboard(), last_check
+
 @app.get("/monitoring/drift-dashboard", response_class=HTMLResponse)
-async def get_drift_dashboard():
+async def get_drift_dashboard(request: Request):
     """
     Endpoint para visualizar el dashboard de drift.
     
+    Las gráficas se renderizan una vez por versión del historial y de la
+    referencia, y la página (y su ETag) solo depende de esa versión: si el
+    cliente ya la tiene se responde 304 sin tocar la caché. La tabla de
+    salida del modelo, que cambia con cada predicción, la carga la página
+    desde /monitoring/drift-dashboard/output.
+    
     Returns:
         Una página HTML con el dashboard de visualización de drift.
     """
@@ -388,9 +1166,11 @@ async def get_drift_dashboard():
             </html>
             """
         
-        # Obtener la ruta del historial de drift
-        history_path = getattr(drift_detector, 'history_path', None)
-        if not history_path or not os.path.exists(history_path):
+        # Versión del historial: cambia con cada verificación y con cada compactación
+        loop = asyncio.get_running_loop()
+        history_store = getattr(drift_detector, 'history_store', None)
+        version = await loop.run_in_executor(None, history_store.version) if history_store is not None else (0, 0)
+        if version[1] == 0:
             return """
             <html>
                 <body>
@@ -400,14 +1180,23 @@ async def get_drift_dashboard():
             </html>
             """
         
-        # Inicializar el visualizador de drift
-        visualizer = DriftVisualizer(
-            history_path=history_path,
-            reference_path=drift_detector.reference_stats_path if hasattr(drift_detector, 'reference_stats_path') else None
+        reference_path = drift_detector.reference_stats_path if hasattr(drift_detector, 'reference_stats_path') else None
+        # La referencia puede reemplazarse al reentrenar: su mtime también forma parte de la versión
+        reference_mtime = os.stat(reference_path).st_mtime_ns if reference_path and os.path.exists(reference_path) else None
+        cache_key = (version, reference_mtime)
+        
+        etag = make_etag(cache_key)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        
+        # Gráficas desde la caché; solo se renderizan (fuera del event loop) si cambió la versión
+        plots_html, last_check = await loop.run_in_executor(
+            None, dashboard_cache.get, cache_key, functools.partial(render_drift_plots, history_store, reference_path)
         )
         
-        # Generar el dashboard
-        dashboard_html = visualizer.generate_drift_dashboard()
+        # La tabla de salida del modelo se carga aparte para no invalidar la página
+        dashboard_html = '<div id="output-report"></div>' + plots_html
         
         # Crear una plantilla HTML básica
         html_content = f"""
@@ -453,16 +1242,21 @@ async def get_drift_dashboard():
                 </div>
                 
                 <div class="mt-4">
-                    <p>Última actualización: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+                    <p>Última verificación: {last_check}</p>
                 </div>
             </div>
             
             <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0-alpha1/dist/js/bootstrap.bundle.min.js"></script>
+            <script>
+                fetch("/monitoring/drift-dashboard/output")
+                    .then(response => response.ok ? response.text() : "")
+                    .then(html => {{ document.getElementById("output-report").innerHTML = html; }});
+            </script>
         </body>
         </html>
         """
         
-        return html_content
+        return HTMLResponse(html_content, headers=headers)
     except Exception as e:
         logger.error(f"Error al generar dashboard de drift: {str(e)}")
         return f"""
@@ -475,29 +1269,179 @@ async def get_drift_dashboard():
         </html>
         """
 
+def render_output_table():
+    """Tabla HTML de la salida del modelo por ventana ("" si no hay datos)."""
+    output_report = drift_detector.output_report()
+    return DriftVisualizer.generate_output_html(output_report) if output_report else ""
+
+@app.get("/monitoring/drift-dashboard/output", response_class=HTMLResponse)
+async def get_drift_dashboard_output(request: Request):
+    """
+    Fragmento HTML con la tabla de salida del modelo del dashboard de drift.
+    
+    La salida cambia con cada predicción, así que no se versiona por el
+    historial: el fragmento se regenera como mucho una vez cada
+    DRIFT_DASHBOARD_OUTPUT_REFRESH segundos y su ETag es el de ese
+    intervalo, con 304 si el cliente ya lo tiene.
+    
+    Returns:
+        HTML de la tarjeta de salida del modelo
+    """
+    if not drift_detector or not hasattr(drift_detector, "output_report"):
+        return HTMLResponse("")
+    
+    refresh = max(DRIFT_DASHBOARD_OUTPUT_REFRESH, 0.001)
+    cache_key = int(time.time() // refresh)
+    etag = make_etag("output", cache_key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    try:
+        output_html = await asyncio.get_running_loop().run_in_executor(
+            None, output_table_cache.get, cache_key, render_output_table
+        )
+    except Exception as e:
+        logger.error(f"Error al generar la tabla de salida del modelo: {str(e)}")
+        raise HTTPException(status_code=500, detail="No se pudo generar la tabla de salida del modelo")
+    return HTMLResponse(output_html, headers=headers)
+
+def parse_instant(value, name):
+    """
+    Interpreta un parámetro de instante: ISO 8601 o segundos epoch.
+    
+    Raises:
+        HTTPException: 400 si el valor no es válido
+    """
+    if value is None:
+        return None
+    try:
+        return datetime.fromtimestamp(float(value))
+    except (ValueError, OverflowError, OSError):
+        # No numérico, o fuera del rango de fechas (inf, 1e20...)
+        pass
+    try:
+        instant = datetime.fromisoformat(value)
+        # Las consultas filtran en segundos epoch: fechas extremas como 0001-01-01 no se pueden convertir
+        instant.timestamp()
+        return instant
+    except (ValueError, OverflowError, OSError):
+        raise HTTPException(status_code=400, detail=f"Parámetro '{name}' inválido: se espera ISO 8601 o segundos epoch")
+
+def history_rows(rows):
+    """Filas de DriftHistoryStore.query para la API: sin la columna interna ts."""
+    return [{key: value for key, value in row.items() if key != "ts"} for row in rows]
+
+def stream_history_ndjson(history_store, query):
+    """Genera el historial como NDJSON página a página (el iterador corre en el threadpool)."""
+    for row in history_store.iter_query(**query):
+        row.pop("ts")
+        yield encode_ndjson_line(row)
+
 @app.get("/api/drift/history")
-async def get_drift_history():
+async def get_drift_history(
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = None,
+    features: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    format: Optional[str] = None
+):
     """
-    Endpoint para obtener el historial de drift en formato JSON.
+    Endpoint para obtener el historial de drift.
+    
+    Sin parámetros devuelve el historial completo en el formato de
+    drift_history.json. Con filtros lee solo el rango pedido usando el
+    índice por tiempo:
+    
+    - from / to: instantes ISO 8601 o epoch (incluidos)
+    - features: features separadas por comas
+    - limit / cursor: página JSON {"items", "next_cursor"}; el cursor de la
+      respuesta continúa tras la última fila
+    - format: legacy, json (página) o ndjson (todas las filas en streaming,
+      el modo por defecto con filtros y sin limit ni cursor)
     
     Returns:
-        Historial completo de métricas de drift
+        Historial de métricas de drift
     """
+    if not drift_detector or not hasattr(drift_detector, 'history_store'):
+        return {"error": "Detector de drift no inicializado correctamente"}
+    history_store = drift_detector.history_store
+    
+    filtered = any(value is not None for value in (from_, to, features, limit, cursor))
+    if format is None:
+        format = ("json" if limit is not None or cursor is not None else "ndjson") if filtered else "legacy"
+    if format not in ("legacy", "json", "ndjson"):
+        raise HTTPException(status_code=400, detail="Parámetro 'format' inválido: legacy, json o ndjson")
+    
+    query = {
+        "start": parse_instant(from_, "from"),
+        "end": parse_instant(to, "to"),
+        "features": [f.strip() for f in features.split(",") if f.strip()] if features else None,
+    }
+    if cursor is not None:
+        try:
+            query["after"] = parse_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Parámetro 'cursor' inválido")
+    
     try:
-        if not drift_detector or not hasattr(drift_detector, 'history_path'):
-            return {"error": "Detector de drift no inicializado correctamente"}
-        
-        if not os.path.exists(drift_detector.history_path):
-            return {"error": "Archivo de historial no encontrado", "path": drift_detector.history_path}
+        loop = asyncio.get_running_loop()
+        if format == "ndjson":
+            # Sin materializar el resultado: se leen y envían páginas de filas
+            return StreamingResponse(
+                stream_history_ndjson(history_store, {**query, "limit": limit}),
+                media_type="application/x-ndjson"
+            )
+        if format == "legacy":
+            # Lectura del almacén SQLite fuera del event loop
+            query.pop("after", None)
+            return await loop.run_in_executor(
+                None, functools.partial(history_store.load_history, limit=limit, **query)
+            )
         
-        with open(drift_detector.history_path, 'r') as f:
-            history = json.load(f)
-        
-        return history
+        page_size = min(limit or DRIFT_HISTORY_PAGE_SIZE, DRIFT_HISTORY_PAGE_SIZE)
+        rows = await loop.run_in_executor(None, functools.partial(history_store.query, limit=page_size, **query))
+        next_cursor = make_cursor(rows[-1]) if len(rows) == page_size else None
+        return FastJSONResponse(content={"items": history_rows(rows), "next_cursor": next_cursor})
     except Exception as e:
         logger.error(f"Error al obtener historial de drift: {str(e)}")
         return {"error": str(e)}
 
+def summarize_features(features):
+    """
+    Clasifica el PSI de cada feature en stable, warning o critical.
+    
+    Args:
+        features: Diccionario {feature: {"psi", "drifting"}} de check_drift
+        
+    Returns:
+        Tupla (estado general, {feature: {"psi", "status", "drifting"}})
+    """
+    features_status = {}
+    for feature, data in features.items():
+        psi = data.get("psi", 0)
+        status = "stable"
+        if psi >= 0.2:
+            status = "critical"
+        elif psi >= 0.1:
+            status = "warning"
+        
+        features_status[feature] = {
+            "psi": psi,
+            "status": status,
+            "drifting": data.get("drifting", False)
+        }
+    
+    # Determinar estado general
+    overall_status = "stable"
+    if any(f["status"] == "critical" for f in features_status.values()):
+        overall_status = "critical"
+    elif any(f["status"] == "warning" for f in features_status.values()):
+        overall_status = "warning"
+    return overall_status, features_status
+
+
 @app.get("/api/drift/summary")
 async def get_drift_summary():
     """
@@ -518,6 +1462,7 @@ async def get_drift_summary():
             return {
                 "status": "insufficient_data",
                 "features_status": {},
+                "output": drift_result.get("output", {}),
                 "sample_count": drift_result.get("count", 0)
             }
         
@@ -530,31 +1475,29 @@ async def get_drift_summary():
             }
         
         # Extraer estado por feature
-        features_status = {}
-        for feature, data in drift_result.get("features", {}).items():
-            psi = data.get("psi", 0)
-            status = "stable"
-            if psi >= 0.2:
-                status = "critical"
-            elif psi >= 0.1:
-                status = "warning"
-            
-            features_status[feature] = {
-                "psi": psi,
-                "status": status,
-                "drifting": data.get("drifting", False)
-            }
+        overall_status, features_status = summarize_features(drift_result.get("features", {}))
         
-        # Determinar estado general
-        overall_status = "stable"
-        if any(f["status"] == "critical" for f in features_status.values()):
-            overall_status = "critical"
-        elif any(f["status"] == "warning" for f in features_status.values()):
-            overall_status = "warning"
+        # Mismo resumen para cada ventana temporal (15m, 1h, 24h, decayed)
+        windows_status = {}
+        for window, window_result in drift_result.get("windows", {}).items():
+            if window_result.get("status") == "insufficient_data":
+                windows_status[window] = {
+                    "status": "insufficient_data",
+                    "sample_count": window_result.get("sample_count", 0)
+                }
+                continue
+            window_overall, window_features = summarize_features(window_result.get("features", {}))
+            windows_status[window] = {
+                "status": window_overall,
+                "features_status": window_features,
+                "sample_count": window_result.get("sample_count", 0)
+            }
         
         return {
             "status": overall_status,
             "features_status": features_status,
+            "windows": windows_status,
+            "output": drift_result.get("output", {}),
             "sample_count": drift_result.get("sample_count", 0),
             "timestamp": drift_result.get("timestamp", datetime.now().isoformat())
         }
@@ -586,6 +1529,13 @@ async def get_drift_features():
         logger.error(f"Error al obtener features: {str(e)}")
         return {"error": str(e)}
        
+# Con MODEL_LOAD_MODE=preload el modelo se carga aquí, en el master de gunicorn
+# (preload_app), antes de crear los workers. gc.freeze() evita que el recolector
+# toque esos objetos y rompa el copy-on-write de sus páginas.
+if MODEL_LOAD_MODE == "preload":
+    set_model(load_serving_model())
+    gc.freeze()
+
 # Arranque de la aplicación
 if __name__ == "__main__":
     import uvicorn
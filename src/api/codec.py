@@ -0,0 +1,205 @@
+import json
+import logging
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from src.api.models import FEATURE_NAMES, PredictionInput, BatchPredictionInput
+
+try:
+    import orjson
+except ImportError:  # Sin orjson: se usa el módulo json estándar
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Cuerpo binario del lote: filas de float32 little-endian en el orden de FEATURE_NAMES
+BINARY_MEDIA_TYPE = "application/x-float32-rows"
+BINARY_DTYPE = np.dtype("<f4")
+BINARY_ROW_BYTES = BINARY_DTYPE.itemsize * len(FEATURE_NAMES)
+
+_NUMBER_TYPES = (float, int)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse serializada con orjson cuando está instalado; el JSON resultante es el mismo."""
+
+    def render(self, content):
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content)
+
+
+def _loads(body):
+    if orjson is not None:
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # orjson rechaza NaN, Infinity y los enteros de más de 64 bits, que
+            # json (el parser de FastAPI) acepta; solo los errores pagan el reintento
+            pass
+    return json.loads(body)
+
+
+def encode_ndjson_line(content):
+    """Serializa un objeto como una línea de NDJSON (bytes terminados en salto de línea)."""
+    if orjson is not None:
+        return orjson.dumps(content) + b"\n"
+    return json.dumps(content).encode("utf-8") + b"\n"
+
+
+def _parse_json(body):
+    try:
+        return _loads(body)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=[{"loc": ["body"], "msg": f"JSON inválido: {str(e)}", "type": "value_error.jsondecode"}]
+        )
+
+
+def _validate_with_pydantic(model_class, payload):
+    """
+    Valida con el modelo pydantic para obtener exactamente su resultado o sus errores.
+
+    Se usa cuando el camino rápido no reconoce la entrada (campos ausentes,
+    números como texto, etc.), así que las reglas de validación siguen
+    siendo las del esquema.
+
+    Raises:
+        HTTPException: 422 con la lista de errores de validación
+    """
+    try:
+        if not isinstance(payload, dict):
+            raise TypeError("El cuerpo debe ser un objeto JSON")
+        return model_class(**payload)
+    except TypeError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=[{"loc": ["body"], "msg": str(e), "type": "type_error"}]
+        )
+    except ValueError as e:
+        errors = e.errors() if hasattr(e, "errors") else [{"loc": [], "msg": str(e), "type": "value_error"}]
+        raise HTTPException(
+            status_code=422,
+            detail=[
+                {"loc": ["body", *err["loc"]], "msg": err["msg"], "type": err["type"]}
+                for err in errors
+            ]
+        )
+
+
+def parse_prediction(body):
+    """
+    Valida el cuerpo JSON de /predict.
+
+    Args:
+        body: Bytes del cuerpo de la petición (esquema de PredictionInput)
+
+    Returns:
+        Lista de floats en el orden de FEATURE_NAMES
+
+    Raises:
+        HTTPException: 422 si el cuerpo no cumple el esquema
+    """
+    payload = _parse_json(body)
+    if isinstance(payload, dict):
+        try:
+            row = [payload[name] for name in FEATURE_NAMES]
+            # bool es subclase de int: se comprueba el tipo exacto
+            if all(type(value) in _NUMBER_TYPES for value in row):
+                return [float(value) for value in row]
+        except (KeyError, OverflowError):
+            # Un entero fuera del rango de float lo resuelve pydantic
+            pass
+
+    parsed = _validate_with_pydantic(PredictionInput, payload)
+    return [getattr(parsed, name) for name in FEATURE_NAMES]
+
+
+def decode_prediction(body):
+    """
+    Decodifica el cuerpo JSON de /predict.
+
+    Args:
+        body: Bytes del cuerpo de la petición (esquema de PredictionInput)
+
+    Returns:
+        Matriz float64 de forma (1 x n_features) en el orden de FEATURE_NAMES
+
+    Raises:
+        HTTPException: 422 si el cuerpo no cumple el esquema
+    """
+    return np.array([parse_prediction(body)], dtype=np.float64)
+
+
+def decode_batch(body, content_type=None):
+    """
+    Decodifica el cuerpo de /predict/batch, en JSON o en formato binario.
+
+    El formato binario (Content-Type: application/x-float32-rows) es la
+    concatenación de filas de float32 little-endian en el orden de
+    FEATURE_NAMES, sin cabecera.
+
+    Args:
+        body: Bytes del cuerpo de la petición
+        content_type: Cabecera Content-Type de la petición
+
+    Returns:
+        Matriz float64 contigua (n_transacciones x n_features)
+
+    Raises:
+        HTTPException: 422 si el cuerpo no cumple el formato
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type == BINARY_MEDIA_TYPE:
+        if len(body) % BINARY_ROW_BYTES:
+            raise HTTPException(
+                status_code=422,
+                detail=f"El cuerpo binario debe contener filas de {BINARY_ROW_BYTES} bytes ({len(FEATURE_NAMES)} float32)"
+            )
+        features = np.frombuffer(body, dtype=BINARY_DTYPE).reshape(-1, len(FEATURE_NAMES)).astype(np.float64)
+        if not np.all(np.isfinite(features)):
+            raise HTTPException(status_code=422, detail="El cuerpo binario contiene valores no finitos")
+        return features
+
+    payload = _parse_json(body)
+    transactions = payload.get("transactions") if isinstance(payload, dict) else None
+    if isinstance(transactions, list):
+        try:
+            rows = [[t[name] for name in FEATURE_NAMES] for t in transactions]
+            if {type(value) for row in rows for value in row} <= set(_NUMBER_TYPES):
+                return np.array(rows, dtype=np.float64).reshape(-1, len(FEATURE_NAMES))
+        except (KeyError, TypeError, OverflowError):
+            pass
+
+    parsed = _validate_with_pydantic(BatchPredictionInput, payload)
+    return np.array(
+        [[getattr(t, name) for name in FEATURE_NAMES] for t in parsed.transactions],
+        dtype=np.float64
+    ).reshape(-1, len(FEATURE_NAMES))
+
+
+def encode_prediction(prediction, probability, model_version=None):
+    """Construye la respuesta de /predict con el mismo JSON que PredictionOutput."""
+    content = {"prediction": int(prediction), "probability": float(probability)}
+    if model_version is not None:
+        content["model_version"] = model_version
+    headers = {"X-Model-Version": model_version} if model_version is not None else None
+    return FastJSONResponse(content=content, headers=headers)
+
+
+def encode_batch(predictions, probabilities, model_version=None):
+    """Construye la respuesta de /predict/batch con el mismo JSON que BatchPredictionOutput."""
+    content = {
+        "predictions": [
+            {"prediction": int(pred), "probability": float(prob)}
+            for pred, prob in zip(np.asarray(predictions).tolist(), np.asarray(probabilities).tolist())
+        ],
+        "count": len(predictions),
+    }
+    if model_version is not None:
+        content["model_version"] = model_version
+    headers = {"X-Model-Version": model_version} if model_version is not None else None
+    return FastJSONResponse(content=content, headers=headers)
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class PoolSaturatedError(Exception):
+    """Se lanza cuando la cola del pool de inferencia está llena."""
+
+
+class InferencePool:
+    """
+    Pool acotado de hilos para ejecutar trabajo bloqueante fuera del event loop.
+
+    Se usan hilos y no procesos porque el modelo vive en la memoria del proceso
+    y NumPy/scikit-learn liberan el GIL durante el cálculo pesado. La cola está
+    acotada: si hay más de `max_workers + max_queue` tareas pendientes, las
+    nuevas se rechazan de inmediato en lugar de acumular latencia.
+    """
+
+    def __init__(self, max_workers=4, max_queue=64, timeout=5.0, wait_window=1024):
+        """
+        Inicializa el pool.
+
+        Args:
+            max_workers: Número de hilos de trabajo
+            max_queue: Tareas que pueden esperar además de las que están en ejecución
+            timeout: Tiempo máximo en segundos por tarea si no se indica otro
+            wait_window: Número de tiempos de espera recientes usados para los percentiles
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._recent_waits = deque(maxlen=wait_window)
+        self.stats_counters = {
+            "submitted": 0,
+            "completed": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "errors": 0,
+        }
+        self._wait_count = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @classmethod
+    def from_env(cls):
+        """Crea el pool a partir de las variables de entorno INFERENCE_*."""
+        return cls(
+            max_workers=int(os.getenv("INFERENCE_WORKERS", str(min(4, os.cpu_count() or 1)))),
+            max_queue=int(os.getenv("INFERENCE_MAX_QUEUE", "64")),
+            timeout=float(os.getenv("INFERENCE_TIMEOUT", "5")),
+        )
+
+    def _get_executor(self):
+        # Creación diferida: los hilos no existen hasta el primer uso (seguro con fork)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference"
+            )
+        return self._executor
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+            self.stats_counters["completed"] += 1
+
+    async def run(self, fn, *args, timeout=None):
+        """
+        Ejecuta `fn(*args)` en el pool y espera su resultado sin bloquear el event loop.
+
+        Args:
+            fn: Función bloqueante a ejecutar
+            *args: Argumentos posicionales de la función
+            timeout: Tiempo máximo en segundos (por defecto, el del pool)
+
+        Returns:
+            Resultado de la función
+
+        Raises:
+            PoolSaturatedError: Si la cola está llena
+            asyncio.TimeoutError: Si la tarea excede el tiempo máximo
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.stats_counters["rejected"] += 1
+                raise PoolSaturatedError(
+                    f"Cola de inferencia llena ({self._pending} tareas pendientes)"
+                )
+            self._pending += 1
+            self.stats_counters["submitted"] += 1
+
+        submitted_at = time.perf_counter()
+
+        def task():
+            wait = time.perf_counter() - submitted_at
+            with self._lock:
+                self._recent_waits.append(wait)
+                self._wait_count += 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+            return fn(*args)
+
+        # El hueco en la cola se libera cuando la tarea termina o se cancela,
+        # no cuando el cliente deja de esperar
+        concurrent_future = self._get_executor().submit(task)
+        concurrent_future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(concurrent_future),
+                timeout=timeout if timeout is not None else self.timeout
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.stats_counters["timeouts"] += 1
+            raise
+        except Exception:
+            with self._lock:
+                self.stats_counters["errors"] += 1
+            raise
+
+    def stats(self):
+        """
+        Devuelve métricas del pool, incluida la espera en cola.
+
+        Returns:
+            Diccionario con contadores y tiempos de espera en milisegundos
+        """
+        with self._lock:
+            waits = np.array(self._recent_waits, dtype=float) * 1000.0
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                **self.stats_counters,
+                "queue_wait_ms": {
+                    "avg": (self._wait_total * 1000.0 / self._wait_count) if self._wait_count else 0.0,
+                    "max": self._wait_max * 1000.0,
+                    "p50": float(np.percentile(waits, 50)) if len(waits) else 0.0,
+                    "p99": float(np.percentile(waits, 99)) if len(waits) else 0.0,
+                }
+            }
+
+    def shutdown(self):
+        """Detiene los hilos; el pool se recrea en el siguiente uso."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
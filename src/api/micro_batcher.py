@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores de los buckets del histograma de tamaños de lote
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """
+    Agrupa peticiones individuales concurrentes en una única inferencia matricial.
+
+    Si no hay ningún lote en inferencia, las filas en cola se despachan de
+    inmediato: una petición aislada no espera a nadie. Mientras hay un lote
+    en curso, la primera fila que llega abre una ventana de `max_wait_ms`;
+    el lote se despacha cuando la ventana se cierra o cuando se alcanzan
+    `max_batch_size` filas, lo que ocurra primero. Cada petición recibe su
+    propia fila del resultado.
+    """
+
+    def __init__(self, infer_fn, max_batch_size=64, max_wait_ms=2.0):
+        """
+        Inicializa el micro-batcher.
+
+        Args:
+            infer_fn: Corrutina que recibe una matriz (n x features) y devuelve
+                una tupla (predicciones, probabilidades, contexto), donde el
+                contexto es común a todo el lote (p. ej. la versión del modelo)
+            max_batch_size: Máximo de filas por lote
+            max_wait_ms: Latencia máxima añadida a la primera fila de un lote
+                que se forma mientras otro está en inferencia
+        """
+        self.infer_fn = infer_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending = []
+        self._loop = None
+        self._task = None
+        # Referencias a los lotes en curso: el event loop solo guarda referencias débiles
+        self._batch_tasks = set()
+        self._has_items = None
+        self._is_full = None
+        self._lock = threading.Lock()
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.batch_count = 0
+        self.row_count = 0
+        self._added_latency_total = 0.0
+        self._added_latency_max = 0.0
+
+    @classmethod
+    def from_env(cls, infer_fn):
+        """Crea el micro-batcher a partir de las variables de entorno MICROBATCH_*."""
+        return cls(
+            infer_fn,
+            max_batch_size=int(os.getenv("MICROBATCH_MAX_SIZE", "64")),
+            max_wait_ms=float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2")),
+        )
+
+    def _ensure_started(self):
+        # El colector se liga al event loop en ejecución (uno por worker)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            if self._task is not None and self._task.done() and not self._task.cancelled() and self._task.exception():
+                logger.error(f"✗ El colector del micro-batcher terminó con error: {self._task.exception()}")
+            # Las filas que esperaban al colector anterior no se despacharán nunca
+            self._fail_pending(RuntimeError("El colector del micro-batcher se detuvo antes de despachar la fila"))
+            self._loop = loop
+            self._has_items = asyncio.Event()
+            self._is_full = asyncio.Event()
+            self._task = loop.create_task(self._collect())
+
+    async def submit(self, row):
+        """
+        Encola una fila y espera su resultado.
+
+        Args:
+            row: Vector de features de una transacción
+
+        Returns:
+            Tupla (predicción, probabilidad, contexto) de esa fila
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._pending.append((row, future, time.perf_counter()))
+
+        self._has_items.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._is_full.set()
+
+        return await future
+
+    async def _collect(self):
+        while True:
+            await self._has_items.wait()
+
+            # Sin lotes en curso no hay con quién agrupar: esperar solo añadiría latencia.
+            # Si los hay, la ventana empieza con la primera fila y termina antes si el lote se llena
+            if self._batch_tasks and len(self._pending) < self.max_batch_size:
+                try:
+                    await asyncio.wait_for(self._is_full.wait(), timeout=self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+
+            if not self._pending:
+                self._has_items.clear()
+            if len(self._pending) < self.max_batch_size:
+                self._is_full.clear()
+
+            # La inferencia corre aparte para seguir agrupando mientras tanto
+            task = self._loop.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    def _fail_pending(self, exc):
+        """Termina con `exc` las filas pendientes y vacía la cola."""
+        pending, self._pending = self._pending, []
+        for _, future, _ in pending:
+            if future.done():
+                continue
+            try:
+                future.set_exception(exc)
+            except RuntimeError:
+                # El event loop de la fila ya está cerrado: nadie la espera
+                pass
+
+    async def _run_batch(self, batch):
+        dispatched_at = time.perf_counter()
+        self._record_batch(len(batch), [dispatched_at - queued_at for _, _, queued_at in batch])
+
+        try:
+            features = np.vstack([row for row, _, _ in batch])
+            predictions, probabilities, context = await self.infer_fn(features)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for i, (_, future, _) in enumerate(batch):
+            # La petición pudo cancelarse (cliente desconectado) mientras esperaba
+            if not future.done():
+                future.set_result((predictions[i], probabilities[i], context))
+
+    def _record_batch(self, size, added_latencies):
+        bucket = np.searchsorted(BATCH_SIZE_BUCKETS, size)
+        with self._lock:
+            self.batch_size_counts[bucket] += 1
+            self.batch_count += 1
+            self.row_count += size
+            self._added_latency_total += sum(added_latencies)
+            self._added_latency_max = max(self._added_latency_max, max(added_latencies))
+
+    def stats(self):
+        """
+        Devuelve el histograma de tamaños de lote y la latencia añadida.
+
+        Returns:
+            Diccionario con buckets acumulados (estilo Prometheus) y contadores
+        """
+        with self._lock:
+            cumulative = np.cumsum(self.batch_size_counts).tolist()
+            buckets = {str(le): count for le, count in zip(BATCH_SIZE_BUCKETS, cumulative)}
+            buckets["+Inf"] = cumulative[-1]
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self.batch_count,
+                "rows": self.row_count,
+                "avg_batch_size": (self.row_count / self.batch_count) if self.batch_count else 0.0,
+                "batch_size_buckets": buckets,
+                "added_latency_ms": {
+                    "avg": (self._added_latency_total * 1000.0 / self.row_count) if self.row_count else 0.0,
+                    "max": self._added_latency_max * 1000.0,
+                }
+            }
+
+    async def stop(self):
+        """Cancela el colector del event loop actual y espera los lotes en curso."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+        if self._batch_tasks:
+            await asyncio.gather(*list(self._batch_tasks), return_exceptions=True)
+
+        for _, future, _ in self._pending:
+            if not future.done():
+                future.cancel()
+        self._pending = []
@@ -1,7 +1,10 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 
+# Orden de las columnas con el que se entrenó el modelo
+FEATURE_NAMES = ["V14", "V10", "V4", "V12", "V1"]
+
 
 class PredictionInput(BaseModel):
     V14: float
@@ -12,4 +15,52 @@ class PredictionInput(BaseModel):
 
 class PredictionOutput(BaseModel):
     prediction: int
-    probability: float
\ No newline at end of file
+    probability: float
+    model_version: Optional[str] = None
+
+class BatchPredictionInput(BaseModel):
+    transactions: List[PredictionInput]
+
+class BatchPredictionOutput(BaseModel):
+    predictions: List[PredictionOutput]
+    count: int
+    model_version: Optional[str] = None
+
+class ModelSwapRequest(BaseModel):
+    model_path: Optional[str] = None
+    model_url: Optional[str] = None
+    version: Optional[str] = None
+    sha256: Optional[str] = None
+
+
+def openapi_request_body(model, extra_content=None):
+    """
+    Cuerpo de petición OpenAPI generado a partir de un modelo pydantic.
+
+    Los endpoints que decodifican el cuerpo a mano (Request) no lo declaran
+    en el esquema; se pasa en `openapi_extra` para que /docs y los clientes
+    sigan viendo el contrato. Las referencias a submodelos se resuelven en
+    línea porque no figuran en components/schemas.
+
+    Args:
+        model: Clase del modelo pydantic (v1 o v2)
+        extra_content: Otros media types aceptados {media_type: {"schema": ...}}
+
+    Returns:
+        Diccionario para openapi_extra["requestBody"]
+    """
+    schema = model.model_json_schema() if hasattr(model, "model_json_schema") else model.schema()
+    definitions = schema.pop("$defs", None) or schema.pop("definitions", None) or {}
+
+    def resolve(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return resolve(definitions[node["$ref"].rsplit("/", 1)[-1]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+
+    content = {"application/json": {"schema": resolve(schema)}}
+    content.update(extra_content or {})
+    return {"required": True, "content": content}
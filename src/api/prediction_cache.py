@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionCache:
+    """
+    Caché LRU con expiración (TTL) de resultados de predicción.
+
+    La clave es el vector de features (exacto o redondeado a `decimals`)
+    junto con la versión del modelo, así que un resultado nunca se sirve
+    con una versión distinta de la que lo calculó.
+    """
+
+    def __init__(self, maxsize=10000, ttl=10.0, decimals=None):
+        """
+        Inicializa la caché.
+
+        Args:
+            maxsize: Número máximo de entradas
+            ttl: Segundos que una entrada sigue siendo válida
+            decimals: Decimales para cuantizar las features (None = coincidencia exacta)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.decimals = decimals
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats_counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    @classmethod
+    def from_env(cls):
+        """Crea la caché a partir de las variables de entorno PREDICTION_CACHE_*."""
+        decimals = os.getenv("PREDICTION_CACHE_DECIMALS")
+        return cls(
+            maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("PREDICTION_CACHE_TTL", "10")),
+            decimals=int(decimals) if decimals else None,
+        )
+
+    def make_key(self, row, model_version):
+        """
+        Construye la clave de una fila de features.
+
+        Args:
+            row: Vector de features (float64)
+            model_version: Versión del modelo que calcula el resultado
+
+        Returns:
+            Tupla hashable (versión, bytes del vector)
+        """
+        if self.decimals is not None:
+            # + 0.0 unifica -0.0 y 0.0 tras el redondeo
+            row = np.round(row, self.decimals) + 0.0
+        return model_version, np.ascontiguousarray(row, dtype=np.float64).tobytes()
+
+    def get(self, key):
+        """
+        Busca un resultado vigente.
+
+        Args:
+            key: Clave creada con make_key
+
+        Returns:
+            El valor almacenado o None si no existe o expiró
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats_counters["misses"] += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.stats_counters["expirations"] += 1
+                self.stats_counters["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats_counters["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Guarda un resultado, desalojando el menos usado si se supera `maxsize`.
+
+        Args:
+            key: Clave creada con make_key
+            value: Resultado a almacenar
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats_counters["evictions"] += 1
+
+    def clear(self):
+        """Vacía la caché (se llama al reemplazar el modelo)."""
+        with self._lock:
+            self._entries.clear()
+            self.stats_counters["invalidations"] += 1
+
+    def stats(self):
+        """
+        Devuelve métricas de la caché.
+
+        Returns:
+            Diccionario con contadores, tamaño actual y tasa de aciertos
+        """
+        with self._lock:
+            lookups = self.stats_counters["hits"] + self.stats_counters["misses"]
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "decimals": self.decimals,
+                **self.stats_counters,
+                "hit_rate": (self.stats_counters["hits"] / lookups) if lookups else 0.0,
+            }
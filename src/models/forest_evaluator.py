@@ -0,0 +1,281 @@
+import numpy as np
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FlatForest:
+    """
+    Representación aplanada de un RandomForestClassifier de scikit-learn.
+
+    Todos los árboles se concatenan en arreglos contiguos de nodos (feature,
+    threshold, hijos y probabilidades de hoja) y se recorren nivel por nivel
+    con NumPy para todas las filas y todos los árboles a la vez. Una sola
+    pasada devuelve la etiqueta y la probabilidad.
+    """
+
+    # Arreglos que se persisten como .npy y pueden mapearse en memoria
+    ARRAY_NAMES = ("feature", "threshold", "children", "leaf_values", "roots", "missing_left")
+    # Versión del formato en disco; la 2 añade missing_left (dirección de los NaN)
+    FORMAT_VERSION = 2
+
+    def __init__(self, feature, threshold, children, leaf_values, roots, classes, max_depth, n_features, missing_left=None):
+        """
+        Inicializa el evaluador a partir de los arreglos ya compilados.
+
+        Args:
+            feature: Índice de la feature evaluada en cada nodo (0 en las hojas)
+            threshold: Umbral de cada nodo
+            children: Hijos intercalados [izq_0, der_0, izq_1, der_1, ...]; las hojas apuntan a sí mismas
+            leaf_values: Probabilidades por clase de cada nodo (n_nodos x n_clases)
+            roots: Índice global de la raíz de cada árbol
+            classes: Etiquetas de clase del modelo original
+            max_depth: Profundidad máxima entre todos los árboles
+            n_features: Número de features esperadas por fila
+            missing_left: Si los NaN van al hijo izquierdo en cada nodo (por defecto, todos)
+        """
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.children = np.ascontiguousarray(children, dtype=np.intp)
+        self.leaf_values = np.ascontiguousarray(leaf_values, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.classes_ = np.asarray(classes)
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.n_estimators = len(self.roots)
+        if missing_left is None:
+            missing_left = np.ones(len(self.feature), dtype=bool)
+        self.missing_left = np.ascontiguousarray(missing_left, dtype=bool)
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """
+        Compila un RandomForestClassifier entrenado.
+
+        Args:
+            forest: Instancia entrenada de RandomForestClassifier (una sola salida)
+
+        Returns:
+            Instancia de FlatForest equivalente al modelo
+        """
+        if getattr(forest, "n_outputs_", 1) != 1:
+            raise ValueError("Solo se soportan bosques de una única salida")
+
+        features, thresholds, children, values, roots, missing = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(n_nodes)
+
+            # Las hojas apuntan a sí mismas para poder recorrer una profundidad fija
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+
+            # Misma normalización que DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            children.append(np.column_stack([left, right]).ravel())
+            values.append(value / normalizer)
+            roots.append(offset)
+            # scikit-learn >= 1.3 guarda hacia qué hijo van los NaN; antes siempre a la izquierda
+            missing_go_to_left = getattr(tree, "missing_go_to_left", None)
+            missing.append(np.ones(n_nodes, dtype=bool) if missing_go_to_left is None
+                           else np.asarray(missing_go_to_left, dtype=bool))
+
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.concatenate(children),
+            leaf_values=np.concatenate(values),
+            roots=np.array(roots),
+            missing_left=np.concatenate(missing),
+            classes=forest.classes_,
+            max_depth=max_depth,
+            n_features=forest.n_features_in_,
+        )
+
+    def save(self, directory, metadata=None):
+        """
+        Guarda los arreglos compilados como archivos .npy mapeables en memoria.
+
+        Args:
+            directory: Carpeta de destino
+            metadata: Información adicional a guardar en meta.json
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAY_NAMES:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+        meta = {
+            "format_version": self.FORMAT_VERSION,
+            "classes": self.classes_.tolist(),
+            "max_depth": self.max_depth,
+            "n_features": self.n_features_in_,
+            **(metadata or {}),
+        }
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        """
+        Carga un bosque guardado con save().
+
+        Con mmap_mode="r" los arreglos no se copian a la memoria del proceso:
+        todos los workers que abren la misma carpeta comparten las páginas
+        del page cache del sistema operativo.
+
+        Args:
+            directory: Carpeta creada por save()
+            mmap_mode: Modo de np.load (None para cargar en memoria)
+
+        Returns:
+            Tupla (FlatForest, metadatos)
+
+        Raises:
+            ValueError: Si la carpeta es de otra versión del formato (hay que recompilar)
+        """
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        # Sin missing_left, una caché anterior mandaría todos los NaN a la izquierda
+        if meta.get("format_version") != cls.FORMAT_VERSION:
+            raise ValueError(
+                f"Formato de bosque compilado {meta.get('format_version')} en {directory}; "
+                f"se esperaba {cls.FORMAT_VERSION}"
+            )
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in cls.ARRAY_NAMES}
+        flat = cls(
+            **arrays,
+            classes=meta["classes"],
+            max_depth=meta["max_depth"],
+            n_features=meta["n_features"],
+        )
+        return flat, meta
+
+    def _leaf_indices(self, X):
+        """Devuelve el índice global de la hoja alcanzada por cada fila en cada árbol."""
+        # scikit-learn compara las features en float32 contra umbrales float64
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Se esperaba una matriz (n x {self.n_features_in_}), recibida {X.shape}")
+
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_estimators))
+
+        for _ in range(self.max_depth):
+            values = X[rows, self.feature[nodes]]
+            # Los NaN siguen el hijo aprendido por scikit-learn (missing_go_to_left)
+            go_right = np.where(np.isnan(values), ~self.missing_left[nodes], values > self.threshold[nodes])
+            nodes = self.children[2 * nodes + go_right]
+
+        return nodes
+
+    def predict_with_proba(self, X):
+        """
+        Calcula etiquetas y probabilidades en una sola pasada por el bosque.
+
+        Args:
+            X: Matriz (n_muestras x n_features)
+
+        Returns:
+            Tupla (etiquetas, matriz de probabilidades por clase)
+        """
+        leaf_proba = self.leaf_values[self._leaf_indices(X)]
+
+        # Suma secuencial en el orden de los árboles (add.accumulate no usa
+        # suma por pares), igual que la acumulación de scikit-learn
+        proba = np.add.accumulate(leaf_proba, axis=1)[:, -1, :]
+        proba /= self.n_estimators
+
+        labels = np.take(self.classes_, np.argmax(proba, axis=1))
+        return labels, proba
+
+    def predict_proba(self, X):
+        """Interfaz compatible con scikit-learn."""
+        return self.predict_with_proba(X)[1]
+
+    def predict(self, X):
+        """Interfaz compatible con scikit-learn."""
+        return self.predict_with_proba(X)[0]
+
+    def verify_parity(self, forest, X):
+        """
+        Comprueba que las salidas coinciden bit a bit con las de scikit-learn.
+
+        Args:
+            forest: Modelo original de scikit-learn
+            X: Matriz de prueba
+
+        Returns:
+            True si etiquetas y probabilidades son idénticas
+        """
+        labels, proba = self.predict_with_proba(X)
+        expected_proba = forest.predict_proba(X)
+        expected_labels = forest.predict(X)
+        return bool(np.array_equal(proba, expected_proba) and np.array_equal(labels, expected_labels))
+
+    def probe_matrix(self, n_random=256, seed=0):
+        """
+        Genera filas de prueba que ejercitan los umbrales del bosque.
+
+        Args:
+            n_random: Número de filas a generar
+            seed: Semilla del generador aleatorio
+
+        Returns:
+            Matriz (n_random x n_features) de tipo float64
+        """
+        rng = np.random.default_rng(seed)
+        internal = self.children[2 * np.arange(len(self.feature))] != np.arange(len(self.feature))
+        X = rng.normal(scale=3.0, size=(n_random, self.n_features_in_))
+
+        # Colocar valores exactamente sobre umbrales reales para probar los empates
+        # (sin los infinitos de las divisiones "NaN frente al resto", que scikit-learn no admite como entrada)
+        internal &= np.isfinite(self.threshold)
+        thr_feature = self.feature[internal]
+        thr_value = self.threshold[internal]
+        if len(thr_value):
+            picks = rng.integers(0, len(thr_value), size=n_random)
+            X[np.arange(n_random), thr_feature[picks]] = thr_value[picks]
+        return X
+
+
+def compile_forest(loaded_model):
+    """
+    Compila el modelo en un FlatForest y verifica su paridad con scikit-learn.
+
+    Args:
+        loaded_model: Modelo cargado con joblib
+
+    Returns:
+        FlatForest verificado, o None si el modelo no es compatible
+    """
+    try:
+        if not hasattr(loaded_model, "estimators_") or not hasattr(loaded_model, "classes_"):
+            logger.info("El modelo no es un bosque compatible; se usará scikit-learn")
+            return None
+
+        flat = FlatForest.from_sklearn(loaded_model)
+        if not flat.verify_parity(loaded_model, flat.probe_matrix()):
+            logger.error("✗ FlatForest no coincide con scikit-learn; se usará scikit-learn")
+            return None
+
+        logger.info(f"✓ Bosque compilado: {flat.n_estimators} árboles, {len(flat.feature)} nodos, profundidad {flat.max_depth}")
+        return flat
+    except Exception as e:
+        logger.error(f"Error al compilar el bosque: {str(e)}")
+        return None
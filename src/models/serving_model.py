@@ -0,0 +1,133 @@
+import hashlib
+import os
+import logging
+from datetime import datetime
+
+import numpy as np
+
+from src.models.forest_evaluator import FlatForest, compile_forest
+
+logger = logging.getLogger(__name__)
+
+
+def file_version(path, length=12):
+    """
+    Calcula una versión corta a partir del SHA-256 del archivo.
+
+    Args:
+        path: Ruta del archivo del modelo
+        length: Número de caracteres hexadecimales a conservar
+
+    Returns:
+        Prefijo del hash o None si el archivo no existe
+    """
+    if not path or not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+class ServingModel:
+    """
+    Instantánea inmutable del modelo en servicio.
+
+    Agrupa el modelo, su versión compilada y su versión. Nunca se modifica:
+    un cambio de modelo crea una instancia nueva y reemplaza la referencia
+    global en una sola asignación, así que cada petición termina con la
+    instancia que tomó al empezar.
+    """
+
+    def __init__(self, model, version, fast_model=None, source=None):
+        """
+        Inicializa la instantánea.
+
+        Args:
+            model: Modelo de scikit-learn o FlatForest
+            version: Identificador de la versión del modelo
+            fast_model: FlatForest compilado equivalente (opcional)
+            source: Ruta o URL de donde se cargó
+        """
+        self.model = model
+        self.fast_model = fast_model
+        self.version = version
+        self.source = source
+        self.loaded_at = datetime.now().isoformat()
+
+    @classmethod
+    def build(cls, loaded_model, version, source=None, compile_model=True):
+        """
+        Crea la instantánea compilando el bosque si es posible.
+
+        Args:
+            loaded_model: Modelo cargado
+            version: Identificador de la versión
+            source: Ruta o URL de origen
+            compile_model: Si se intenta compilar a FlatForest
+
+        Returns:
+            Instancia de ServingModel
+        """
+        if isinstance(loaded_model, FlatForest):
+            fast_model = loaded_model
+        else:
+            fast_model = compile_forest(loaded_model) if compile_model else None
+        return cls(loaded_model, version, fast_model=fast_model, source=source)
+
+    def predict_matrix(self, features):
+        """
+        Ejecuta una única pasada de inferencia sobre una matriz de features.
+
+        Args:
+            features: Matriz contigua (n_muestras x n_features) de tipo float
+
+        Returns:
+            Tupla (predicciones, probabilidades de la clase positiva)
+        """
+        # El evaluador compilado devuelve etiqueta y probabilidad en un solo recorrido
+        if self.fast_model is not None:
+            predictions, probabilities = self.fast_model.predict_with_proba(features)
+            return predictions, probabilities[:, 1]
+
+        probabilities = self.model.predict_proba(features)
+        classes = getattr(self.model, "classes_", np.arange(probabilities.shape[1]))
+        # Igual que RandomForestClassifier.predict, pero sin recorrer los árboles otra vez
+        predictions = np.take(classes, np.argmax(probabilities, axis=1))
+        return predictions, probabilities[:, 1]
+
+    def smoke_test(self, n_features):
+        """
+        Ejecuta una predicción de prueba, que además calienta el modelo.
+
+        Args:
+            n_features: Número de features que envía la API
+
+        Raises:
+            ValueError: Si el modelo no acepta la entrada o devuelve valores inválidos
+        """
+        expected = getattr(self.model, "n_features_in_", n_features)
+        if expected != n_features:
+            raise ValueError(f"El modelo espera {expected} features y la API envía {n_features}")
+
+        features = np.vstack([
+            np.zeros(n_features),
+            np.random.default_rng(0).normal(size=n_features),
+        ])
+        predictions, probabilities = self.predict_matrix(features)
+
+        if len(predictions) != 2 or len(probabilities) != 2:
+            raise ValueError("La predicción de prueba no devolvió una fila por muestra")
+        if not np.all(np.isfinite(probabilities)) or np.any((probabilities < 0) | (probabilities > 1)):
+            raise ValueError(f"Probabilidades inválidas en la predicción de prueba: {probabilities}")
+
+    def describe(self):
+        """Información de la instantánea para los endpoints de estado."""
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "source": self.source,
+            "model_type": type(self.model).__name__,
+            "compiled": self.fast_model is not None,
+        }
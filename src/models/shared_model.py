@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import logging
+
+from src.models.forest_evaluator import FlatForest, compile_forest
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _source_signature(model_path):
+    """Identifica la versión del pickle de origen por tamaño y fecha de modificación."""
+    if not os.path.exists(model_path):
+        return None
+    stat = os.stat(model_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _read_cached_signature(cache_dir):
+    try:
+        _, meta = FlatForest.load(cache_dir, mmap_mode="r")
+        return meta.get("source")
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def load_mmap_forest(model_path, cache_dir, loader):
+    """
+    Carga el bosque compilado desde `cache_dir` mapeado en memoria.
+
+    Si la caché no existe, tiene otra versión del formato (FlatForest.FORMAT_VERSION)
+    o corresponde a otro pickle, un único worker (bajo
+    un bloqueo de archivo) carga el modelo con `loader`, lo compila y publica
+    la carpeta de forma atómica. El resto de workers espera el bloqueo y
+    simplemente mapea los mismos archivos, por lo que los arreglos del
+    modelo ocupan memoria física una sola vez en toda la máquina.
+
+    Args:
+        model_path: Ruta del pickle de scikit-learn
+        cache_dir: Carpeta donde se guardan los arreglos .npy
+        loader: Función sin argumentos que devuelve el modelo de scikit-learn
+
+    Returns:
+        FlatForest respaldado por archivos mapeados, o None si falla
+    """
+    try:
+        parent_dir = os.path.dirname(os.path.abspath(cache_dir))
+        os.makedirs(parent_dir, exist_ok=True)
+
+        with open(os.path.abspath(cache_dir) + ".lock", "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                source = _source_signature(model_path)
+                cached = _read_cached_signature(cache_dir)
+
+                if cached is None or (source is not None and cached != source):
+                    logger.info(f"Compilando caché mapeable del modelo en {cache_dir}")
+                    loaded_model = loader()
+                    flat = compile_forest(loaded_model) if loaded_model is not None else None
+                    if flat is None:
+                        logger.error("✗ No se pudo compilar el modelo para el modo mmap")
+                        return None
+
+                    # Escribir en una carpeta temporal y renombrar: nunca se ve a medias
+                    tmp_dir = tempfile.mkdtemp(dir=parent_dir, prefix=".flat-")
+                    flat.save(tmp_dir, metadata={"source": _source_signature(model_path)})
+                    if os.path.exists(cache_dir):
+                        shutil.rmtree(cache_dir)
+                    os.replace(tmp_dir, cache_dir)
+                elif source is None:
+                    logger.warning(f"Pickle no encontrado en {model_path}; se usa la caché existente sin verificar")
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        flat, _ = FlatForest.load(cache_dir, mmap_mode="r")
+        logger.info(f"✓ Modelo mapeado en memoria desde {cache_dir} ({flat.n_estimators} árboles)")
+        return flat
+    except Exception as e:
+        logger.error(f"Error al cargar el modelo mapeado en memoria: {str(e)}")
+        return None
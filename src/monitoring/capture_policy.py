@@ -0,0 +1,247 @@
+import os
+import random
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class CapturePolicy:
+    """
+    Política de captura de muestras para el drift: decide qué peticiones se registran.
+
+    decide() devuelve el peso de la muestra, el inverso de su probabilidad
+    de inclusión, o 0.0 si no se captura. Los histogramas y sketches suman
+    esos pesos, así que las proporciones estimadas siguen siendo insesgadas
+    aunque solo se capture una fracción del tráfico. Para una petición no
+    capturada el coste es una comparación con un número aleatorio, antes de
+    construir el diccionario de la muestra.
+
+    Esta clase base captura todas las muestras con peso 1.
+    """
+
+    mode = "all"
+    # Si la decisión depende de la clase predicha (la muestra se registra tras predecir)
+    needs_prediction = False
+    # Si las muestras aceptadas sustituyen posiciones al azar de la ventana llena
+    random_slots = False
+
+    def __init__(self):
+        self.seen = 0
+        self.captured = 0
+
+    @classmethod
+    def from_env(cls, window_size):
+        """
+        Crea la política a partir de las variables de entorno DRIFT_CAPTURE_*.
+
+        DRIFT_CAPTURE_MODE: all (por defecto), rate, reservoir o stratified.
+        DRIFT_CAPTURE_RATE: fracción capturada en el modo rate (por defecto, 0.1).
+        DRIFT_CAPTURE_CLASS_RATES: fracción por clase predicha en el modo
+        stratified, como "0:0.05,1:1" (por defecto, todo el fraude y el 10%
+        de las legítimas).
+
+        Args:
+            window_size: Capacidad de la ventana de muestras (tamaño del reservoir)
+        """
+        mode = os.getenv("DRIFT_CAPTURE_MODE", "all").strip().lower()
+        try:
+            if mode == "rate":
+                return RateCapture(float(os.getenv("DRIFT_CAPTURE_RATE", "0.1")))
+            if mode == "reservoir":
+                return ReservoirCapture(window_size)
+            if mode == "stratified":
+                return StratifiedCapture(parse_class_rates(os.getenv("DRIFT_CAPTURE_CLASS_RATES", "0:0.1,1:1")))
+        except ValueError as e:
+            logger.error(f"Error en la configuración de captura de drift: {str(e)}")
+            return cls()
+        if mode != "all":
+            logger.warning(f"⚠ Modo de captura de drift desconocido {mode!r}; se capturan todas las muestras")
+        return cls()
+
+    def decide(self, prediction=None):
+        """
+        Decide si se captura una petición.
+
+        Args:
+            prediction: Clase predicha (solo la usa la política estratificada)
+
+        Returns:
+            Peso de la muestra (inverso de su probabilidad de inclusión), o 0.0 si no se captura
+        """
+        self.seen += 1
+        self.captured += 1
+        return 1.0
+
+    def decide_many(self, n, predictions=None):
+        """
+        Decide la captura de un lote de peticiones.
+
+        Args:
+            n: Número de peticiones
+            predictions: Clases predichas (solo la política estratificada)
+
+        Returns:
+            Arreglo de pesos, 0.0 en las no capturadas
+        """
+        self.seen += n
+        self.captured += n
+        return np.ones(n)
+
+    def window_weight(self, weight):
+        """Peso de la muestra en el histograma de la ventana de muestras."""
+        return weight
+
+    def slot(self, window):
+        """Posición de la ventana que sustituye la muestra capturada (None = la más antigua)."""
+        return None
+
+    def stats(self):
+        return {"mode": self.mode, "seen": self.seen, "captured": self.captured}
+
+
+class RateCapture(CapturePolicy):
+    """Captura cada petición con una probabilidad fija `rate` (peso 1/rate)."""
+
+    mode = "rate"
+
+    def __init__(self, rate):
+        if not 0.0 < rate <= 1.0:
+            raise ValueError(f"La tasa de captura debe estar en (0, 1]: {rate}")
+        super().__init__()
+        self.rate = rate
+        self._weight = 1.0 / rate
+
+    def decide(self, prediction=None):
+        self.seen += 1
+        if random.random() < self.rate:
+            self.captured += 1
+            return self._weight
+        return 0.0
+
+    def decide_many(self, n, predictions=None):
+        weights = np.where(np.random.random(n) < self.rate, self._weight, 0.0)
+        self.seen += n
+        self.captured += int(np.count_nonzero(weights))
+        return weights
+
+    def stats(self):
+        return {**super().stats(), "rate": self.rate}
+
+
+class ReservoirCapture(CapturePolicy):
+    """
+    Muestreo reservoir (algoritmo R): la ventana es una muestra uniforme de todo el tráfico.
+
+    Las primeras `size` peticiones se capturan siempre; la n-ésima se
+    captura con probabilidad size/n y sustituye una posición al azar de la
+    ventana. Dentro de la ventana todas las muestras pesan lo mismo; en las
+    ventanas temporales y los sketches pesan n/size, el inverso de su
+    probabilidad de inclusión en el momento de la captura.
+    """
+
+    mode = "reservoir"
+    random_slots = True
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError(f"El tamaño del reservoir debe ser positivo: {size}")
+        super().__init__()
+        self.size = int(size)
+
+    def decide(self, prediction=None):
+        self.seen += 1
+        if self.seen <= self.size:
+            self.captured += 1
+            return 1.0
+        if random.random() * self.seen < self.size:
+            self.captured += 1
+            return self.seen / self.size
+        return 0.0
+
+    def decide_many(self, n, predictions=None):
+        seen = self.seen + np.arange(1, n + 1, dtype=np.float64)
+        accepted = np.random.random(n) * seen < self.size
+        weights = np.where(accepted, np.maximum(seen / self.size, 1.0), 0.0)
+        self.seen += n
+        self.captured += int(np.count_nonzero(accepted))
+        return weights
+
+    def window_weight(self, weight):
+        return 1.0
+
+    def slot(self, window):
+        if len(window) < window.capacity:
+            return None
+        return random.randrange(window.capacity)
+
+    def stats(self):
+        return {**super().stats(), "size": self.size}
+
+
+class StratifiedCapture(CapturePolicy):
+    """
+    Captura estratificada por clase predicha, con una tasa por clase.
+
+    Permite conservar todo el fraude (clase minoritaria) y una fracción de
+    las legítimas; cada muestra pesa 1/tasa de su clase, así que las
+    distribuciones mezcladas no quedan sesgadas hacia el fraude.
+    """
+
+    mode = "stratified"
+    needs_prediction = True
+
+    def __init__(self, class_rates, default_rate=1.0):
+        """
+        Args:
+            class_rates: Diccionario {clase: tasa en (0, 1]}
+            default_rate: Tasa de las clases no listadas o sin predicción
+        """
+        for label, rate in list(class_rates.items()) + [("default", default_rate)]:
+            if not 0.0 < rate <= 1.0:
+                raise ValueError(f"La tasa de captura de la clase {label} debe estar en (0, 1]: {rate}")
+        super().__init__()
+        self.class_rates = {int(label): float(rate) for label, rate in class_rates.items()}
+        self.default_rate = float(default_rate)
+
+    def decide(self, prediction=None):
+        self.seen += 1
+        rate = self.default_rate if prediction is None else self.class_rates.get(int(prediction), self.default_rate)
+        if rate >= 1.0 or random.random() < rate:
+            self.captured += 1
+            return 1.0 / rate
+        return 0.0
+
+    def decide_many(self, n, predictions=None):
+        rates = np.full(n, self.default_rate)
+        if predictions is not None:
+            predictions = np.asarray(predictions).astype(np.int64).ravel()
+            for label, rate in self.class_rates.items():
+                rates[predictions == label] = rate
+        weights = np.where(np.random.random(n) < rates, 1.0 / rates, 0.0)
+        self.seen += n
+        self.captured += int(np.count_nonzero(weights))
+        return weights
+
+    def stats(self):
+        return {**super().stats(), "class_rates": {str(k): v for k, v in self.class_rates.items()}}
+
+
+def parse_class_rates(spec):
+    """
+    Interpreta tasas por clase como "0:0.05,1:1".
+
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    rates = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        label, _, rate = item.partition(":")
+        if not rate:
+            raise ValueError(f"Tasa por clase inválida: {item!r}")
+        rates[int(label)] = float(rate)
+    return rates
@@ -0,0 +1,80 @@
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardCache:
+    """
+    Caché del HTML del dashboard de drift, invalidada por versión.
+
+    La clave es la versión de lo que se dibuja (p. ej. la versión del
+    historial y el mtime de la referencia): mientras no cambie, las
+    peticiones reciben el HTML ya renderizado sin releer el historial ni
+    reconstruir las figuras. El render se hace bajo un lock, así que varias
+    peticiones simultáneas con la caché obsoleta renderizan una sola vez.
+    """
+
+    def __init__(self, label="Dashboard de drift"):
+        """
+        Args:
+            label: Nombre de lo que se renderiza, para el log
+        """
+        self.label = label
+        self._lock = threading.Lock()
+        self._key = None
+        self._value = None
+        self.hits = 0
+        self.misses = 0
+        self.last_render_seconds = None
+
+    def get(self, key, render):
+        """
+        Devuelve el valor en caché para `key` o lo renderiza.
+
+        Args:
+            key: Versión de los datos (cualquier valor comparable e imprimible)
+            render: Función sin argumentos que genera el valor
+
+        Returns:
+            Valor renderizado para `key`
+        """
+        with self._lock:
+            if self._key == key and self._value is not None:
+                self.hits += 1
+                return self._value
+            start = time.perf_counter()
+            value = render()
+            self.last_render_seconds = time.perf_counter() - start
+            self.misses += 1
+            self._key = key
+            self._value = value
+            logger.info(f"✓ {self.label} renderizado en {self.last_render_seconds:.3f}s (versión {key})")
+            return value
+
+    def invalidate(self):
+        """Descarta el valor en caché."""
+        with self._lock:
+            self._key = None
+            self._value = None
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "last_render_seconds": self.last_render_seconds}
+
+
+def make_etag(*parts):
+    """ETag débil a partir de las partes que determinan el contenido de la respuesta."""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Si la cabecera If-None-Match de la petición incluye `etag` (o es "*")."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # La comparación débil ignora el prefijo W/
+    weak = etag[2:] if etag.startswith("W/") else etag
+    return "*" in candidates or any((tag[2:] if tag.startswith("W/") else tag) == weak for tag in candidates)
@@ -0,0 +1,224 @@
+import os
+import time
+import logging
+
+import numpy as np
+
+from src.monitoring.quantile_sketch import KLLSketch
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos, cada proceso se considera líder
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class DriftAggregator:
+    """
+    Agrega los histogramas de drift de todos los workers de la máquina.
+
+    Con gunicorn cada worker tiene su propia ventana de muestras. Cada uno
+    publica periódicamente sus conteos por bin en un archivo de una carpeta
+    compartida (escritura en temporal + rename, así que nunca se lee a
+    medias). Los conteos son sumables: el histograma global es la suma de
+    los de cada worker, y el PSI calculado sobre él refleja todo el tráfico.
+
+    Un único worker, el que tiene el bloqueo de archivo `leader.lock`,
+    ejecuta las verificaciones y escribe el historial. Si ese proceso muere,
+    el sistema operativo libera el bloqueo y otro worker lo toma en su
+    siguiente intento.
+    """
+
+    def __init__(self, shared_dir, stale_after=30.0, heartbeat=10.0):
+        """
+        Inicializa el agregador y crea la carpeta compartida.
+
+        Args:
+            shared_dir: Carpeta compartida por los workers
+            stale_after: Segundos sin publicar tras los que un worker se ignora
+            heartbeat: Segundos máximos entre publicaciones aunque no haya muestras nuevas
+        """
+        self.shared_dir = shared_dir
+        self.stale_after = stale_after
+        self.heartbeat = heartbeat
+        os.makedirs(shared_dir, exist_ok=True)
+        self._pid = None
+        self._lock_file = None
+        self._published_total = None
+        self._published_at = 0.0
+
+    @classmethod
+    def from_env(cls, default_dir):
+        """Crea el agregador a partir de las variables de entorno DRIFT_SHARED_*."""
+        return cls(
+            os.getenv("DRIFT_SHARED_DIR", default_dir),
+            stale_after=float(os.getenv("DRIFT_SHARED_STALE_AFTER", "30")),
+            heartbeat=float(os.getenv("DRIFT_SHARED_HEARTBEAT", "10")),
+        )
+
+    @property
+    def worker_path(self):
+        """Archivo donde publica este proceso."""
+        return os.path.join(self.shared_dir, f"worker-{os.getpid()}.npz")
+
+    def is_fresh(self, window, output_total=0):
+        """
+        Indica si lo publicado sigue vigente: sin muestras ni predicciones nuevas y dentro del latido.
+
+        Args:
+            window: SampleWindow del worker
+            output_total: Predicciones registradas en la salida del modelo desde el arranque
+        """
+        return (
+            (window.total, output_total) == self._published_total
+            and time.monotonic() - self._published_at < self.heartbeat
+        )
+
+    def publish(self, window, time_windows=None, window_sketches=None, output_windows=None, output_total=0):
+        """
+        Publica los conteos por bin de la ventana de este worker.
+
+        No escribe si no hay muestras nuevas desde la última publicación,
+        salvo para renovar el latido cada `heartbeat` segundos.
+
+        Args:
+            window: SampleWindow del worker
+            time_windows: Conteos de las ventanas temporales {etiqueta: (conteos, muestras)}
+            window_sketches: Sketches de las ventanas temporales {etiqueta: [KLLSketch o None por feature]}
+            output_windows: Conteos de la salida del modelo {etiqueta: (conteos, predicciones)}
+            output_total: Predicciones registradas desde el arranque (con muestreo de
+                la captura pueden cambiar sin que cambie la ventana)
+        """
+        if self.is_fresh(window, output_total):
+            return
+        # El nombre termina en .npz para que np.savez no añada la extensión
+        tmp_path = os.path.join(self.shared_dir, f".worker-{os.getpid()}.tmp.npz")
+        arrays = {}
+        for section, windows in (("window", time_windows), ("output", output_windows)):
+            for label, (counts, n_samples) in (windows or {}).items():
+                arrays[f"{section}:{label}:counts"] = counts
+                arrays[f"{section}:{label}:samples"] = np.float64(n_samples)
+        for label, sketches in (window_sketches or {}).items():
+            for f, sketch in enumerate(sketches):
+                if sketch is not None:
+                    arrays[f"sketch:{label}:{f}"] = sketch.to_array()
+        np.savez(
+            tmp_path,
+            bin_counts=window.bin_counts,
+            size=np.int64(len(window)),
+            total=np.int64(window.total),
+            **arrays
+        )
+        os.replace(tmp_path, self.worker_path)
+        self._published_total = (window.total, output_total)
+        self._published_at = time.monotonic()
+
+    def is_leader(self):
+        """
+        Intenta tomar (o confirma) el bloqueo de líder sin esperar.
+
+        Returns:
+            True si este proceso es el que debe ejecutar las verificaciones
+        """
+        if fcntl is None:
+            return True
+        # Tras un fork el bloqueo heredado pertenece al padre: se vuelve a pedir
+        if self._lock_file is not None and self._pid == os.getpid():
+            return True
+        lock_file = open(os.path.join(self.shared_dir, "leader.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        self._pid = os.getpid()
+        logger.info(f"✓ Worker {self._pid} es el líder de las verificaciones de drift")
+        return True
+
+    def merged(self):
+        """
+        Suma los conteos publicados por los workers activos.
+
+        Los archivos de workers que no publican desde hace `stale_after`
+        segundos se ignoran, y se borran pasado el triple de ese tiempo.
+
+        Returns:
+            Diccionario con "bin_counts", "size" (muestras en ventana),
+            "total" (muestras recibidas), "windows" {ventana temporal:
+            (conteos, muestras)}, "sketches" {ventana temporal: [KLLSketch o
+            None por feature]} y "outputs" {ventana: (conteos, predicciones)},
+            o None si ningún worker ha publicado
+        """
+        counts = None
+        size = total = 0
+        # Secciones de conteos sumables: prefijo en el archivo -> {etiqueta: (conteos, muestras)}
+        sections = {"window": {}, "output": {}}
+        window_sketches = {}
+        now = time.time()
+        for name in os.listdir(self.shared_dir):
+            if not (name.startswith("worker-") and name.endswith(".npz")):
+                continue
+            path = os.path.join(self.shared_dir, name)
+            try:
+                age = now - os.path.getmtime(path)
+                if age > self.stale_after:
+                    if age > 3 * self.stale_after:
+                        os.remove(path)
+                    continue
+                with np.load(path) as data:
+                    worker_counts = data["bin_counts"]
+                    if counts is not None and worker_counts.shape != counts.shape:
+                        raise ValueError(f"forma {worker_counts.shape} distinta de {counts.shape}")
+                    counts = worker_counts.copy() if counts is None else counts + worker_counts
+                    size += int(data["size"])
+                    total += int(data["total"])
+                    for key in data.files:
+                        section = key.split(":", 1)[0]
+                        if section in sections and key.endswith(":counts"):
+                            label = key[len(section) + 1:-len(":counts")]
+                            window_counts = data[key]
+                            window_samples = float(data[f"{section}:{label}:samples"])
+                            if label in sections[section]:
+                                previous_counts, previous_samples = sections[section][label]
+                                window_counts = previous_counts + window_counts
+                                window_samples += previous_samples
+                            sections[section][label] = (window_counts, window_samples)
+                        elif section == "sketch":
+                            # Los sketches se fusionan: el resultado vale para todo el tráfico
+                            _, label, f = key.rsplit(":", 2)
+                            sketches = window_sketches.setdefault(label, [None] * counts.shape[0])
+                            sketch = KLLSketch.from_array(data[key])
+                            f = int(f)
+                            sketches[f] = sketch if sketches[f] is None else sketches[f].merge(sketch)
+            except (OSError, ValueError, KeyError) as e:
+                # El worker pudo terminar entre listdir y la lectura, o usar otra referencia
+                logger.warning(f"⚠ No se pudo leer {path}: {str(e)}")
+        if counts is None:
+            return None
+        # Las ventanas cuentan muestras enteras; solo la de decaimiento es fraccionaria
+        for section, windows in sections.items():
+            sections[section] = {
+                label: (window_counts, window_samples if label == "decayed" else int(window_samples))
+                for label, (window_counts, window_samples) in windows.items()
+            }
+        return {
+            "bin_counts": counts,
+            "size": size,
+            "total": total,
+            "windows": sections["window"],
+            "sketches": window_sketches,
+            "outputs": sections["output"],
+        }
+
+    def close(self):
+        """Retira la publicación de este worker y libera el bloqueo de líder."""
+        try:
+            if os.path.exists(self.worker_path):
+                os.remove(self.worker_path)
+        except OSError as e:
+            logger.warning(f"⚠ No se pudo eliminar {self.worker_path}: {str(e)}")
+        if self._lock_file is not None and self._pid == os.getpid():
+            self._lock_file.close()
+        self._lock_file = None
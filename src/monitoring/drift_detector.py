@@ -3,31 +3,79 @@ import json
 import os
 from datetime import datetime
 import logging
+import threading
+import time
+
+from src.monitoring.capture_policy import CapturePolicy
+from src.monitoring.history_store import DriftHistoryStore
+from src.monitoring.output_monitor import OutputMonitor, load_output_reference
+from src.monitoring.quantile_sketch import (
+    HistogramDistribution, TimeBucketedSketches, compare_distributions, load_reference_sketches
+)
+from src.monitoring.sample_window import SampleWindow
+from src.monitoring.time_buckets import DEFAULT_WINDOWS, TimeBucketedHistogram
+from src.utils.logging_utils import SampledLogger
 
 logger = logging.getLogger(__name__)
+hot_log = SampledLogger.from_env(logger)
 
 class DriftDetector:
-    def __init__(self, reference_path, threshold=0.2, history_path=None):
+    def __init__(self, reference_path, threshold=0.2, history_path=None, window_size=10000, auto_check=True,
+                 history_store=None, aggregator=None, windows=None, bucket_seconds=60, decay_half_life=3600.0,
+                 sketch_k=128, sketch_block_seconds=300, reference_sketch_path=None, output_reference_path=None,
+                 capture_policy=None):
         """
         Inicializa el detector con estadísticas de referencia.
         
         Args:
             reference_path: Ruta al archivo JSON con estadísticas de referencia
             threshold: Umbral de PSI para considerar que hay drift
-            history_path: Ruta donde se guardará el historial de métricas de drift
+            history_path: Ruta del historial JSON anterior; el historial se guarda
+                en una base SQLite con el mismo nombre y extensión .db, y el JSON
+                se importa la primera vez
+            window_size: Número máximo de muestras recientes que se conservan
+            auto_check: Si add_sample verifica el drift cada 50 muestras; desactivar
+                cuando las verificaciones las ejecuta un DriftScheduler
+            history_store: DriftHistoryStore ya configurado (opcional; por defecto
+                se crea a partir de history_path)
+            aggregator: DriftAggregator opcional; si se indica, el PSI se calcula
+                sobre los conteos sumados de todos los workers
+            windows: Ventanas temporales del PSI {etiqueta: segundos}
+                (por defecto 15m, 1h y 24h)
+            bucket_seconds: Resolución en segundos de las ventanas temporales
+            decay_half_life: Semivida en segundos del PSI con decaimiento exponencial
+            sketch_k: Precisión de los sketches de cuantiles (error de rango ~1/k)
+            sketch_block_seconds: Resolución en segundos de los sketches por ventana
+            reference_sketch_path: JSON con sketches de los datos de entrenamiento
+                (opcional; si no existe, la referencia se interpola del histograma)
+            output_reference_path: JSON con el histograma de probabilidades y la
+                tasa de fraude de entrenamiento (opcional)
+            capture_policy: CapturePolicy que decide qué peticiones se registran
+                (por defecto, todas)
         """
         logger.info(f"Inicializando DriftDetector con archivo: {reference_path}")
         self.threshold = threshold
-        self.samples = []
+        self.auto_check = auto_check
+        self.aggregator = aggregator
+        self.capture = capture_policy or CapturePolicy()
+        # check_drift puede llamarse desde el planificador y desde el endpoint a la vez
+        self._check_lock = threading.Lock()
+        # Ventana, sketches y salida: se escriben desde el event loop (sin DriftIngestQueue)
+        # o desde el hilo de la cola, y check_drift los lee desde el planificador
+        self._state_lock = threading.Lock()
         self.reference_stats_path = reference_path  # Guardar la ruta para referencia
         
         # Configurar ruta del historial
         if history_path is None:
             # Usar la misma carpeta que reference_path
             dir_path = os.path.dirname(reference_path)
-            self.history_path = os.path.join(dir_path, "drift_history.json")
-        else:
-            self.history_path = history_path
+            history_path = os.path.join(dir_path, "drift_history.json")
+        self.legacy_history_path = history_path
+        
+        if history_store is None:
+            history_store = DriftHistoryStore(os.path.splitext(history_path)[0] + ".db", legacy_json_path=history_path)
+        self.history_store = history_store
+        self.history_path = history_store.path
             
         logger.info(f"Historial de drift se guardará en: {self.history_path}")
         
@@ -45,51 +93,308 @@ class DriftDetector:
             logger.error(error_msg)
             raise ValueError(error_msg)
         
-        # Cargar historial existente o crear uno nuevo
-        self._load_history()
+        # Ventana acotada de muestras recientes, una columna por feature de referencia,
+        # con el histograma de cada feature sobre los bins de referencia
+        self.samples = SampleWindow(
+            list(self.reference.keys()),
+            capacity=window_size,
+            bin_edges=[stats.get("bins") for stats in self.reference.values()]
+        )
+        # Conteos por minuto para el PSI de ventanas recientes y con decaimiento
+        self.windows = dict(DEFAULT_WINDOWS if windows is None else windows)
+        self.time_histogram = TimeBucketedHistogram(
+            self.samples.bin_counts.shape,
+            bucket_seconds=bucket_seconds,
+            retention_seconds=max(self.windows.values(), default=bucket_seconds),
+            half_life=decay_half_life
+        )
+        self.samples.time_histogram = self.time_histogram
+        # Sketches de cuantiles por bloque de tiempo: KS, Wasserstein y cuantiles por ventana
+        self.sketches = TimeBucketedSketches(
+            len(self.samples.feature_names),
+            block_seconds=sketch_block_seconds,
+            retention_seconds=max(self.windows.values(), default=sketch_block_seconds),
+            k=sketch_k
+        )
+        self._compile_reference()
+        self.reference_distributions = self._load_reference_distributions(reference_sketch_path)
+        # Salida del modelo (probabilidades y tasa de fraude) con las mismas ventanas
+        self.outputs = OutputMonitor(
+            reference=load_output_reference(output_reference_path),
+            windows=self.windows,
+            bucket_seconds=bucket_seconds,
+            decay_half_life=decay_half_life,
+            psi_threshold=threshold
+        )
+        logger.info(f"Ventana de muestras de drift: {window_size} muestras ({self.samples.nbytes / 1024:.0f} KB)")
+        logger.info(
+            f"Ventanas temporales de drift: {list(self.windows)} en intervalos de {bucket_seconds}s "
+            f"({self.time_histogram.nbytes / 1024:.0f} KB)"
+        )
+        logger.info(f"Captura de muestras de drift: {self.capture.stats()}")
     
-    def _load_history(self):
-        """Carga el historial de drift desde el archivo o crea uno nuevo."""
-        try:
-            if os.path.exists(self.history_path):
-                with open(self.history_path, 'r') as f:
-                    self.history = json.load(f)
-                logger.info(f"Historial de drift cargado con {len(self.history.get('timestamps', []))} registros")
+    def _compile_reference(self):
+        """
+        Compila las estadísticas de referencia en matrices (features x bins).
+        
+        Las features con distinto número de bins se rellenan con proporción 1
+        (aporta 0 al PSI) y una máscara marca los bins válidos, así que el PSI de todas las features
+        se calcula en una única pasada vectorizada sobre la matriz de conteos
+        de la ventana.
+        """
+        self.feature_names = list(self.reference.keys())
+        n_features, max_bins = self.samples.bin_counts.shape
+        self.ref_proportions = np.ones((n_features, max_bins))
+        self.bin_mask = np.zeros((n_features, max_bins), dtype=bool)
+        self.psi_enabled = np.zeros(n_features, dtype=bool)
+        
+        for i, feature in enumerate(self.feature_names):
+            stats = self.reference[feature]
+            if "histogram" not in stats or "bins" not in stats:
+                logger.warning(f"La feature {feature} no tiene histograma de referencia; se omite del PSI")
+                continue
+            ref_hist = np.asarray(stats["histogram"], dtype=np.float64)
+            if len(ref_hist) != len(stats["bins"]) - 1 or ref_hist.sum() <= 0:
+                logger.error(f"Histograma de referencia inválido para {feature}; se omite del PSI")
+                continue
+            
+            # Normalizar y evitar ceros una sola vez
+            n_bins = len(ref_hist)
+            self.ref_proportions[i, :n_bins] = np.maximum(ref_hist / ref_hist.sum(), 1e-6)
+            self.bin_mask[i, :n_bins] = True
+            self.psi_enabled[i] = True
+        
+        self._log_ref_proportions = np.log(self.ref_proportions)
+    
+    def _load_reference_distributions(self, reference_sketch_path):
+        """
+        Distribución de referencia de cada feature para KS, Wasserstein y cuantiles.
+        
+        Usa los sketches de entrenamiento si existen; si no, interpola el
+        histograma de referencia (uniforme dentro de cada bin).
+        """
+        sketches = {}
+        if reference_sketch_path and os.path.exists(reference_sketch_path):
+            try:
+                sketches = load_reference_sketches(reference_sketch_path)
+                logger.info(f"✓ Sketches de referencia cargados de {reference_sketch_path}: {list(sketches)}")
+            except Exception as e:
+                logger.error(f"Error al cargar los sketches de referencia {reference_sketch_path}: {str(e)}")
+        
+        distributions = {}
+        for i, feature in enumerate(self.feature_names):
+            if feature in sketches:
+                distributions[feature] = sketches[feature]
+            elif self.psi_enabled[i]:
+                stats = self.reference[feature]
+                distributions[feature] = HistogramDistribution(stats["bins"], stats["histogram"])
+        return distributions
+    
+    def publish_counts(self):
+        """Publica los conteos y sketches de este worker en el agregador."""
+        output_total = self.outputs.total_samples
+        if self.aggregator.is_fresh(self.samples, output_total):
+            return
+        self.aggregator.publish(
+            self.samples,
+            self.time_histogram.snapshot(self.windows),
+            self.sketches.snapshot(self.windows),
+            self.outputs.snapshot(),
+            output_total
+        )
+    
+    def _collect_counts(self):
+        """
+        Conteos por bin y sketches sobre los que se calculan las métricas.
+        
+        Con agregador son la suma de lo publicado por todos los workers (este
+        incluido); si aún no hay publicaciones, los locales.
+        
+        Returns:
+            Diccionario con "bin_counts" (features x bins), "size" (muestras en
+            la ventana), "windows" {ventana temporal: (conteos, muestras)},
+            "sketches" {ventana temporal: lista de KLLSketch por feature} y
+            "outputs" {ventana: (conteos de salida, predicciones)}
+        """
+        if self.aggregator is not None:
+            try:
+                with self._state_lock:
+                    self.publish_counts()
+                merged = self.aggregator.merged()
+                if merged is not None:
+                    return merged
+            except Exception as e:
+                logger.error(f"Error al agregar los conteos de los workers: {str(e)}")
+        # Copias tomadas a la vez: las escrituras posteriores no las alteran
+        with self._state_lock:
+            return {
+                "bin_counts": self.samples.bin_counts.copy(),
+                "size": len(self.samples),
+                "windows": self.time_histogram.snapshot(self.windows),
+                "sketches": self.sketches.snapshot(self.windows),
+                "outputs": self.outputs.snapshot(),
+            }
+    
+    def window_counts(self):
+        """
+        Conteos por bin y número de muestras de la ventana de muestras.
+        
+        Returns:
+            Tupla (matriz features x bins, muestras en la ventana)
+        """
+        collected = self._collect_counts()
+        return collected["bin_counts"], collected["size"]
+    
+    def _distribution_stats(self, sketches):
+        """KS, Wasserstein-1 y desplazamiento de cuantiles de cada feature frente a la referencia."""
+        stats = {}
+        for feature, sketch in zip(self.feature_names, sketches):
+            reference = self.reference_distributions.get(feature)
+            if reference is None or sketch is None or not len(sketch):
+                continue
+            try:
+                stats[feature] = compare_distributions(reference, sketch)
+            except Exception as e:
+                logger.error(f"Error al comparar la distribución de {feature}: {str(e)}")
+        return stats
+    
+    def _window_results(self, window_counts, window_sketches=None):
+        """PSI, estadísticos de distribución y estado de cada ventana temporal."""
+        window_sketches = window_sketches or {}
+        results = {}
+        for label, (counts, sample_count) in window_counts.items():
+            entry = {"sample_count": sample_count if label != "decayed" else round(float(sample_count), 2)}
+            if label == "decayed":
+                entry["half_life_seconds"] = self.time_histogram.half_life
+            psi_values = self.calculate_psi_all(counts, sample_count)
+            if psi_values is None:
+                entry["status"] = "insufficient_data"
             else:
-                # Inicializar un historial vacío
-                self.history = {
-                    "timestamps": [],
-                    "drift_scores": {feature: [] for feature in self.reference.keys()}
+                features = {
+                    feature: {"psi": psi, "drifting": bool(psi > self.threshold)}
+                    for feature, psi in psi_values.items() if psi is not None
                 }
-                logger.info("Creado nuevo historial de drift")
+                entry["status"] = "drift_detected" if any(f["drifting"] for f in features.values()) else "normal"
+                # El PSI decide el estado; KS, Wasserstein y cuantiles ven cambios dentro de un bin y en las colas
+                if label in window_sketches:
+                    for feature, stats in self._distribution_stats(window_sketches[label]).items():
+                        features.setdefault(feature, {}).update(stats)
+                entry["features"] = features
+            results[label] = entry
+        return results
+    
+    def calculate_psi_windows(self):
+        """
+        Calcula el PSI de cada ventana temporal y de la variante con decaimiento.
+        
+        Las ventanas temporales incluyen además, por feature, la distancia KS,
+        la de Wasserstein-1 y el desplazamiento de cuantiles según los sketches.
+        
+        Returns:
+            Diccionario {ventana: {"status", "sample_count", "features"}}
+        """
+        collected = self._collect_counts()
+        return self._window_results(collected["windows"], collected["sketches"])
+    
+    def output_report(self):
+        """
+        PSI de las probabilidades y desviación de la tasa de fraude por ventana.
+        
+        Returns:
+            Diccionario {ventana: resultado de OutputMonitor.evaluate}, con
+            "all" para todo lo registrado desde el arranque
+        """
+        return self.outputs.report(self._collect_counts()["outputs"])
+    
+    def add_predictions(self, predictions, probabilities):
+        """
+        Registra las predicciones servidas para monitorear la salida del modelo.
+        
+        Args:
+            predictions: Clases predichas (una o varias)
+            probabilities: Probabilidades de fraude correspondientes
+            
+        Returns:
+            True si se registraron correctamente, False en caso contrario
+        """
+        try:
+            with self._state_lock:
+                if np.ndim(probabilities) == 0:
+                    self.outputs.record(predictions, probabilities)
+                else:
+                    self.outputs.record_batch(predictions, probabilities)
+            return True
         except Exception as e:
-            logger.error(f"Error al cargar historial de drift: {str(e)}")
-            # Inicializar un historial vacío en caso de error
-            self.history = {
-                "timestamps": [],
-                "drift_scores": {feature: [] for feature in self.reference.keys()}
-            }
+            logger.error(f"Error al registrar predicciones: {str(e)}")
+            return False
     
-    def _save_history(self):
-        """Guarda el historial de drift en el archivo JSON."""
+    def calculate_psi_all(self, counts=None, sample_count=None):
+        """
+        Calcula el PSI de todas las features en una sola pasada.
+        
+        Args:
+            counts: Matriz de conteos (features x bins); por defecto, window_counts()
+            sample_count: Muestras que representan `counts`
+        
+        Returns:
+            Diccionario {feature: PSI} (None si la feature no tiene referencia
+            o ninguna muestra cae dentro de sus bins), o None si no hay
+            suficientes muestras
+        """
+        if counts is None:
+            counts, sample_count = self.window_counts()
+        if sample_count < 100:
+            return None
+        
+        counts = counts.astype(np.float64)
+        totals = counts.sum(axis=1, keepdims=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            current = np.maximum(counts / totals, 1e-6)
+        # Los bins de relleno valen 1 en ambas matrices y aportan 0 al PSI
+        current[~self.bin_mask] = 1.0
+        
+        terms = (current - self.ref_proportions) * (np.log(current) - self._log_ref_proportions)
+        psi = terms.sum(axis=1)
+        
+        valid = self.psi_enabled & (totals[:, 0] > 0)
+        return {
+            feature: (float(value) if ok else None)
+            for feature, value, ok in zip(self.feature_names, psi.tolist(), valid.tolist())
+        }
+    
+    def load_history(self):
+        """
+        Lee el historial completo en el formato del antiguo drift_history.json.
+
+        Decodifica toda la tabla de SQLite; para rangos o páginas usar
+        history_store.query.
+        """
+        return self.history_store.load_history()
+    
+    def _save_history(self, timestamp, scores, status, sample_count):
+        """Añade el resultado de una verificación al historial (una sola inserción)."""
         try:
-            # Crear directorio si no existe
-            os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
-            
-            with open(self.history_path, 'w') as f:
-                json.dump(self.history, f, indent=2)
-            logger.info(f"Historial de drift guardado en {self.history_path}")
+            self.history_store.append(timestamp, scores, status=status, sample_count=sample_count)
+            logger.info(f"Verificación de drift guardada en {self.history_path}")
         except Exception as e:
             logger.error(f"Error al guardar historial de drift: {str(e)}")
     
-    def add_sample(self, sample_data):
+    def add_sample(self, sample_data, weight=None, prediction=None):
         """
-        Registra una nueva muestra para análisis.
+        Registra una nueva muestra para análisis, si la política de captura la acepta.
         
         Args:
             sample_data: Diccionario con los valores de las features
+            weight: Peso ya decidido con capture.decide() (por defecto se decide
+                aquí); permite descartar la petición antes de construir la muestra
+            prediction: Clase predicha, para la captura estratificada
         """
         try:
+            if weight is None:
+                weight = self.capture.decide(prediction)
+            if not weight:
+                return True
+            
             # Primero verificar que las features necesarias estén presentes
             expected_features = set(self.reference.keys())
             provided_features = set(sample_data.keys())
@@ -98,17 +403,18 @@ class DriftDetector:
             if missing_features:
                 logger.warning(f"Advertencia: Faltan features en la muestra: {missing_features}")
         
-            # Después agregar la muestra
-            self.samples.append({
-                "timestamp": datetime.now().isoformat(),
-                **sample_data
-            })
+            # Después agregar la muestra a la ventana (NaN en las features ausentes)
+            row = [sample_data.get(name, np.nan) for name in self.samples.feature_names]
+            timestamp_ns = time.time_ns()
+            with self._state_lock:
+                self._capture_row(row, timestamp_ns, weight)
         
-            logger.info(f"Muestra registrada: {sample_data}")
-            logger.info(f"Total de muestras acumuladas: {len(self.samples)}")
+            # Se llama en cada predicción: nivel DEBUG, formato diferido y muestreo
+            hot_log.debug("drift_add_sample", "Muestra registrada: %s. Total acumulado: %d", sample_data, len(self.samples))
             
             # Verificar si tenemos suficientes muestras para calcular drift
-            if len(self.samples) >= 100 and len(self.samples) % 50 == 0:
+            # (la cadencia usa el total recibido: la ventana deja de crecer al llenarse)
+            if self.auto_check and len(self.samples) >= 100 and self.samples.total % 50 == 0:
                 # Cada 50 muestras después de alcanzar 100, verificamos y guardamos el drift
                 drift_result = self.check_drift()
                 logger.info(f"Verificación automática de drift: {drift_result['status']}")
@@ -118,6 +424,84 @@ class DriftDetector:
             logger.error(f"Error al agregar muestra: {str(e)}")
             return False
         
+    def _capture_row(self, row, timestamp_ns, weight):
+        # La ventana y las ventanas temporales pueden ponderar distinto (reservoir)
+        self.samples.append(
+            row, timestamp_ns,
+            weight=self.capture.window_weight(weight),
+            position=self.capture.slot(self.samples),
+            time_weight=weight
+        )
+        self.sketches.add_row(row, timestamp_ns, weight)
+
+    def add_samples(self, values, feature_names, predictions=None, weights=None):
+        """
+        Registra un lote de muestras para análisis en una sola llamada.
+        
+        Args:
+            values: Matriz (n_muestras x n_features) con los valores de las features
+            feature_names: Nombres de las columnas de `values`, en orden
+            predictions: Clases predichas, para la captura estratificada
+            weights: Pesos de captura ya decididos por fila (p. ej. filas de una
+                DriftIngestQueue); si se indican no se vuelve a aplicar la política
+            
+        Returns:
+            True si el lote se registró correctamente, False en caso contrario
+        """
+        try:
+            feature_names = list(feature_names)
+            values = np.asarray(values, dtype=float)
+            if values.ndim != 2 or values.shape[1] != len(feature_names):
+                raise ValueError(f"Se esperaba una matriz (n x {len(feature_names)}), recibida {values.shape}")
+            
+            # Filtrar primero: las filas no capturadas no se reordenan ni se binan
+            if weights is None:
+                weights = self.capture.decide_many(len(values), predictions)
+            else:
+                weights = np.asarray(weights, dtype=np.float64)
+            captured = weights > 0
+            if not captured.any():
+                return True
+            if not captured.all():
+                values = values[captured]
+                weights = weights[captured]
+            
+            missing_features = set(self.reference.keys()) - set(feature_names)
+            if missing_features:
+                logger.warning(f"Advertencia: Faltan features en el lote: {missing_features}")
+            
+            # Reordenar las columnas del lote a las de la ventana (NaN en las ausentes)
+            positions = [feature_names.index(name) if name in feature_names else -1
+                         for name in self.samples.feature_names]
+            if positions != list(range(values.shape[1])):
+                padded = np.column_stack([values, np.full(len(values), np.nan)])
+                values = padded[:, positions]
+            
+            # Un único timestamp para todo el lote
+            timestamp_ns = time.time_ns()
+            with self._state_lock:
+                previous_total = self.samples.total
+                if self.capture.random_slots:
+                    # Reservoir: cada fila aceptada sustituye una posición al azar
+                    for row, weight in zip(values.tolist(), weights.tolist()):
+                        self._capture_row(row, timestamp_ns, weight)
+                else:
+                    uniform = bool(np.all(weights == 1.0))
+                    self.samples.extend(values, timestamp_ns, weights=None if uniform else weights)
+                    self.sketches.add_batch(values, timestamp_ns, None if uniform else weights)
+                total = self.samples.total
+            hot_log.info("drift_add_samples", "Lote de %d muestras registrado. Total acumulado: %d", len(values), total)
+            
+            # Misma cadencia que add_sample: verificar si el lote cruzó un múltiplo de 50
+            if self.auto_check and len(self.samples) >= 100 and total // 50 > previous_total // 50:
+                drift_result = self.check_drift()
+                logger.info(f"Verificación automática de drift: {drift_result['status']}")
+            
+            return True
+        except Exception as e:
+            logger.error(f"Error al agregar lote de muestras: {str(e)}")
+            return False
+        
     def calculate_psi(self, feature):
         """
         Calcula PSI (Population Stability Index) para una feature.
@@ -129,88 +513,83 @@ class DriftDetector:
             Valor PSI o None si no hay suficientes muestras
         """
         try:
-            if len(self.samples) < 100:
+            psi_values = self.calculate_psi_all()
+            if psi_values is None:
                 return None
-                
-            # Extraer valores de la feature de las muestras
-            values = [s[feature] for s in self.samples if feature in s]
-            
-            # Obtener histograma de referencia
-            ref_hist = np.array(self.reference[feature]["histogram"])
-            ref_bins = np.array(self.reference[feature]["bins"])
-            
-            # Calcular histograma actual con los mismos bins
-            current_hist, _ = np.histogram(values, bins=ref_bins)
-            
-            # Normalizar y evitar ceros
-            ref_hist = np.maximum(ref_hist / sum(ref_hist), 1e-6)
-            current_hist = np.maximum(current_hist / sum(current_hist), 1e-6)
-            
-            # Calcular PSI
-            psi = np.sum((current_hist - ref_hist) * np.log(current_hist / ref_hist))
-            return psi
+            return psi_values.get(feature)
         except Exception as e:
             logger.error(f"Error al calcular PSI para {feature}: {str(e)}")
             return None
     
     def check_drift(self):
         """
-        Verifica si hay drift en alguna feature y actualiza el historial.
+        Verifica si hay drift en alguna feature y, en el worker líder, actualiza el historial.
         
         Returns:
             Diccionario con resultados del análisis de drift
         """
-        try:
-            if len(self.samples) < 100:
+        with self._check_lock:
+            try:
+                collected = self._collect_counts()
+                counts, sample_count = collected["bin_counts"], collected["size"]
+                # La salida del modelo se evalúa aparte: no cambia el estado del drift de entrada
+                output = self.outputs.report(collected["outputs"])
+                if sample_count < 100:
+                    return {
+                        "status": "insufficient_data",
+                        "count": sample_count,
+                        "output": output
+                    }
+                
+                results = {}
+                scores = {}
+                drift_detected = False
+                current_time = datetime.now().isoformat()
+                
+                # PSI de todas las features en una única pasada vectorizada
+                psi_values = self.calculate_psi_all(counts, sample_count) or {}
+                
+                for feature in self.reference:
+                    psi = psi_values.get(feature)
+                    if psi is not None:
+                        # Convertir explícitamente np.bool_ a bool de Python
+                        is_drifting = bool(psi > self.threshold)
+                        
+                        if is_drifting:
+                            drift_detected = True
+                        
+                        # Convertir valores numpy a tipos nativos de Python
+                        psi_value = float(psi)
+                        
+                        # Guardar en resultados
+                        results[feature] = {
+                            "psi": psi_value,
+                            "drifting": is_drifting
+                        }
+                        
+                        # Guardar en el historial
+                        scores[feature] = psi_value
+                
+                status = "drift_detected" if bool(drift_detected) else "normal"
+                
+                # Añadir solo esta verificación al historial; con varios workers
+                # solo escribe el líder, para que el historial sea una única serie
+                if self.aggregator is None or self.aggregator.is_leader():
+                    self._save_history(current_time, scores, status, sample_count)
+                
                 return {
-                    "status": "insufficient_data",
-                    "count": len(self.samples)
+                    "status": status,
+                    "features": results,
+                    "sample_count": sample_count,
+                    "timestamp": current_time,
+                    # PSI reciente: el de la ventana completa puede ocultar un drift nuevo
+                    "windows": self._window_results(collected["windows"], collected["sketches"]),
+                    "output": output
                 }
-            
-            results = {}
-            drift_detected = False
-            current_time = datetime.now().isoformat()
-            
-            # Añadir timestamp al historial
-            self.history["timestamps"].append(current_time)
-            
-            for feature in self.reference:
-                psi = self.calculate_psi(feature)
-                if psi is not None:
-                    # Convertir explícitamente np.bool_ a bool de Python
-                    is_drifting = bool(psi > self.threshold)
-                    
-                    if is_drifting:
-                        drift_detected = True
-                    
-                    # Convertir valores numpy a tipos nativos de Python
-                    psi_value = float(psi)
-                    
-                    # Guardar en resultados
-                    results[feature] = {
-                        "psi": psi_value,
-                        "drifting": is_drifting
-                    }
-                    
-                    # Guardar en el historial
-                    if feature not in self.history["drift_scores"]:
-                        self.history["drift_scores"][feature] = []
-                    
-                    self.history["drift_scores"][feature].append(psi_value)
-            
-            # Guardar el historial actualizado
-            self._save_history()
-            
-            return {
-                "status": "drift_detected" if bool(drift_detected) else "normal",
-                "features": results,
-                "sample_count": len(self.samples),
-                "timestamp": current_time
-            }
-        except Exception as e:
-            logger.error(f"Error al verificar drift: {str(e)}")
-            return {
-                "status": "error",
-                "error": str(e),
-                "timestamp": datetime.now().isoformat()
-            }
\ No newline at end of file
+            except Exception as e:
+                logger.error(f"Error al verificar drift: {str(e)}")
+                return {
+                    "status": "error",
+                    "error": str(e),
+                    "timestamp": datetime.now().isoformat()
+                }
\ No newline at end of file
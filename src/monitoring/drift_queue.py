@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class DriftIngestQueue:
+    """
+    Cola en memoria entre el camino de servicio y el detector de drift.
+
+    Las peticiones solo encolan su fila de features (ya en el orden de
+    `feature_names`) y el peso de captura; una tarea del event loop vacía
+    la cola cada `flush_interval` segundos y registra todo lo acumulado con
+    una sola llamada vectorizada a DriftDetector.add_samples. Así el coste
+    del drift por petición es un append a un deque, sin diccionarios,
+    comprobación de features ni marca de tiempo propia.
+
+    El vaciado corre en un executor de un solo hilo, no en el event loop.
+    Conviene pasar el del DriftScheduler: las escrituras en la ventana y
+    las verificaciones de drift quedan serializadas en el mismo hilo.
+
+    La cola está acotada: si el detector no da abasto se descartan las
+    entradas más antiguas y se cuentan en `dropped`.
+    """
+
+    def __init__(self, detector, feature_names, max_rows=100000, flush_interval=0.25, max_batch=10000,
+                 executor=None):
+        """
+        Inicializa la cola.
+
+        Args:
+            detector: DriftDetector que recibe los lotes
+            feature_names: Nombres de las columnas de las filas encoladas, en orden
+            max_rows: Entradas máximas pendientes antes de descartar las más antiguas
+            flush_interval: Segundos entre vaciados de la cola
+            max_batch: Filas máximas por llamada a add_samples
+            executor: Executor donde se vacía la cola (por defecto, uno propio de un hilo)
+        """
+        self.detector = detector
+        self.feature_names = list(feature_names)
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = deque(maxlen=max_rows)
+        self._task = None
+        self.executor = executor
+        self._owns_executor = False
+        # Un vaciado a la vez aunque se pidan desde el planificador y desde un endpoint
+        self._flush_lock = threading.Lock()
+        self.stats_counters = {"enqueued": 0, "ingested": 0, "dropped": 0, "flushes": 0, "failures": 0}
+
+    @classmethod
+    def from_env(cls, detector, feature_names, executor=None):
+        """Crea la cola a partir de las variables de entorno DRIFT_QUEUE_*."""
+        return cls(
+            detector,
+            feature_names,
+            max_rows=int(os.getenv("DRIFT_QUEUE_MAX_ROWS", "100000")),
+            flush_interval=float(os.getenv("DRIFT_QUEUE_FLUSH_INTERVAL", "0.25")),
+            max_batch=int(os.getenv("DRIFT_QUEUE_MAX_BATCH", "10000")),
+            executor=executor,
+        )
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _drop_oldest(self):
+        # El deque acotado descarta la entrada más antigua al añadir; se cuentan sus filas
+        values, _ = self._queue[0]
+        self.stats_counters["dropped"] += len(values) if np.ndim(values) == 2 else 1
+
+    def put(self, row, weight=1.0):
+        """
+        Encola una fila de features.
+
+        Args:
+            row: Arreglo 1D en el orden de `feature_names`
+            weight: Peso de captura decidido por la política del detector
+        """
+        if len(self._queue) == self.max_rows:
+            self._drop_oldest()
+        self._queue.append((row, weight))
+        self.stats_counters["enqueued"] += 1
+
+    def put_many(self, values, weights=None):
+        """
+        Encola un lote de filas como una sola entrada.
+
+        Args:
+            values: Matriz (n_muestras x n_features) en el orden de `feature_names`
+            weights: Pesos de captura por fila (por defecto, 1)
+        """
+        if len(values) == 0:
+            return
+        if len(self._queue) == self.max_rows:
+            self._drop_oldest()
+        self._queue.append((values, np.ones(len(values)) if weights is None else weights))
+        self.stats_counters["enqueued"] += len(values)
+
+    def flush(self):
+        """
+        Registra en el detector todo lo pendiente, en lotes de hasta `max_batch` filas.
+
+        Es bloqueante (add_samples y, sin planificador, la verificación
+        automática); desde el event loop usar flush_async.
+
+        Returns:
+            Número de filas registradas
+        """
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        ingested = 0
+        while self._queue:
+            rows = []
+            weights = []
+            n = 0
+            while self._queue and n < self.max_batch:
+                values, weight = self._queue.popleft()
+                rows.append(values)
+                weights.append(weight)
+                n += len(values) if np.ndim(values) == 2 else 1
+            weights = np.concatenate([np.atleast_1d(w) for w in weights]).astype(np.float64)
+            # add_samples registra sus propios errores y devuelve False
+            if self.detector.add_samples(np.vstack(rows), self.feature_names, weights=weights):
+                ingested += n
+            else:
+                self.stats_counters["failures"] += 1
+        if ingested:
+            self.stats_counters["ingested"] += ingested
+            self.stats_counters["flushes"] += 1
+        return ingested
+
+    async def flush_async(self):
+        """Ejecuta flush en el executor de la cola, sin ocupar el event loop."""
+        if not self._queue:
+            return 0
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.flush)
+
+    def start(self):
+        """Arranca el vaciado periódico en el event loop actual."""
+        if self._task is None or self._task.done():
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="drift-ingest")
+                self._owns_executor = True
+            self._task = asyncio.get_running_loop().create_task(self._run_loop())
+            logger.info(f"✓ Cola de muestras de drift: vaciado cada {self.flush_interval}s")
+
+    async def _run_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush_async()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # La tarea no debe morir: la cola seguiría llenándose y descartando filas
+                self.stats_counters["failures"] += 1
+                logger.error(f"✗ Error al vaciar la cola de muestras de drift: {str(e)}")
+
+    async def stop(self):
+        """Cancela la tarea de fondo, registra lo que quede en la cola y libera el hilo propio."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush_async()
+        except Exception as e:
+            logger.error(f"✗ Error al vaciar la cola de muestras de drift: {str(e)}")
+        if self._owns_executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+            self._owns_executor = False
+
+    def stats(self):
+        return {**self.stats_counters, "pending": len(self._queue)}
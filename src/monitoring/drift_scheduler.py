@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class DriftScheduler:
+    """
+    Ejecuta las verificaciones de drift en segundo plano, fuera de las peticiones.
+
+    Una tarea del event loop comprueba cada `poll_interval` segundos si toca
+    verificar: por tiempo (han pasado `interval` segundos desde la última) o
+    por volumen (han llegado `every_n_samples` muestras nuevas). La
+    verificación (PSI + escritura del historial) corre en un hilo propio,
+    así que no ocupa el event loop ni los hilos de inferencia.
+
+    Con un DriftAggregator (varios workers), cada worker publica sus conteos
+    en cada comprobación y solo el líder verifica, sobre los conteos y el
+    total de muestras de todos los workers.
+    """
+
+    def __init__(self, detector, interval=60.0, every_n_samples=50, min_samples=100,
+                 poll_interval=1.0, duration_metric=None, aggregator=None):
+        """
+        Inicializa el planificador.
+
+        Args:
+            detector: DriftDetector a verificar
+            interval: Segundos entre verificaciones (0 desactiva el disparo por tiempo)
+            every_n_samples: Muestras nuevas que disparan una verificación (0 lo desactiva)
+            min_samples: Muestras mínimas en la ventana para verificar
+            poll_interval: Segundos entre comprobaciones de si toca verificar
+            duration_metric: Histograma opcional donde observar la duración de cada verificación
+            aggregator: DriftAggregator opcional para verificar el tráfico de todos los workers
+        """
+        self.detector = detector
+        self.interval = interval
+        self.every_n_samples = every_n_samples
+        self.min_samples = min_samples
+        self.poll_interval = poll_interval
+        self.duration_metric = duration_metric
+        self.aggregator = aggregator
+        self._merged_total = None
+        self._merged_size = None
+        self.leader = aggregator is None
+        self._executor = None
+        self._task = None
+        self._last_total = 0
+        self._last_run = time.monotonic()
+        self._last_completed = None
+        self.stats_counters = {"runs": 0, "failures": 0}
+        self.last_duration = None
+        self.last_status = None
+        self.last_run_at = None
+
+    @classmethod
+    def from_env(cls, detector, duration_metric=None, aggregator=None):
+        """Crea el planificador a partir de las variables de entorno DRIFT_CHECK_*."""
+        return cls(
+            detector,
+            interval=float(os.getenv("DRIFT_CHECK_INTERVAL", "60")),
+            every_n_samples=int(os.getenv("DRIFT_CHECK_EVERY_N", "50")),
+            poll_interval=float(os.getenv("DRIFT_CHECK_POLL", "1")),
+            duration_metric=duration_metric,
+            aggregator=aggregator,
+        )
+
+    def start(self):
+        """Arranca la tarea de fondo en el event loop actual."""
+        if self._task is None or self._task.done():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="drift-check")
+            self._task = asyncio.get_running_loop().create_task(self._run_loop())
+            logger.info(
+                f"✓ Verificación de drift en segundo plano: cada {self.interval}s "
+                f"o cada {self.every_n_samples} muestras"
+            )
+
+    @property
+    def executor(self):
+        """Hilo único donde corren las verificaciones (None hasta start())."""
+        return self._executor
+
+    def _sample_total(self):
+        # Con agregador, el total de todos los workers leído en la última sincronización
+        if self._merged_total is not None:
+            return self._merged_total
+        return self.detector.samples.total
+
+    def _window_size(self):
+        if self._merged_size is not None:
+            return self._merged_size
+        return len(self.detector.samples)
+
+    def _sync(self):
+        """
+        Publica los conteos de este worker y, si es el líder, lee los agregados.
+
+        Returns:
+            True si este worker debe verificar
+        """
+        self.detector.publish_counts()
+        self.leader = self.aggregator.is_leader()
+        if not self.leader:
+            return False
+        merged = self.aggregator.merged()
+        if merged is not None:
+            self._merged_size, self._merged_total = merged["size"], merged["total"]
+        return True
+
+    def is_due(self):
+        """Indica si corresponde verificar según el tiempo y las muestras nuevas."""
+        total = self._sample_total()
+        if total < self._last_total:
+            # Un worker dejó de publicar y su tráfico salió del total agregado
+            self._last_total = total
+        new_samples = total - self._last_total
+        if new_samples <= 0 or self._window_size() < self.min_samples:
+            return False
+        if self.every_n_samples and new_samples >= self.every_n_samples:
+            return True
+        return bool(self.interval) and time.monotonic() - self._last_run >= self.interval
+
+    async def _run_loop(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                if self.aggregator is not None:
+                    leader = await asyncio.get_running_loop().run_in_executor(self._executor, self._sync)
+                    if not leader:
+                        continue
+                if self.is_due():
+                    await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error en la verificación de drift en segundo plano: {str(e)}")
+
+    async def run_once(self):
+        """
+        Ejecuta una verificación en el hilo del planificador.
+
+        Returns:
+            Resultado de DriftDetector.check_drift
+        """
+        self._last_run = time.monotonic()
+        self._last_total = self._sample_total()
+        loop = asyncio.get_running_loop()
+        result, duration = await loop.run_in_executor(self._executor, self._timed_check)
+
+        self.stats_counters["runs"] += 1
+        if result.get("status") == "error":
+            self.stats_counters["failures"] += 1
+        self.last_duration = duration
+        self.last_status = result.get("status")
+        self.last_run_at = result.get("timestamp")
+        self._last_completed = time.monotonic()
+        if self.duration_metric is not None:
+            self.duration_metric.observe(duration)
+        logger.info(f"Verificación de drift en segundo plano: {self.last_status} ({duration * 1000:.1f} ms)")
+        return result
+
+    def _timed_check(self):
+        start = time.perf_counter()
+        result = self.detector.check_drift()
+        return result, time.perf_counter() - start
+
+    def lag_seconds(self):
+        """Segundos desde la última verificación completada (None si aún no hubo ninguna)."""
+        if self._last_completed is None:
+            return None
+        return time.monotonic() - self._last_completed
+
+    def lag_samples(self):
+        """Muestras recibidas desde la última verificación."""
+        return max(0, self._sample_total() - self._last_total)
+
+    def stats(self):
+        """
+        Devuelve métricas del planificador.
+
+        Returns:
+            Diccionario con ejecuciones, fallos, última duración y retraso
+        """
+        return {
+            "interval": self.interval,
+            "every_n_samples": self.every_n_samples,
+            **self.stats_counters,
+            "last_status": self.last_status,
+            "last_run_at": self.last_run_at,
+            "last_duration_ms": self.last_duration * 1000.0 if self.last_duration is not None else None,
+            "lag_seconds": self.lag_seconds(),
+            "lag_samples": self.lag_samples(),
+            "aggregated": self.aggregator is not None,
+            "leader": self.leader,
+        }
+
+    async def stop(self):
+        """Cancela la tarea de fondo y libera el hilo."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self.aggregator is not None:
+            self.aggregator.close()
@@ -1,6 +1,6 @@
 import json
 import os
-from datetime import datetime
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -8,20 +8,101 @@ from plotly.subplots import make_subplots
 import logging
 import traceback
 
+from src.monitoring.history_store import DriftHistoryStore
+
 logger = logging.getLogger(__name__)
 
+# Puntos máximos por serie temporal en el dashboard
+DEFAULT_MAX_POINTS = 500
+
+
+def downsample_lttb(x, y, threshold):
+    """
+    Selecciona puntos de una serie con Largest-Triangle-Three-Buckets.
+
+    Divide la serie en `threshold - 2` grupos y de cada uno conserva el
+    punto que forma el triángulo de mayor área con el punto elegido en el
+    grupo anterior y la media del siguiente, así que los picos sobreviven
+    aunque se descarte la mayoría de los puntos.
+
+    Args:
+        x: Abscisas numéricas crecientes
+        y: Ordenadas (sin NaN)
+        threshold: Número de puntos a conservar
+
+    Returns:
+        Índices de los puntos conservados, en orden
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    selected = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if next_end <= end:
+            avg_x, avg_y = x[-1], y[-1]
+        else:
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs(
+            (x[selected] - avg_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (avg_y - y[selected])
+        )
+        selected = start + int(np.argmax(area))
+        indices[i + 1] = selected
+    return indices
+
+
+def bucket_max(times, values, max_buckets):
+    """
+    Agrega columnas en intervalos de tiempo de igual duración, con el máximo de cada intervalo.
+
+    La duración del intervalo se adapta al rango de tiempo para no superar
+    `max_buckets` columnas; el máximo (y no la media) conserva los picos de PSI.
+
+    Args:
+        times: Instantes datetime64[ns] crecientes, uno por columna
+        values: Matriz (filas x columnas) con NaN donde falta el dato
+        max_buckets: Columnas máximas del resultado
+
+    Returns:
+        Tupla (inicio de cada intervalo como datetime64[ns], matriz agregada)
+    """
+    if len(times) <= max_buckets:
+        return times, values
+    ns = times.astype(np.int64)
+    width = max((ns[-1] - ns[0]) // max_buckets + 1, 1)
+    buckets = (ns - ns[0]) // width
+    frame = pd.DataFrame(values.T, index=buckets)
+    aggregated = frame.groupby(level=0).max()
+    starts = (ns[0] + aggregated.index.to_numpy() * width).astype("datetime64[ns]")
+    return starts, aggregated.to_numpy().T
+
 class DriftVisualizer:
-    def __init__(self, history_path, reference_path=None):
+    def __init__(self, history_path, reference_path=None, history_store=None, max_points=DEFAULT_MAX_POINTS):
         """
         Inicializa el visualizador de drift.
         
         Args:
-            history_path: Ruta al archivo JSON donde se almacena el historial de drift
+            history_path: Ruta del historial de drift (base SQLite .db o JSON anterior)
             reference_path: Ruta al archivo JSON con estadísticas de referencia (opcional)
+            history_store: DriftHistoryStore ya abierto (opcional)
+            max_points: Puntos máximos por gráfica; los historiales más largos se
+                reducen (LTTB en las líneas, máximo por intervalo en el mapa de calor)
         """
         logger.info(f"Inicializando DriftVisualizer con historial: {history_path}")
         self.history_path = history_path
         self.reference_path = reference_path
+        self.max_points = max_points
+        if history_store is None and history_path.endswith(".db") and os.path.exists(history_path):
+            history_store = DriftHistoryStore(history_path)
+        self.history_store = history_store
         
         # Cargar historial
         self._load_data()
@@ -30,7 +111,11 @@ class DriftVisualizer:
         """Carga los datos necesarios para las visualizaciones."""
         try:
             # Cargar historial de drift
-            if os.path.exists(self.history_path):
+            if self.history_store is not None:
+                # SQLite agrega por intervalos: a Python solo llegan ~2 x max_points filas
+                self.history = self.history_store.load_history_downsampled(self.max_points)
+                logger.info(f"Historial de drift cargado con {len(self.history['timestamps'])} registros")
+            elif os.path.exists(self.history_path):
                 with open(self.history_path, 'r') as f:
                     self.history = json.load(f)
                 logger.info(f"Historial de drift cargado con {len(self.history.get('timestamps', []))} registros")
@@ -54,6 +139,30 @@ class DriftVisualizer:
             logger.error(f"Traceback: {traceback.format_exc()}")
             self.history = {"timestamps": [], "drift_scores": {}}
             self.reference = None
+        self._build_timeline()
+    
+    def _build_timeline(self):
+        """
+        Convierte el historial en un eje de tiempo numérico y una serie float por feature.
+        
+        Los timestamps se parsean una sola vez y de forma vectorizada; los que
+        no se pueden interpretar se descartan. Las series más cortas que el eje
+        (features añadidas después) se alinean con las verificaciones más recientes.
+        """
+        timestamps = self.history.get("timestamps", [])
+        times = pd.to_datetime(pd.Series(timestamps, dtype=object), errors="coerce").to_numpy(dtype="datetime64[ns]")
+        valid = ~np.isnat(times)
+        if not valid.all():
+            logger.warning(f"Se descartan {int((~valid).sum())} timestamps no válidos del historial")
+        self.times = times[valid]
+        self.scores = {}
+        for feature, scores in self.history.get("drift_scores", {}).items():
+            # dtype float convierte los None en NaN
+            values = np.asarray(scores, dtype=np.float64)[len(scores) - len(timestamps):] \
+                if len(scores) > len(timestamps) else np.asarray(scores, dtype=np.float64)
+            series = np.full(len(timestamps), np.nan)
+            series[len(series) - len(values):] = values
+            self.scores[feature] = series[valid]
     
     def generate_feature_drift_plot(self, feature_name):
         """
@@ -66,10 +175,12 @@ class DriftVisualizer:
             Objeto de figura de Plotly
         """
         try:
+            # Serie de la feature sin huecos
+            series = self.scores.get(feature_name)
+            present = ~np.isnan(series) if series is not None else None
+            
             # Verificar si tenemos datos para esta feature
-            if (not self.history.get("timestamps") or 
-                feature_name not in self.history.get("drift_scores", {}) or
-                not self.history["drift_scores"].get(feature_name)):
+            if series is None or not present.any():
                 # Si no hay datos, devuelve un gráfico vacío
                 fig = go.Figure()
                 fig.update_layout(
@@ -79,29 +190,13 @@ class DriftVisualizer:
                 )
                 return fig
             
-            # Obtener datos para el gráfico
-            timestamps = self.history.get("timestamps", [])
-            scores = self.history["drift_scores"].get(feature_name, [])
-            
-            # Convertir timestamps a objetos datetime para mejor visualización
-            try:
-                datetime_timestamps = [datetime.fromisoformat(ts) for ts in timestamps]
-            except (ValueError, TypeError) as e:
-                logger.error(f"Error al parsear timestamps: {str(e)}")
-                datetime_timestamps = [datetime.now() for _ in timestamps]
-            
-            # Asegurar que hay la misma cantidad de timestamps que scores
-            if len(datetime_timestamps) > len(scores):
-                logger.warning(f"Más timestamps que scores para {feature_name}. Recortando timestamps.")
-                datetime_timestamps = datetime_timestamps[-len(scores):]
-            elif len(scores) > len(datetime_timestamps):
-                logger.warning(f"Más scores que timestamps para {feature_name}. Recortando scores.")
-                scores = scores[-len(datetime_timestamps):]
-            
-            # Crear un DataFrame para facilitar la visualización
+            # Reducir a max_points conservando la forma de la serie (picos incluidos)
+            times = self.times[present]
+            scores = series[present]
+            keep = downsample_lttb(times.astype(np.int64), scores, self.max_points)
             df = pd.DataFrame({
-                'timestamp': datetime_timestamps,
-                'psi_score': scores
+                'timestamp': times[keep],
+                'psi_score': scores[keep]
             })
             
             # Crear gráfico
@@ -116,16 +211,16 @@ class DriftVisualizer:
                 line=dict(color='blue', width=2),
                 marker=dict(
                     size=8,
-                    color=df['psi_score'].apply(
-                        lambda x: 'green' if x < 0.1 else ('orange' if x < 0.2 else 'red')
+                    color=np.select(
+                        [df['psi_score'] < 0.1, df['psi_score'] < 0.2], ['green', 'orange'], 'red'
                     )
                 )
             ))
             
             # Añadir áreas sombreadas para los umbrales
             if len(df) > 0:
-                min_time = min(df['timestamp'])
-                max_time = max(df['timestamp'])
+                min_time = df['timestamp'].iloc[0]
+                max_time = df['timestamp'].iloc[-1]
                 
                 # Área verde (estable)
                 fig.add_trace(go.Scatter(
@@ -170,7 +265,8 @@ class DriftVisualizer:
                 yaxis_title="PSI Score",
                 legend_title="Umbrales de Drift",
                 hovermode="x unified",
-                yaxis=dict(range=[0, max(0.5, max(scores) * 1.1) if scores else 0.5])
+                xaxis=dict(type='date'),
+                yaxis=dict(range=[0, max(0.5, float(scores.max()) * 1.1)])
             )
             
             return fig
@@ -207,9 +303,9 @@ class DriftVisualizer:
         """
         try:
             # Verificar si tenemos datos para mostrar
-            if (not self.history.get("timestamps") or 
-                not self.history.get("drift_scores") or 
-                all(len(scores) == 0 for scores in self.history["drift_scores"].values())):
+            if (not len(self.times) or 
+                not self.scores or 
+                all(np.isnan(scores).all() for scores in self.scores.values())):
                 # Si no hay datos, devuelve un gráfico vacío
                 fig = go.Figure()
                 fig.update_layout(
@@ -231,47 +327,18 @@ class DriftVisualizer:
                 return fig
             
             # Obtener la lista de features
-            features = list(self.history["drift_scores"].keys())
-            
-            # Convertir timestamps a formato legible
-            try:
-                timestamps = [datetime.fromisoformat(ts).strftime('%Y-%m-%d %H:%M') 
-                             for ts in self.history["timestamps"]]
-            except (ValueError, TypeError) as e:
-                logger.error(f"Error al formatear timestamps: {str(e)}")
-                timestamps = [f"Punto {i+1}" for i in range(len(self.history["timestamps"]))]
+            features = list(self.scores.keys())
             
-            # Crear matriz de calor
-            heat_data = []
-            for feature in features:
-                scores = self.history["drift_scores"].get(feature, [])
-                
-                # Asegurarse de que hay tantos scores como timestamps
-                if len(scores) < len(timestamps):
-                    # Rellenar con None los valores faltantes
-                    logger.warning(f"Faltan scores para feature {feature}. Rellenando con None.")
-                    scores = scores + [None] * (len(timestamps) - len(scores))
-                elif len(scores) > len(timestamps):
-                    # Recortar los scores extra
-                    logger.warning(f"Hay más scores que timestamps para feature {feature}. Recortando.")
-                    scores = scores[:len(timestamps)]
-                
-                heat_data.append(scores)
-            
-            # Verificar que tenemos datos para mostrar
-            if not heat_data or not any(heat_data):
-                fig = go.Figure()
-                fig.update_layout(
-                    title="No hay suficientes datos para visualizar",
-                    xaxis_title="Tiempo",
-                    yaxis_title="Features"
-                )
-                return fig
+            # Matriz (features x verificaciones), agregada por intervalos con el PSI máximo
+            heat_matrix = np.vstack([self.scores[feature] for feature in features])
+            times, heat_matrix = bucket_max(self.times, heat_matrix, self.max_points)
+            # NaN -> None: celdas vacías en el JSON de Plotly
+            heat_data = np.where(np.isnan(heat_matrix), None, np.round(heat_matrix, 6)).tolist()
             
             # Crear figura
             fig = go.Figure(data=go.Heatmap(
                 z=heat_data,
-                x=timestamps,
+                x=times,
                 y=features,
                 colorscale=[
                     [0, 'green'],        # PSI = 0
@@ -296,7 +363,7 @@ class DriftVisualizer:
                 height=max(400, 100 + len(features) * 30),  # Ajustar altura según el número de features
                 xaxis=dict(
                     tickangle=-45,
-                    type='category'
+                    type='date'
                 )
             )
             
@@ -314,10 +381,13 @@ class DriftVisualizer:
             )
             return fig
     
-    def generate_drift_dashboard(self):
+    def generate_drift_dashboard(self, output_report=None):
         """
         Genera un dashboard completo con todas las visualizaciones de drift.
         
+        Args:
+            output_report: Resultado de DriftDetector.output_report (opcional)
+        
         Returns:
             HTML del dashboard
         """
@@ -340,6 +410,9 @@ class DriftVisualizer:
             # Generar el dashboard
             dashboard_html = self._generate_dashboard_html(heatmap_fig, feature_figures)
             
+            if output_report:
+                dashboard_html = self.generate_output_html(output_report) + dashboard_html
+            
             return dashboard_html
         
         except Exception as e:
@@ -354,6 +427,67 @@ class DriftVisualizer:
             </div>
             """
     
+    @staticmethod
+    def generate_output_html(output_report):
+        """
+        Genera la tabla de la salida del modelo: tasa de fraude y PSI de probabilidades por ventana.
+        
+        No depende del historial: se sirve aparte del dashboard
+        (/monitoring/drift-dashboard/output) y se refresca por tiempo.
+        
+        Args:
+            output_report: Diccionario {ventana: resultado de OutputMonitor.evaluate}
+            
+        Returns:
+            HTML de la tarjeta
+        """
+        def fmt(value, pattern):
+            return pattern.format(value) if value is not None else "—"
+        
+        badges = {
+            "normal": '<span class="badge bg-success">normal</span>',
+            "drift_detected": '<span class="badge bg-danger">drift</span>',
+            "insufficient_data": '<span class="badge bg-secondary">datos insuficientes</span>',
+            "no_reference": '<span class="badge bg-warning text-dark">sin referencia</span>',
+        }
+        rows = ""
+        for window, result in output_report.items():
+            rows += f"""
+                                <tr>
+                                    <td>{"desde el arranque" if window == "all" else window}</td>
+                                    <td>{fmt(result.get("sample_count"), "{}")}</td>
+                                    <td>{fmt(result.get("fraud_rate"), "{:.4%}")}</td>
+                                    <td>{fmt(result.get("fraud_rate_reference"), "{:.4%}")}</td>
+                                    <td>{fmt(result.get("fraud_rate_z"), "{:+.2f}")}</td>
+                                    <td>{fmt(result.get("psi"), "{:.4f}")}</td>
+                                    <td>{badges.get(result.get("status"), result.get("status", ""))}</td>
+                                </tr>"""
+        return f"""
+        <div class="container-fluid">
+            <div class="row mb-4">
+                <div class="col-12">
+                    <div class="card">
+                        <div class="card-header bg-light">
+                            <h4>Salida del modelo</h4>
+                        </div>
+                        <div class="card-body">
+                            <table class="table table-sm">
+                                <thead>
+                                    <tr>
+                                        <th>Ventana</th><th>Predicciones</th><th>Tasa de fraude</th>
+                                        <th>Referencia</th><th>Desviación (z)</th><th>PSI probabilidades</th><th>Estado</th>
+                                    </tr>
+                                </thead>
+                                <tbody>{rows}
+                                </tbody>
+                            </table>
+                        </div>
+                    </div>
+                </div>
+            </div>
+        </div>
+        """
+    
     def _generate_empty_dashboard(self, message):
         """Genera un dashboard vacío con un mensaje informativo."""
         return f"""
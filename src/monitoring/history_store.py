@@ -0,0 +1,378 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from contextlib import closing
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS drift_checks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    ts REAL NOT NULL,
+    status TEXT,
+    sample_count INTEGER,
+    scores TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_drift_checks_ts ON drift_checks (ts);
+"""
+
+
+def _epoch(timestamp):
+    """Convierte un timestamp ISO (hora local, como datetime.now()) a segundos epoch."""
+    return datetime.fromisoformat(timestamp).timestamp()
+
+
+def make_cursor(row):
+    """Cursor opaco que apunta justo después de una fila devuelta por `query`."""
+    return f"{row['ts']!r}_{row['id']}"
+
+
+def parse_cursor(cursor):
+    """
+    Interpreta un cursor de make_cursor.
+
+    Returns:
+        Tupla (ts, id)
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    ts, _, row_id = cursor.rpartition("_")
+    return float(ts), int(row_id)
+
+
+class DriftHistoryStore:
+    """
+    Historial de verificaciones de drift en una tabla SQLite de solo inserción.
+
+    Cada verificación es una fila (timestamp, estado, nº de muestras y PSI
+    por feature en JSON) indexada por tiempo. Escribir un resultado es un
+    único INSERT, sin reescribir el historial; SQLite en modo WAL garantiza
+    que un corte a mitad de escritura no corrompe lo ya guardado y permite
+    que varios procesos lean y escriban el mismo archivo.
+    """
+
+    def __init__(self, path, legacy_json_path=None, retention_days=None, max_rows=None, compact_every=500):
+        """
+        Inicializa el almacén, creando la tabla y migrando el JSON anterior si existe.
+
+        Args:
+            path: Ruta del archivo SQLite
+            legacy_json_path: drift_history.json a importar la primera vez (opcional)
+            retention_days: Días de historial que se conservan al compactar (None = todos)
+            max_rows: Máximo de verificaciones que se conservan al compactar (None = todas)
+            compact_every: Inserciones entre compactaciones automáticas (0 = nunca)
+        """
+        self.path = path
+        self.retention_days = retention_days
+        self.max_rows = max_rows
+        self.compact_every = compact_every
+        self._appends = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            conn.commit()
+
+        if legacy_json_path:
+            self.migrate_legacy_json(legacy_json_path)
+
+    @classmethod
+    def from_env(cls, path, legacy_json_path=None):
+        """Crea el almacén con la política de compactación de DRIFT_HISTORY_*."""
+        retention_days = os.getenv("DRIFT_HISTORY_RETENTION_DAYS")
+        max_rows = os.getenv("DRIFT_HISTORY_MAX_ROWS")
+        return cls(
+            path,
+            legacy_json_path=legacy_json_path,
+            retention_days=float(retention_days) if retention_days else None,
+            max_rows=int(max_rows) if max_rows else None,
+            compact_every=int(os.getenv("DRIFT_HISTORY_COMPACT_EVERY", "500")),
+        )
+
+    def _connect(self):
+        # Una conexión por operación: válido desde cualquier hilo o proceso
+        return sqlite3.connect(self.path, timeout=30)
+
+    def append(self, timestamp, scores, status=None, sample_count=None):
+        """
+        Añade el resultado de una verificación.
+
+        Args:
+            timestamp: Momento de la verificación en ISO 8601
+            scores: Diccionario {feature: PSI}
+            status: Estado de la verificación ("normal", "drift_detected", ...)
+            sample_count: Muestras evaluadas
+        """
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO drift_checks (timestamp, ts, status, sample_count, scores) VALUES (?, ?, ?, ?, ?)",
+                (timestamp, _epoch(timestamp), status, sample_count, json.dumps(scores))
+            )
+            conn.commit()
+
+        with self._lock:
+            self._appends += 1
+            due = self.compact_every and self._appends % self.compact_every == 0
+        if due and (self.retention_days or self.max_rows):
+            self.compact()
+
+    def query(self, start=None, end=None, limit=None, after_id=None, descending=False, after=None, features=None):
+        """
+        Lee verificaciones usando el índice por tiempo.
+
+        Args:
+            start: Instante mínimo (datetime o ISO), incluido
+            end: Instante máximo (datetime o ISO), incluido
+            limit: Número máximo de filas
+            after_id: Devolver solo filas con id posterior (anterior si `descending`)
+            descending: Ordenar de la más reciente a la más antigua
+            after: Posición (ts, id) de parse_cursor; devuelve las filas que la
+                siguen en el orden pedido (paginación por clave, sin OFFSET)
+            features: Features cuyo PSI se devuelve (por defecto, todas)
+
+        Returns:
+            Lista de diccionarios {id, timestamp, ts, status, sample_count, scores}
+        """
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start.timestamp() if isinstance(start, datetime) else _epoch(start))
+        if end is not None:
+            clauses.append("ts <= ?")
+            params.append(end.timestamp() if isinstance(end, datetime) else _epoch(end))
+        if after_id is not None:
+            clauses.append("id < ?" if descending else "id > ?")
+            params.append(after_id)
+        if after is not None:
+            # El índice por ts incluye el rowid, así que la comparación por pares usa el índice
+            clauses.append("(ts, id) < (?, ?)" if descending else "(ts, id) > (?, ?)")
+            params.extend(after)
+
+        sql = "SELECT id, timestamp, ts, status, sample_count, scores FROM drift_checks"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts DESC, id DESC" if descending else " ORDER BY ts, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, params).fetchall()
+        result = []
+        for row in rows:
+            scores = json.loads(row[5])
+            if features is not None:
+                scores = {feature: scores[feature] for feature in features if feature in scores}
+            result.append({
+                "id": row[0], "timestamp": row[1], "ts": row[2], "status": row[3], "sample_count": row[4],
+                "scores": scores
+            })
+        return result
+
+    def iter_query(self, start=None, end=None, after=None, limit=None, features=None, page_size=1000):
+        """
+        Recorre las verificaciones de un rango por páginas, sin cargar todo en memoria.
+
+        Cada página es una consulta independiente que continúa tras la última
+        fila de la anterior, así que no retiene una conexión abierta entre páginas.
+
+        Args:
+            start, end, after, features: Filtros de `query`
+            limit: Número máximo de filas en total (None = todas)
+            page_size: Filas por consulta
+
+        Yields:
+            Diccionarios de `query`
+        """
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            rows = self.query(start=start, end=end, limit=size, after=after, features=features)
+            if rows:
+                # Antes de entregarlas: quien las consume puede modificar las filas
+                after = (rows[-1]["ts"], rows[-1]["id"])
+            yield from rows
+            if len(rows) < size:
+                return
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def load_history(self, **query_kwargs):
+        """
+        Devuelve el historial en el formato del antiguo drift_history.json.
+
+        Args:
+            **query_kwargs: Filtros de `query`
+
+        Returns:
+            Diccionario {"timestamps": [...], "drift_scores": {feature: [...]}}
+        """
+        rows = self.query(**query_kwargs)
+        history = {"timestamps": [], "drift_scores": {}}
+        for row in rows:
+            history["timestamps"].append(row["timestamp"])
+            for feature, psi in row["scores"].items():
+                history["drift_scores"].setdefault(feature, []).append(psi)
+        return history
+
+    def load_history_downsampled(self, max_points, recent_rows=100):
+        """
+        Historial reducido en SQL, en el formato de load_history.
+
+        Divide el rango de tiempo en `max_points` intervalos iguales y de
+        cada uno devuelve dos verificaciones: al primer instante del
+        intervalo, el PSI mínimo de cada feature, y al último, el máximo. La
+        agregación (GROUP BY + json_extract) la hace SQLite, así que Python
+        solo recibe como mucho 2 x max_points filas sea cual sea la longitud
+        del historial. Con menos de `max_points` verificaciones devuelve el
+        historial completo.
+
+        Args:
+            max_points: Intervalos de tiempo del resultado
+            recent_rows: Verificaciones recientes de las que se toman los
+                nombres de las features
+
+        Returns:
+            Diccionario {"timestamps": [...], "drift_scores": {feature: [...]}}
+        """
+        with closing(self._connect()) as conn:
+            first, last, n = conn.execute("SELECT MIN(ts), MAX(ts), COUNT(*) FROM drift_checks").fetchone()
+            if n <= max_points:
+                return self.load_history()
+
+            # Las features añadidas después solo faltan en las filas antiguas
+            features = []
+            for (scores,) in conn.execute(
+                "SELECT scores FROM drift_checks ORDER BY ts DESC, id DESC LIMIT ?", (recent_rows,)
+            ):
+                features.extend(feature for feature in json.loads(scores) if feature not in features)
+
+            paths = [f'$."{feature}"' for feature in features]
+            columns = "".join(", MIN(json_extract(scores, ?)), MAX(json_extract(scores, ?))" for _ in paths)
+            width = max((last - first) / max_points, 1e-6)
+            rows = conn.execute(
+                f"SELECT MIN(ts), MAX(ts){columns} FROM drift_checks "
+                # La última verificación cae en el borde derecho: va al último intervalo
+                "GROUP BY MIN(CAST((ts - ?) / ? AS INTEGER), ?) ORDER BY 1",
+                [path for path in paths for _ in range(2)] + [first, width, max_points - 1]
+            ).fetchall()
+
+        history = {"timestamps": [], "drift_scores": {feature: [] for feature in features}}
+        for row in rows:
+            bucket_start, bucket_end, extremes = row[0], row[1], row[2:]
+            for position, ts in ((0, bucket_start), (1, bucket_end)):
+                if position and bucket_end == bucket_start:
+                    break
+                history["timestamps"].append(datetime.fromtimestamp(ts).isoformat())
+                for f, feature in enumerate(features):
+                    history["drift_scores"][feature].append(extremes[2 * f + position])
+        return history
+
+    def count(self):
+        """Número de verificaciones almacenadas."""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM drift_checks").fetchone()[0]
+
+    def last_modified(self):
+        """Id de la última verificación (0 si está vacío); cambia con cada inserción."""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM drift_checks").fetchone()[0]
+
+    def version(self):
+        """
+        Versión del contenido: (id más antiguo, id más reciente), (0, 0) si está vacío.
+
+        Cambia con cada inserción y con cada compactación que borre filas, y se
+        resuelve con el índice de la clave primaria sin recorrer la tabla.
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM drift_checks").fetchone()
+        return row[0], row[1]
+
+    def compact(self):
+        """
+        Aplica la política de retención y devuelve el espacio al sistema.
+
+        Returns:
+            Número de verificaciones eliminadas
+        """
+        start = time.perf_counter()
+        deleted = 0
+        with closing(self._connect()) as conn:
+            if self.retention_days:
+                cutoff = (datetime.now() - timedelta(days=self.retention_days)).timestamp()
+                deleted += conn.execute("DELETE FROM drift_checks WHERE ts < ?", (cutoff,)).rowcount
+            if self.max_rows:
+                deleted += conn.execute(
+                    "DELETE FROM drift_checks WHERE id NOT IN "
+                    "(SELECT id FROM drift_checks ORDER BY ts DESC, id DESC LIMIT ?)",
+                    (self.max_rows,)
+                ).rowcount
+            conn.commit()
+            if deleted:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                conn.execute("VACUUM")
+        logger.info(f"Historial de drift compactado: {deleted} verificaciones eliminadas en {time.perf_counter() - start:.2f}s")
+        return deleted
+
+    def migrate_legacy_json(self, json_path):
+        """
+        Importa un drift_history.json anterior si el almacén está vacío.
+
+        Las listas de PSI más cortas que la de timestamps se alinean con los
+        últimos timestamps, igual que hacía el visualizador. El JSON se
+        renombra a .migrated para no importarlo dos veces.
+
+        Args:
+            json_path: Ruta del historial JSON
+
+        Returns:
+            Número de verificaciones importadas
+        """
+        if not os.path.exists(json_path) or self.count() > 0:
+            return 0
+        try:
+            try:
+                with open(json_path) as f:
+                    legacy = json.load(f)
+            except FileNotFoundError:
+                # Otro worker ya lo migró y renombró
+                return 0
+            timestamps = legacy.get("timestamps", [])
+            scores_by_feature = legacy.get("drift_scores", {})
+
+            rows = []
+            for i, timestamp in enumerate(timestamps):
+                scores = {}
+                for feature, values in scores_by_feature.items():
+                    offset = len(timestamps) - len(values)
+                    if i >= offset:
+                        scores[feature] = values[i - offset]
+                rows.append((timestamp, _epoch(timestamp), None, None, json.dumps(scores)))
+
+            with closing(self._connect()) as conn:
+                # Comprobación e inserción bajo el bloqueo de escritura: varios
+                # workers que arrancan a la vez no importan el historial dos veces
+                conn.execute("BEGIN IMMEDIATE")
+                if conn.execute("SELECT COUNT(*) FROM drift_checks").fetchone()[0] > 0:
+                    conn.rollback()
+                    return 0
+                conn.executemany(
+                    "INSERT INTO drift_checks (timestamp, ts, status, sample_count, scores) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                conn.commit()
+            os.replace(json_path, json_path + ".migrated")
+            logger.info(f"✓ Historial JSON migrado a {self.path}: {len(rows)} verificaciones")
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Error al migrar el historial JSON {json_path}: {str(e)}")
+            return 0
@@ -0,0 +1,248 @@
+import json
+import math
+import os
+import time
+import logging
+from bisect import bisect_right
+
+import numpy as np
+
+from src.monitoring.time_buckets import DEFAULT_WINDOWS, TimeBucketedHistogram
+
+logger = logging.getLogger(__name__)
+
+# Bins de probabilidad por defecto: 10 intervalos iguales en [0, 1]
+DEFAULT_PROBABILITY_BINS = np.linspace(0.0, 1.0, 11).tolist()
+
+# Desviación de la tasa de fraude, en errores estándar, a partir de la cual se alerta
+FRAUD_RATE_Z_THRESHOLD = 3.0
+
+
+def load_output_reference(path):
+    """
+    Carga la referencia de salida del modelo generada con save_output_reference.
+
+    Args:
+        path: Ruta del JSON {"probability": {"bins", "histogram"}, "fraud_rate"}
+
+    Returns:
+        Diccionario de referencia, o None si el archivo no existe o no es válido
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            reference = json.load(f)
+        logger.info(f"✓ Referencia de salida del modelo cargada de {path}")
+        return reference
+    except (OSError, ValueError) as e:
+        logger.error(f"Error al cargar la referencia de salida {path}: {str(e)}")
+        return None
+
+
+def save_output_reference(predictions, probabilities, path, bins=None):
+    """
+    Guarda la referencia de salida a partir de las predicciones sobre datos de entrenamiento o validación.
+
+    Args:
+        predictions: Clases predichas (0 = legítima, 1 = fraude)
+        probabilities: Probabilidades de fraude predichas
+        path: Ruta del JSON de salida
+        bins: Bordes de los bins de probabilidad (por defecto, 10 intervalos iguales)
+
+    Returns:
+        Diccionario de referencia guardado
+    """
+    bins = DEFAULT_PROBABILITY_BINS if bins is None else list(bins)
+    histogram, _ = np.histogram(np.asarray(probabilities, dtype=np.float64), bins=bins)
+    reference = {
+        "probability": {"bins": bins, "histogram": histogram.tolist()},
+        "fraud_rate": float(np.mean(np.asarray(predictions) == 1)),
+        "count": int(len(predictions)),
+    }
+    with open(path, "w") as f:
+        json.dump(reference, f)
+    logger.info(f"✓ Referencia de salida guardada en {path}")
+    return reference
+
+
+class OutputMonitor:
+    """
+    Monitoreo de la salida del modelo: histograma de probabilidades y tasa de fraude.
+
+    Usa el mismo esquema de ventanas que el drift de entrada: una matriz de
+    conteos de dos filas (fila 0, histograma de probabilidades; fila 1,
+    predicciones [legítima, fraude]) acumulada desde el arranque y por
+    intervalos de tiempo en un TimeBucketedHistogram, de modo que las
+    ventanas recientes y la variante con decaimiento salen de sumar
+    intervalos. Contra la referencia de entrenamiento se calcula el PSI de
+    las probabilidades y la desviación de la tasa de fraude.
+    """
+
+    def __init__(self, reference=None, windows=None, bucket_seconds=60, decay_half_life=3600.0,
+                 psi_threshold=0.2, min_samples=100):
+        """
+        Inicializa el monitor.
+
+        Args:
+            reference: Referencia de load_output_reference (opcional)
+            windows: Ventanas temporales {etiqueta: segundos}
+            bucket_seconds: Resolución en segundos de las ventanas temporales
+            decay_half_life: Semivida en segundos de la variante con decaimiento
+            psi_threshold: PSI de las probabilidades a partir del cual hay drift
+            min_samples: Predicciones mínimas en una ventana para evaluarla
+        """
+        self.reference = reference or {}
+        self.windows = dict(DEFAULT_WINDOWS if windows is None else windows)
+        self.psi_threshold = psi_threshold
+        self.min_samples = min_samples
+
+        probability_reference = self.reference.get("probability", {})
+        self.bins = [float(b) for b in probability_reference.get("bins", DEFAULT_PROBABILITY_BINS)]
+        self._bins_array = np.asarray(self.bins)
+        self.n_bins = len(self.bins) - 1
+        shape = (2, max(self.n_bins, 2))
+
+        self.totals = np.zeros(shape, dtype=np.int64)
+        self.total_samples = 0
+        self.time_histogram = TimeBucketedHistogram(
+            shape,
+            bucket_seconds=bucket_seconds,
+            retention_seconds=max(self.windows.values(), default=bucket_seconds),
+            half_life=decay_half_life
+        )
+
+        # Proporciones de referencia sin ceros, calculadas una sola vez
+        self.ref_proportions = None
+        histogram = probability_reference.get("histogram")
+        if histogram is not None and len(histogram) == self.n_bins and sum(histogram) > 0:
+            ref_hist = np.asarray(histogram, dtype=np.float64)
+            self.ref_proportions = np.maximum(ref_hist / ref_hist.sum(), 1e-6)
+        elif histogram is not None:
+            logger.error("Histograma de probabilidades de referencia inválido; se omite el PSI de salida")
+        self.fraud_rate_reference = self.reference.get("fraud_rate")
+
+    def _bin(self, probability):
+        if not (self.bins[0] <= probability <= self.bins[-1]):
+            return -1
+        return min(bisect_right(self.bins, probability) - 1, self.n_bins - 1)
+
+    def record(self, prediction, probability, timestamp_ns=None):
+        """
+        Registra una predicción.
+
+        Args:
+            prediction: Clase predicha (0 o 1)
+            probability: Probabilidad de fraude
+            timestamp_ns: Marca de tiempo en nanosegundos (por defecto, ahora)
+        """
+        timestamp_ns = time.time_ns() if timestamp_ns is None else timestamp_ns
+        index = self._bin(float(probability))
+        label = 1 if int(prediction) == 1 else 0
+        if index >= 0:
+            self.totals[0, index] += 1
+        self.totals[1, label] += 1
+        self.total_samples += 1
+        self.time_histogram.add_sample([index, label], timestamp_ns)
+
+    def record_batch(self, predictions, probabilities, timestamp_ns=None):
+        """
+        Registra un lote de predicciones con una única marca de tiempo.
+
+        Args:
+            predictions: Clases predichas
+            probabilities: Probabilidades de fraude
+            timestamp_ns: Marca de tiempo en nanosegundos (por defecto, ahora)
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        n = len(probabilities)
+        if n == 0:
+            return
+        timestamp_ns = time.time_ns() if timestamp_ns is None else timestamp_ns
+        counts = np.zeros_like(self.totals)
+        indices = np.searchsorted(self._bins_array, probabilities, side="right") - 1
+        # El último bin incluye su borde derecho, como en np.histogram
+        indices[probabilities == self._bins_array[-1]] = self.n_bins - 1
+        indices = indices[(indices >= 0) & (indices < self.n_bins)]
+        counts[0, :self.n_bins] = np.bincount(indices, minlength=self.n_bins)
+        frauds = int(np.count_nonzero(np.asarray(predictions) == 1))
+        counts[1, 0] = n - frauds
+        counts[1, 1] = frauds
+        self.totals += counts
+        self.total_samples += n
+        self.time_histogram.add_counts(counts, n, timestamp_ns)
+
+    def snapshot(self):
+        """
+        Conteos desde el arranque ("all"), por ventana temporal y con decaimiento.
+
+        Returns:
+            Diccionario {etiqueta: (conteos, predicciones)}
+        """
+        snapshot = {"all": (self.totals.copy(), self.total_samples)}
+        snapshot.update(self.time_histogram.snapshot(self.windows))
+        return snapshot
+
+    def evaluate(self, counts, sample_count):
+        """
+        PSI de las probabilidades y desviación de la tasa de fraude frente a la referencia.
+
+        Args:
+            counts: Matriz de conteos (2 x bins) de una ventana
+            sample_count: Predicciones de la ventana
+
+        Returns:
+            Diccionario con sample_count, fraud_rate, status y, si hay
+            referencia, psi, fraud_rate_reference y fraud_rate_z. Sin
+            referencia cargada el estado es "no_reference".
+        """
+        counts = np.asarray(counts, dtype=np.float64)
+        result = {"sample_count": sample_count if isinstance(sample_count, int) else round(float(sample_count), 2)}
+        if sample_count <= 0:
+            result["status"] = "insufficient_data"
+            return result
+
+        fraud_rate = float(counts[1, 1] / sample_count)
+        result["fraud_rate"] = fraud_rate
+        if sample_count < self.min_samples:
+            result["status"] = "insufficient_data"
+            return result
+
+        if self.ref_proportions is None and self.fraud_rate_reference is None:
+            result["status"] = "no_reference"
+            return result
+
+        drifting = False
+        histogram = counts[0, :self.n_bins]
+        if self.ref_proportions is not None and histogram.sum() > 0:
+            current = np.maximum(histogram / histogram.sum(), 1e-6)
+            psi = float(np.sum((current - self.ref_proportions) * np.log(current / self.ref_proportions)))
+            result["psi"] = psi
+            drifting = psi > self.psi_threshold
+
+        p0 = self.fraud_rate_reference
+        if p0 is not None:
+            result["fraud_rate_reference"] = p0
+            result["fraud_rate_deviation"] = fraud_rate - p0
+            if 0.0 < p0 < 1.0:
+                # Desviación en errores estándar de una binomial con la tasa de referencia
+                z = (fraud_rate - p0) / math.sqrt(p0 * (1.0 - p0) / sample_count)
+                result["fraud_rate_z"] = z
+                drifting = drifting or abs(z) > FRAUD_RATE_Z_THRESHOLD
+
+        result["drifting"] = bool(drifting)
+        result["status"] = "drift_detected" if drifting else "normal"
+        return result
+
+    def report(self, snapshot=None):
+        """
+        Evalúa todas las ventanas.
+
+        Args:
+            snapshot: Conteos ya agregados (p. ej. de varios workers); por defecto, snapshot()
+
+        Returns:
+            Diccionario {ventana: resultado de evaluate}
+        """
+        snapshot = self.snapshot() if snapshot is None else snapshot
+        return {label: self.evaluate(counts, n) for label, (counts, n) in snapshot.items()}
@@ -0,0 +1,416 @@
+import json
+import math
+import random
+import time
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Cuantiles cuyo desplazamiento se informa
+DEFAULT_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+# Puntos de la integral de Wasserstein-1 sobre las funciones cuantil
+_WASSERSTEIN_POINTS = 512
+
+# Factor de reducción de capacidad entre niveles consecutivos del KLL
+_CAPACITY_DECAY = 2.0 / 3.0
+
+
+class KLLSketch:
+    """
+    Sketch de cuantiles KLL (Karnin, Lang y Liberty) de memoria acotada.
+
+    Los valores entran en el nivel 0. Cuando un nivel se llena se ordena y
+    se conserva uno de cada dos elementos (los pares o los impares, al
+    azar), que suben al nivel siguiente con el doble de peso. La capacidad
+    decrece geométricamente hacia los niveles bajos, así que el sketch
+    guarda O(k) valores sin importar cuántos haya visto, con un error de
+    rango del orden de 1/k. Dos sketches se fusionan concatenando sus
+    niveles y compactando, lo que permite sumar ventanas y workers.
+
+    Un valor con peso w (captura muestreada) entra directamente en el nivel
+    de peso 2**h más cercano, redondeando h al azar para que el peso
+    esperado sea exactamente w.
+    """
+
+    def __init__(self, k=128):
+        """
+        Inicializa un sketch vacío.
+
+        Args:
+            k: Capacidad del nivel superior; más grande = más preciso y más memoria
+        """
+        self.k = int(k)
+        self.n = 0
+        self.compactors = [[]]
+        self._size = 0
+        self._max_size = self._capacity(0)
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.k * _CAPACITY_DECAY ** depth)) + 1
+
+    def _grow(self):
+        self.compactors.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _compress(self):
+        while self._size >= self._max_size:
+            for level, items in enumerate(self.compactors):
+                if len(items) >= self._capacity(level):
+                    if level + 1 >= len(self.compactors):
+                        self._grow()
+                    items.sort()
+                    # Con un número impar de elementos el último se queda en el nivel
+                    keep = [items.pop()] if len(items) % 2 else []
+                    self.compactors[level + 1].extend(items[random.getrandbits(1)::2])
+                    self.compactors[level] = keep
+                    break
+            self._size = sum(len(items) for items in self.compactors)
+
+    @staticmethod
+    def _weight_levels(weights):
+        """Nivel de cada peso (>= 1): log2 redondeado al azar, insesgado en peso."""
+        weights = np.maximum(np.asarray(weights, dtype=np.float64), 1.0)
+        levels = np.floor(np.log2(weights))
+        fraction = weights / 2.0 ** levels - 1.0
+        return (levels + (np.random.random(len(weights)) < fraction)).astype(np.int64)
+
+    def _ensure_levels(self, level):
+        while len(self.compactors) <= level:
+            self._grow()
+
+    def update(self, value, weight=1.0):
+        """Añade un valor con el peso indicado (los NaN se ignoran)."""
+        if value != value:
+            return
+        level = 0 if weight == 1.0 else int(self._weight_levels([weight])[0])
+        self._ensure_levels(level)
+        self.compactors[level].append(value)
+        self.n += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def update_many(self, values, weights=None):
+        """Añade un arreglo de valores, opcionalmente con un peso por valor (los NaN se ignoran)."""
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        values = values[valid]
+        if not len(values):
+            return
+        if weights is None:
+            self.compactors[0].extend(values.tolist())
+        else:
+            levels = self._weight_levels(np.asarray(weights, dtype=np.float64)[valid])
+            self._ensure_levels(int(levels.max()))
+            for level in np.unique(levels).tolist():
+                self.compactors[level].extend(values[levels == level].tolist())
+        self.n += len(values)
+        self._size += len(values)
+        self._compress()
+
+    def merge(self, other):
+        """
+        Fusiona otro sketch en este.
+
+        Args:
+            other: KLLSketch a sumar (no se modifica)
+
+        Returns:
+            Este sketch
+        """
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self._size = sum(len(items) for items in self.compactors)
+        self._compress()
+        return self
+
+    def copy(self):
+        sketch = KLLSketch(self.k)
+        sketch.merge(self)
+        return sketch
+
+    def _sorted_weighted(self):
+        items = []
+        weights = []
+        for level, level_items in enumerate(self.compactors):
+            items.extend(level_items)
+            weights.extend([2 ** level] * len(level_items))
+        items = np.asarray(items, dtype=np.float64)
+        order = np.argsort(items, kind="stable")
+        cumulative = np.cumsum(np.asarray(weights, dtype=np.float64)[order])
+        return items[order], cumulative / cumulative[-1]
+
+    def cdf(self, x):
+        """Proporción aproximada de valores <= x (acepta arreglos)."""
+        if self.n == 0:
+            return np.full(np.shape(x), np.nan)
+        items, cumulative = self._sorted_weighted()
+        index = np.searchsorted(items, x, side="right")
+        return np.where(index > 0, cumulative[np.maximum(index - 1, 0)], 0.0)
+
+    def quantile(self, q):
+        """Valor aproximado del cuantil q en [0, 1] (acepta arreglos)."""
+        if self.n == 0:
+            return np.full(np.shape(q), np.nan)
+        items, cumulative = self._sorted_weighted()
+        index = np.searchsorted(cumulative, q, side="left")
+        return items[np.minimum(index, len(items) - 1)]
+
+    @property
+    def size(self):
+        """Número de valores guardados (acotado por ~3k)."""
+        return self._size
+
+    def to_array(self):
+        """Serializa a un arreglo float64: [k, n, niveles, tamaños..., valores...]."""
+        sizes = [len(items) for items in self.compactors]
+        values = [value for items in self.compactors for value in items]
+        return np.asarray([self.k, self.n, len(sizes)] + sizes + values, dtype=np.float64)
+
+    @classmethod
+    def from_array(cls, array):
+        """Reconstruye un sketch serializado con to_array."""
+        array = np.asarray(array, dtype=np.float64)
+        sketch = cls(int(array[0]))
+        n_levels = int(array[2])
+        sizes = array[3:3 + n_levels].astype(np.int64).tolist()
+        values = array[3 + n_levels:].tolist()
+        sketch.compactors = []
+        offset = 0
+        for size in sizes:
+            sketch.compactors.append(values[offset:offset + size])
+            offset += size
+        sketch.n = int(array[1])
+        sketch._size = offset
+        sketch._max_size = sum(sketch._capacity(h) for h in range(len(sketch.compactors)))
+        return sketch
+
+    def to_dict(self):
+        return {"k": self.k, "n": self.n, "levels": [list(items) for items in self.compactors]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sizes = [len(items) for items in data["levels"]]
+        values = [value for items in data["levels"] for value in items]
+        return cls.from_array([data["k"], data["n"], len(sizes)] + sizes + values)
+
+
+class HistogramDistribution:
+    """
+    Distribución de referencia aproximada a partir de un histograma.
+
+    Supone valores uniformes dentro de cada bin (CDF lineal a trozos), así
+    que no ve cambios dentro de un bin de la referencia; es el respaldo
+    cuando no hay sketches de entrenamiento.
+    """
+
+    def __init__(self, bins, histogram):
+        self.edges = np.asarray(bins, dtype=np.float64)
+        counts = np.asarray(histogram, dtype=np.float64)
+        self.cumulative = np.concatenate([[0.0], np.cumsum(counts) / counts.sum()])
+
+    def cdf(self, x):
+        return np.interp(x, self.edges, self.cumulative)
+
+    def quantile(self, q):
+        # Bins vacíos dejan tramos planos en la CDF: se toma el primer borde que alcanza q
+        index = np.clip(np.searchsorted(self.cumulative, q, side="left"), 1, len(self.edges) - 1)
+        low, high = self.cumulative[index - 1], self.cumulative[index]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.where(high > low, (q - low) / (high - low), 0.0)
+        return self.edges[index - 1] + fraction * (self.edges[index] - self.edges[index - 1])
+
+
+def compare_distributions(reference, current, quantiles=DEFAULT_QUANTILES):
+    """
+    Estadísticos de distancia entre la distribución de referencia y la actual.
+
+    Args:
+        reference: KLLSketch o HistogramDistribution de referencia
+        current: KLLSketch con las muestras recientes
+        quantiles: Cuantiles cuyo desplazamiento se informa
+
+    Returns:
+        Diccionario con "ks" (máxima diferencia entre CDFs), "wasserstein"
+        (distancia de Wasserstein-1, en unidades de la feature) y
+        "quantile_shifts" {"p50": actual - referencia, ...}, además de
+        "reference_exact": True si la referencia es un sketch de los datos
+        de entrenamiento y False si se interpola un histograma por bins
+    """
+    items, _ = current._sorted_weighted()
+    if isinstance(reference, KLLSketch):
+        reference_points, _ = reference._sorted_weighted()
+    else:
+        reference_points = reference.edges
+    # El supremo de |F1 - F2| se alcanza en algún punto de salto o quiebre de las CDFs
+    grid = np.union1d(items, reference_points)
+    ks = float(np.max(np.abs(current.cdf(grid) - reference.cdf(grid))))
+
+    # W1 = ∫ |Q1(u) - Q2(u)| du, con la regla del punto medio
+    u = (np.arange(_WASSERSTEIN_POINTS) + 0.5) / _WASSERSTEIN_POINTS
+    wasserstein = float(np.mean(np.abs(current.quantile(u) - reference.quantile(u))))
+
+    q = np.asarray(quantiles, dtype=np.float64)
+    shifts = current.quantile(q) - reference.quantile(q)
+    return {
+        "ks": ks,
+        "wasserstein": wasserstein,
+        "quantile_shifts": {f"p{round(p * 100):02d}": float(s) for p, s in zip(q.tolist(), shifts.tolist())},
+        "reference_exact": isinstance(reference, KLLSketch),
+    }
+
+
+class TimeBucketedSketches:
+    """
+    Un sketch por feature y bloque de tiempo (por defecto, 5 minutos).
+
+    Igual que TimeBucketedHistogram pero con sketches de cuantiles: los
+    bloques forman un anillo que cubre la ventana más larga y el sketch de
+    una ventana es la fusión de sus bloques. La fusión de los bloques ya
+    cerrados se guarda en caché hasta que cambia el bloque en curso, así
+    que consultar varias veces por minuto solo fusiona el bloque actual.
+    """
+
+    def __init__(self, n_features, block_seconds=300, retention_seconds=86400, k=128):
+        """
+        Inicializa el anillo de bloques.
+
+        Args:
+            n_features: Número de features
+            block_seconds: Duración de cada bloque en segundos
+            retention_seconds: Ventana más larga que se podrá consultar
+            k: Parámetro de precisión de cada KLLSketch
+        """
+        self.n_features = n_features
+        self.block_seconds = float(block_seconds)
+        self.k = k
+        self.n_blocks = int(math.ceil(retention_seconds / self.block_seconds)) + 1
+        self.block_ids = [-1] * self.n_blocks
+        self.blocks = [None] * self.n_blocks
+        self._cache = {}
+
+    def _block(self, timestamp_ns):
+        block = int(timestamp_ns / 1e9 // self.block_seconds)
+        slot = block % self.n_blocks
+        current = self.block_ids[slot]
+        if current != block:
+            if current > block:
+                return None  # Muestra más antigua que la retención
+            self.blocks[slot] = [KLLSketch(self.k) for _ in range(self.n_features)]
+            self.block_ids[slot] = block
+        return self.blocks[slot]
+
+    def add_row(self, row, timestamp_ns=None, weight=1.0):
+        """Añade una muestra (valores en orden de features; NaN si falta) con su peso."""
+        sketches = self._block(time.time_ns() if timestamp_ns is None else timestamp_ns)
+        if sketches is None:
+            return
+        for sketch, value in zip(sketches, row):
+            sketch.update(value, weight)
+
+    def add_batch(self, values, timestamp_ns=None, weights=None):
+        """Añade una matriz (n_muestras x n_features) con una única marca de tiempo y pesos opcionales."""
+        sketches = self._block(time.time_ns() if timestamp_ns is None else timestamp_ns)
+        if sketches is None:
+            return
+        values = np.asarray(values, dtype=np.float64)
+        for f, sketch in enumerate(sketches):
+            sketch.update_many(values[:, f], weights)
+
+    def window(self, seconds, now_ns=None):
+        """
+        Sketches de los últimos `seconds` segundos, con resolución de un bloque.
+
+        Returns:
+            Lista con un KLLSketch por feature (None si la ventana está vacía)
+        """
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        current = int(now_ns / 1e9 // self.block_seconds)
+        n = max(1, int(math.ceil(seconds / self.block_seconds)))
+
+        # Bloques cerrados de la ventana: su fusión no cambia hasta el próximo bloque
+        cached = self._cache.get(seconds)
+        if cached is None or cached[0] != current:
+            closed = [None] * self.n_features
+            for block_id, sketches in zip(self.block_ids, self.blocks):
+                if current - n < block_id < current:
+                    for f, sketch in enumerate(sketches):
+                        if len(sketch):
+                            closed[f] = sketch.copy() if closed[f] is None else closed[f].merge(sketch)
+            cached = (current, closed)
+            self._cache[seconds] = cached
+
+        slot = current % self.n_blocks
+        open_block = self.blocks[slot] if self.block_ids[slot] == current else None
+        result = []
+        for f in range(self.n_features):
+            sketch = cached[1][f]
+            sketch = sketch.copy() if sketch is not None else None
+            if open_block is not None and len(open_block[f]):
+                sketch = open_block[f].copy() if sketch is None else sketch.merge(open_block[f])
+            result.append(sketch)
+        return result
+
+    def snapshot(self, windows, now_ns=None):
+        """
+        Sketches de varias ventanas a la vez.
+
+        Args:
+            windows: Diccionario {etiqueta: segundos}
+
+        Returns:
+            Diccionario {etiqueta: lista de KLLSketch por feature}
+        """
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        return {label: self.window(seconds, now_ns) for label, seconds in windows.items()}
+
+
+def load_reference_sketches(path):
+    """
+    Carga los sketches de referencia guardados con save_reference_sketches.
+
+    Args:
+        path: Ruta del JSON {feature: sketch}
+
+    Returns:
+        Diccionario {feature: KLLSketch}
+    """
+    with open(path) as f:
+        data = json.load(f)
+    return {feature: KLLSketch.from_dict(sketch) for feature, sketch in data.items()}
+
+
+def save_reference_sketches(frame, path, features=None, k=512):
+    """
+    Construye y guarda los sketches de referencia a partir de los datos de entrenamiento.
+
+    Args:
+        frame: DataFrame de pandas con los datos de entrenamiento
+        path: Ruta del JSON de salida
+        features: Columnas a incluir (por defecto, todas las numéricas)
+        k: Parámetro de precisión; la referencia se guarda una vez, así que puede ser mayor
+
+    Returns:
+        Diccionario {feature: KLLSketch}
+    """
+    if features is None:
+        features = list(frame.select_dtypes(include="number").columns)
+    sketches = {}
+    for feature in features:
+        sketch = KLLSketch(k)
+        sketch.update_many(frame[feature].to_numpy(dtype=np.float64))
+        sketches[feature] = sketch
+    with open(path, "w") as f:
+        json.dump({feature: sketch.to_dict() for feature, sketch in sketches.items()}, f)
+    logger.info(f"✓ Sketches de referencia guardados en {path}: {len(sketches)} features")
+    return sketches
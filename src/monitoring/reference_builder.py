@@ -0,0 +1,112 @@
+"""
+Genera las referencias de monitoreo a partir del dataset de entrenamiento.
+
+Repite la partición de entrenamiento (train_test_split, test_size=0.2,
+random_state=42, como en notebooks/notebooks_x2/05_mlflow_tracking.ipynb)
+y escribe en el directorio de salida:
+
+- reference_sketches.json: sketch de cuantiles de cada feature sobre la
+  partición de entrenamiento (KS, Wasserstein y desplazamiento de
+  cuantiles exactos en lugar de interpolar el histograma por bins)
+- output_reference.json: histograma de probabilidades y tasa de fraude de
+  las predicciones del modelo sobre la partición de validación
+
+Uso:
+    python -m src.monitoring.reference_builder \\
+        --data data/processed/data_processed.csv --model models/model.pkl [--output-dir data]
+"""
+import argparse
+import logging
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from src.api.models import FEATURE_NAMES
+from src.monitoring.output_monitor import save_output_reference
+from src.monitoring.quantile_sketch import save_reference_sketches
+
+logger = logging.getLogger(__name__)
+
+
+def split_dataset(df, target="Class", test_size=0.2, random_state=42):
+    """
+    Separa features del modelo y etiqueta con la misma partición del entrenamiento.
+
+    Args:
+        df: DataFrame con las columnas FEATURE_NAMES y la etiqueta
+        target: Columna de la etiqueta
+        test_size: Fracción de validación
+        random_state: Semilla de la partición
+
+    Returns:
+        Tupla (X_train, X_val, y_train, y_val); las X son matrices float64
+        en el orden de FEATURE_NAMES
+    """
+    missing = [name for name in FEATURE_NAMES + [target] if name not in df.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas en el dataset: {missing}")
+    X = df[FEATURE_NAMES].to_numpy(dtype=np.float64)
+    y = df[target].to_numpy()
+    return train_test_split(X, y, test_size=test_size, random_state=random_state)
+
+
+def build_reference_sketches(X_train, path, k=512):
+    """
+    Guarda los sketches de referencia de las features del modelo.
+
+    Args:
+        X_train: Matriz de entrenamiento (orden de FEATURE_NAMES)
+        path: Ruta del JSON de salida
+        k: Parámetro de precisión de cada sketch
+
+    Returns:
+        Diccionario {feature: KLLSketch}
+    """
+    return save_reference_sketches(pd.DataFrame(X_train, columns=FEATURE_NAMES), path, FEATURE_NAMES, k=k)
+
+
+def build_output_reference(model, X_val, path):
+    """
+    Guarda la referencia de salida con las predicciones del modelo sobre la validación.
+
+    Args:
+        model: Modelo con predict y predict_proba
+        X_val: Matriz de validación (orden de FEATURE_NAMES)
+        path: Ruta del JSON de salida
+
+    Returns:
+        Diccionario de referencia guardado
+    """
+    probabilities = model.predict_proba(X_val)[:, 1]
+    predictions = model.predict(X_val)
+    return save_output_reference(predictions, probabilities, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", required=True, help="CSV con FEATURE_NAMES y la etiqueta")
+    parser.add_argument("--model", required=True, help="Pickle del modelo entrenado")
+    parser.add_argument("--output-dir", default="data")
+    parser.add_argument("--target", default="Class")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--random-state", type=int, default=42)
+    parser.add_argument("--sketch-k", type=int, default=512)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    df = pd.read_csv(args.data)
+    X_train, X_val, _, _ = split_dataset(df, args.target, args.test_size, args.random_state)
+    model = joblib.load(args.model)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    build_reference_sketches(X_train, os.path.join(args.output_dir, "reference_sketches.json"), k=args.sketch_k)
+
+    reference = build_output_reference(model, X_val, os.path.join(args.output_dir, "output_reference.json"))
+    logger.info(f"✓ Tasa de fraude de referencia: {reference['fraud_rate']:.4%} ({reference['count']} predicciones)")
+
+
+if __name__ == "__main__":
+    main()
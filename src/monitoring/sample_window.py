@@ -0,0 +1,288 @@
+import time
+import logging
+from bisect import bisect_right
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SampleWindow:
+    """
+    Ventana circular de capacidad fija con las últimas muestras, por columnas.
+
+    Cada feature tiene su propio arreglo float64 preasignado (una fila de
+    `columns`) y las marcas de tiempo se guardan como int64 en nanosegundos
+    desde epoch. Al llenarse, cada muestra nueva sobrescribe la más antigua,
+    así que la memoria no crece con el tráfico. Las features ausentes se
+    guardan como NaN.
+
+    Si se indican los bordes de bins de cada feature, la ventana mantiene
+    además el histograma de las muestras retenidas: cada muestra suma en su
+    bin al entrar y resta al ser desalojada, así que leer el histograma
+    cuesta O(bins) sin importar cuántas muestras se hayan visto. Los bins
+    siguen la semántica de np.histogram: intervalos [a, b), el último
+    cerrado [a, b], y los valores fuera de rango no se cuentan.
+
+    Con un TimeBucketedHistogram, cada muestra binada se suma también a su
+    intervalo de tiempo, lo que permite histogramas de ventanas temporales
+    (15 min, 1 h...) independientes de la capacidad de la ventana.
+
+    Cada muestra puede llevar un peso (el inverso de su probabilidad de
+    captura, si se muestrea): los histogramas suman pesos en lugar de
+    contar, así que las proporciones siguen siendo insesgadas.
+    """
+
+    def __init__(self, feature_names, capacity=10000, bin_edges=None, time_histogram=None):
+        """
+        Inicializa la ventana.
+
+        Args:
+            feature_names: Nombres de las features, en el orden de las columnas
+            capacity: Número máximo de muestras retenidas
+            bin_edges: Lista con los bordes de bins de cada feature (None si no tiene)
+            time_histogram: TimeBucketedHistogram opcional con forma igual a `bin_counts`
+        """
+        if capacity <= 0:
+            raise ValueError(f"La capacidad de la ventana debe ser positiva: {capacity}")
+        self.feature_names = list(feature_names)
+        self.feature_index = {name: i for i, name in enumerate(self.feature_names)}
+        self.capacity = int(capacity)
+        self.columns = np.full((len(self.feature_names), self.capacity), np.nan)
+        self.timestamps = np.zeros(self.capacity, dtype=np.int64)
+        self.weights = np.ones(self.capacity)
+        self._next = 0
+        self._size = 0
+        # Muestras recibidas desde el arranque, incluidas las ya desalojadas
+        self.total = 0
+
+        # Escrituras en posiciones al azar (reservoir): el orden ya no es el del anillo
+        self._random_writes = False
+
+        # Histograma incremental ponderado: bin de cada muestra retenida (-1 = no contada)
+        self.bin_edges = list(bin_edges) if bin_edges is not None else [None] * len(self.feature_names)
+        self._edges_list = [list(map(float, e)) if e is not None else None for e in self.bin_edges]
+        self._edges_array = [np.asarray(e, dtype=np.float64) if e is not None else None for e in self.bin_edges]
+        max_bins = max([len(e) - 1 for e in self._edges_list if e is not None] or [0])
+        self.bin_counts = np.zeros((len(self.feature_names), max_bins))
+        self.bin_index = np.full((len(self.feature_names), self.capacity), -1, dtype=np.int16)
+        self._binned = [i for i, e in enumerate(self._edges_list) if e is not None]
+        self.time_histogram = time_histogram
+
+    def __len__(self):
+        return self._size
+
+    def append(self, row, timestamp_ns=None, weight=1.0, position=None, time_weight=None):
+        """
+        Añade una muestra.
+
+        Args:
+            row: Valores en el orden de `feature_names` (NaN si falta alguno)
+            timestamp_ns: Marca de tiempo en nanosegundos (por defecto, ahora)
+            weight: Peso de la muestra en el histograma de la ventana
+            position: Posición a sobrescribir con la ventana llena (por defecto,
+                la más antigua); la usa el muestreo reservoir
+            time_weight: Peso en las ventanas temporales (por defecto, `weight`)
+        """
+        if position is None or self._size < self.capacity:
+            position = self._next
+            self._next = (position + 1) % self.capacity
+        else:
+            self._random_writes = True
+        timestamp_ns = time.time_ns() if timestamp_ns is None else timestamp_ns
+        replacing = self._size == self.capacity
+        self.columns[:, position] = row
+        if self._binned:
+            # Una sola conversión a listas: indexar escalares de numpy es caro
+            old_indices = self.bin_index[:, position].tolist() if replacing else None
+            old_weight = float(self.weights[position])
+            stored = self.columns[:, position].tolist()
+            new_indices = [-1] * len(stored)
+            for f in self._binned:
+                if old_indices is not None and old_indices[f] >= 0:
+                    self.bin_counts[f, old_indices[f]] -= old_weight
+                index = self._bin_scalar(f, stored[f])
+                if index >= 0:
+                    self.bin_counts[f, index] += weight
+                new_indices[f] = index
+            self.bin_index[:, position] = new_indices
+            if self.time_histogram is not None:
+                self.time_histogram.add_sample(new_indices, timestamp_ns, weight if time_weight is None else time_weight)
+        self.weights[position] = weight
+        self.timestamps[position] = timestamp_ns
+        self._size = min(self._size + 1, self.capacity)
+        self.total += 1
+
+    def extend(self, values, timestamp_ns=None, weights=None, time_weights=None):
+        """
+        Añade un lote de muestras con una única marca de tiempo.
+
+        Args:
+            values: Matriz (n_muestras x n_features) en el orden de `feature_names`
+            timestamp_ns: Marca de tiempo en nanosegundos (por defecto, ahora)
+            weights: Peso de cada muestra en el histograma de la ventana (por defecto, 1)
+            time_weights: Peso de cada muestra en las ventanas temporales (por defecto, `weights`)
+        """
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if n == 0:
+            return
+        timestamp_ns = time.time_ns() if timestamp_ns is None else timestamp_ns
+        weights = np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64)
+        time_weights = weights if time_weights is None else np.asarray(time_weights, dtype=np.float64)
+        self.total += n
+
+        # De un lote mayor que la ventana solo sobreviven las últimas filas
+        if n >= self.capacity:
+            if self.time_histogram is not None:
+                # Los intervalos de tiempo cuentan el lote completo, no solo lo retenido
+                batch_counts = np.zeros_like(self.bin_counts)
+                for f in self._binned:
+                    batch_counts[f] = self._bincount(self._bin_array(f, values[:, f]), time_weights)
+                self.time_histogram.add_counts(batch_counts, n, timestamp_ns)
+            values = values[-self.capacity:]
+            self.columns[:] = values.T
+            self.weights[:] = weights[-self.capacity:]
+            self.timestamps[:] = timestamp_ns
+            self._next = 0
+            self._size = self.capacity
+            self._random_writes = False
+            self._rebuild_bins()
+            return
+
+        positions = (self._next + np.arange(n)) % self.capacity
+        # Posiciones ocupadas que se van a sobrescribir: las últimas del lote que dan la vuelta
+        overflow = max(0, self._size + n - self.capacity)
+        evicted = positions[n - overflow:]
+        if len(evicted) and self._binned:
+            self._forget_bins(evicted)
+        self.columns[:, positions] = values.T
+        self.weights[positions] = weights
+        batch_counts = np.zeros_like(self.bin_counts) if self.time_histogram is not None else None
+        for f in self._binned:
+            indices = self._bin_array(f, self.columns[f, positions])
+            self.bin_index[f, positions] = indices
+            counts = self._bincount(indices, weights)
+            self.bin_counts[f] += counts
+            if batch_counts is not None:
+                batch_counts[f] = counts if time_weights is weights else self._bincount(indices, time_weights)
+        if batch_counts is not None:
+            self.time_histogram.add_counts(batch_counts, n, timestamp_ns)
+        self.timestamps[positions] = timestamp_ns
+        self._next = (self._next + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def _bin_scalar(self, f, value):
+        edges = self._edges_list[f]
+        if not (edges[0] <= value <= edges[-1]):  # también descarta NaN
+            return -1
+        return min(bisect_right(edges, value) - 1, len(edges) - 2)
+
+    def _bin_array(self, f, values):
+        edges = self._edges_array[f]
+        indices = np.searchsorted(edges, values, side="right") - 1
+        # El último bin incluye su borde derecho, como en np.histogram
+        indices[values == edges[-1]] = len(edges) - 2
+        indices[(indices < 0) | (indices >= len(edges) - 1) | np.isnan(values)] = -1
+        return indices.astype(np.int16)
+
+    def _bincount(self, indices, weights):
+        valid = indices >= 0
+        return np.bincount(indices[valid], weights=weights[valid], minlength=self.bin_counts.shape[1])
+
+    def _forget_bins(self, positions):
+        """Resta del histograma las muestras en `positions` antes de sobrescribirlas."""
+        weights = self.weights[positions]
+        for f in self._binned:
+            self.bin_counts[f] -= self._bincount(self.bin_index[f, positions], weights)
+
+    def _rebuild_bins(self):
+        self.bin_counts.fill(0)
+        self.bin_index.fill(-1)
+        weights = self.weights[:self._size]
+        for f in self._binned:
+            indices = self._bin_array(f, self.columns[f, :self._size])
+            self.bin_index[f, :self._size] = indices
+            self.bin_counts[f] += self._bincount(indices, weights)
+
+    def histogram(self, feature):
+        """
+        Conteos por bin de las muestras retenidas de una feature.
+
+        Equivale a np.histogram(self.column(feature), bins=bordes)[0], pero
+        sin recorrer la ventana.
+
+        Args:
+            feature: Nombre de la feature
+
+        Returns:
+            Arreglo con la suma de pesos por bin (conteos si no hay muestreo),
+            o None si la feature no tiene bins
+        """
+        f = self.feature_index[feature]
+        edges = self._edges_list[f]
+        if edges is None:
+            return None
+        return self.bin_counts[f, :len(edges) - 1].copy()
+
+    def column(self, feature):
+        """
+        Valores retenidos de una feature, sin NaN.
+
+        El orden no es cronológico una vez que la ventana da la vuelta; para
+        histogramas y estadísticos no importa.
+
+        Args:
+            feature: Nombre de la feature
+
+        Returns:
+            Arreglo float64 con los valores presentes
+        """
+        values = self.columns[self.feature_index[feature], :self._size]
+        return values[~np.isnan(values)]
+
+    def ordered_indices(self):
+        """Posiciones de las muestras retenidas, de la más antigua a la más reciente."""
+        if self._random_writes:
+            return np.argsort(self.timestamps[:self._size], kind="stable")
+        if self._size < self.capacity:
+            return np.arange(self._size)
+        return (self._next + np.arange(self.capacity)) % self.capacity
+
+    def to_records(self, limit=None):
+        """
+        Muestras como diccionarios {"timestamp": ISO, feature: valor}, en orden cronológico.
+
+        Pensado para depuración y exportación, no para el camino caliente.
+
+        Args:
+            limit: Número máximo de muestras más recientes a devolver
+        """
+        indices = self.ordered_indices()
+        if limit is not None:
+            indices = indices[-limit:]
+        records = []
+        for position in indices:
+            record = {"timestamp": datetime.fromtimestamp(self.timestamps[position] / 1e9).isoformat()}
+            for name, value in zip(self.feature_names, self.columns[:, position].tolist()):
+                if not np.isnan(value):
+                    record[name] = value
+            records.append(record)
+        return records
+
+    def clear(self):
+        """Vacía la ventana sin liberar los arreglos."""
+        self.columns.fill(np.nan)
+        self.weights.fill(1.0)
+        self._random_writes = False
+        self.bin_counts.fill(0)
+        self.bin_index.fill(-1)
+        self._next = 0
+        self._size = 0
+
+    @property
+    def nbytes(self):
+        """Memoria ocupada por los arreglos de la ventana."""
+        return (self.columns.nbytes + self.timestamps.nbytes + self.weights.nbytes
+                + self.bin_index.nbytes + self.bin_counts.nbytes)
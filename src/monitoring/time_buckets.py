@@ -0,0 +1,217 @@
+import math
+import time
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Ventanas por defecto de las métricas de drift: etiqueta -> segundos
+DEFAULT_WINDOWS = {"15m": 900, "1h": 3600, "24h": 86400}
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Exponente máximo del peso de decaimiento antes de reescalar (2**60 sigue siendo exacto en float64)
+_MAX_DECAY_EXPONENT = 60.0
+
+
+def parse_duration(text):
+    """
+    Convierte una duración como "90s", "15m", "1h" o "7d" a segundos.
+
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    text = text.strip().lower()
+    if text and text[-1] in _UNITS:
+        return float(text[:-1]) * _UNITS[text[-1]]
+    return float(text)
+
+
+def parse_windows(spec):
+    """
+    Interpreta una lista de ventanas como "15m,1h,24h".
+
+    Args:
+        spec: Duraciones separadas por comas
+
+    Returns:
+        Diccionario {etiqueta: segundos}, en el orden indicado
+    """
+    windows = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            windows[item] = parse_duration(item)
+        except ValueError:
+            logger.warning(f"⚠ Ventana de drift inválida ignorada: {item!r}")
+    return windows
+
+
+class TimeBucketedHistogram:
+    """
+    Conteos por bin agrupados en intervalos de tiempo fijos (por defecto, minutos).
+
+    Los intervalos forman un anillo que cubre la ventana más larga: al
+    entrar en un minuto nuevo se reutiliza el hueco del minuto más antiguo.
+    Los conteos de cualquier ventana reciente (15 min, 1 h, 24 h) son la
+    suma de sus intervalos, sin volver a recorrer las muestras.
+
+    Además mantiene una variante con decaimiento exponencial: cada muestra
+    pesa 2**(-edad / half_life). Para no multiplicar toda la matriz en cada
+    muestra, las muestras nuevas se suman con peso creciente respecto a un
+    origen y el factor común se aplica al leer.
+
+    Los conteos son sumas de pesos (1 por muestra salvo que la captura esté
+    muestreada); el número de muestras cuenta las capturadas, sin ponderar.
+    """
+
+    def __init__(self, shape, bucket_seconds=60, retention_seconds=86400, half_life=3600.0):
+        """
+        Inicializa el histograma.
+
+        Args:
+            shape: Forma de los conteos de un intervalo (features x bins)
+            bucket_seconds: Duración de cada intervalo en segundos
+            retention_seconds: Ventana más larga que se podrá consultar
+            half_life: Semivida en segundos de la variante con decaimiento
+        """
+        self.shape = tuple(shape)
+        self.bucket_seconds = float(bucket_seconds)
+        self.half_life = float(half_life)
+        # Un intervalo extra para el minuto en curso, que está a medias
+        self.n_buckets = int(math.ceil(retention_seconds / self.bucket_seconds)) + 1
+        self.counts = np.zeros((self.n_buckets,) + self.shape)
+        self.sample_counts = np.zeros(self.n_buckets, dtype=np.int64)
+        self.bucket_ids = np.full(self.n_buckets, -1, dtype=np.int64)
+        self._decayed = np.zeros(self.shape, dtype=np.float64)
+        self._decayed_samples = 0.0
+        self._decay_origin = None
+
+    def _slot(self, timestamp_s):
+        bucket = int(timestamp_s // self.bucket_seconds)
+        slot = bucket % self.n_buckets
+        current = self.bucket_ids[slot]
+        if current != bucket:
+            if current > bucket:
+                return None  # Muestra más antigua que la retención
+            self.counts[slot] = 0
+            self.sample_counts[slot] = 0
+            self.bucket_ids[slot] = bucket
+        return slot
+
+    def _decay_weight(self, timestamp_s):
+        if self._decay_origin is None:
+            self._decay_origin = timestamp_s
+        exponent = (timestamp_s - self._decay_origin) / self.half_life
+        if exponent > _MAX_DECAY_EXPONENT:
+            # Reescalar al nuevo origen para que los pesos no se desborden
+            factor = 2.0 ** -exponent
+            self._decayed *= factor
+            self._decayed_samples *= factor
+            self._decay_origin = timestamp_s
+            exponent = 0.0
+        return 2.0 ** exponent
+
+    def add_sample(self, bins, timestamp_ns, weight=1.0):
+        """
+        Suma una muestra.
+
+        Args:
+            bins: Bin de la muestra en cada feature (-1 si no cae en ninguno)
+            timestamp_ns: Marca de tiempo en nanosegundos
+            weight: Peso de la muestra en los conteos
+        """
+        timestamp_s = timestamp_ns / 1e9
+        slot = self._slot(timestamp_s)
+        if slot is None:
+            return
+        decay = self._decay_weight(timestamp_s)
+        decayed_weight = decay * weight
+        counts = self.counts[slot]
+        for f, index in enumerate(bins):
+            if index >= 0:
+                counts[f, index] += weight
+                self._decayed[f, index] += decayed_weight
+        self.sample_counts[slot] += 1
+        self._decayed_samples += decay
+
+    def add_counts(self, counts, n_samples, timestamp_ns):
+        """
+        Suma un lote ya agregado con una única marca de tiempo.
+
+        Args:
+            counts: Conteos (o sumas de pesos) del lote (features x bins)
+            n_samples: Número de muestras del lote
+            timestamp_ns: Marca de tiempo en nanosegundos
+        """
+        timestamp_s = timestamp_ns / 1e9
+        slot = self._slot(timestamp_s)
+        if slot is None:
+            return
+        weight = self._decay_weight(timestamp_s)
+        self.counts[slot] += counts
+        self.sample_counts[slot] += n_samples
+        self._decayed += weight * counts
+        self._decayed_samples += weight * n_samples
+
+    def window(self, seconds, now_ns=None):
+        """
+        Conteos de los últimos `seconds` segundos, con resolución de un intervalo.
+
+        Args:
+            seconds: Duración de la ventana
+            now_ns: Instante de referencia en nanosegundos (por defecto, ahora)
+
+        Returns:
+            Tupla (conteos features x bins, número de muestras)
+        """
+        now_s = (time.time_ns() if now_ns is None else now_ns) / 1e9
+        current = int(now_s // self.bucket_seconds)
+        n = max(1, int(math.ceil(seconds / self.bucket_seconds)))
+        mask = (self.bucket_ids > current - n) & (self.bucket_ids <= current)
+        return self.counts[mask].sum(axis=0), int(self.sample_counts[mask].sum())
+
+    def decayed(self, now_ns=None):
+        """
+        Conteos con decaimiento exponencial en el instante indicado.
+
+        Returns:
+            Tupla (conteos ponderados features x bins, número efectivo de muestras)
+        """
+        if self._decay_origin is None:
+            return np.zeros(self.shape), 0.0
+        now_s = (time.time_ns() if now_ns is None else now_ns) / 1e9
+        factor = 2.0 ** ((self._decay_origin - now_s) / self.half_life)
+        return self._decayed * factor, self._decayed_samples * factor
+
+    def snapshot(self, windows, now_ns=None):
+        """
+        Conteos de varias ventanas y de la variante con decaimiento a la vez.
+
+        Args:
+            windows: Diccionario {etiqueta: segundos}
+
+        Returns:
+            Diccionario {etiqueta: (conteos, muestras)}, con la clave "decayed"
+        """
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        result = {label: self.window(seconds, now_ns) for label, seconds in windows.items()}
+        result["decayed"] = self.decayed(now_ns)
+        return result
+
+    def clear(self):
+        """Descarta todos los conteos."""
+        self.counts.fill(0)
+        self.sample_counts.fill(0)
+        self.bucket_ids.fill(-1)
+        self._decayed.fill(0.0)
+        self._decayed_samples = 0.0
+        self._decay_origin = None
+
+    @property
+    def nbytes(self):
+        """Memoria ocupada por los conteos."""
+        return self.counts.nbytes + self.sample_counts.nbytes + self.bucket_ids.nbytes + self._decayed.nbytes
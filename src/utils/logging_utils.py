@@ -0,0 +1,240 @@
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+
+# Campos estándar de LogRecord que no se copian como campos extra en JSON
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+# Handlers que setup_logging añadió a la raíz (los de uvicorn, gunicorn o pytest no se tocan)
+_installed_handlers = []
+_hooks_registered = False
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatea cada registro como una línea JSON, incluidos los campos de `extra`."""
+
+    def format(self, record):
+        payload = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class RawQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que encola el registro sin formatearlo.
+
+    QueueHandler.prepare() llama a format() en el hilo que registra el
+    mensaje; aquí se encola el LogRecord tal cual y el QueueListener hace
+    el formateo (incluido el de los argumentos %s) además de la escritura.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def _start_listener(handlers):
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return log_queue
+
+
+def setup_logging(level=None, log_format=None, async_logging=None, stream=None, force=False):
+    """
+    Configura el logging raíz de la aplicación.
+
+    Con LOG_ASYNC=true los hilos de las peticiones solo encolan el registro
+    (RawQueueHandler) y un hilo aparte (QueueListener) lo formatea y
+    escribe, así que ni el formateo ni la escritura bloquean una petición.
+
+    Se llama desde el lifespan de la app y desde gunicorn.conf.py, no al
+    importar: solo sustituye los handlers que añadió una llamada anterior,
+    y si el proceso ya está configurado no hace nada.
+
+    Args:
+        level: Nivel de log (por defecto, LOG_LEVEL o INFO)
+        log_format: "text" o "json" (por defecto, LOG_FORMAT o text)
+        async_logging: Si se usa el handler con cola (por defecto, LOG_ASYNC o true)
+        stream: Flujo de salida (por defecto, sys.stderr)
+        force: Sustituye la configuración aunque ya esté instalada
+    """
+    root = logging.getLogger()
+    if not force and _installed_handlers and all(handler in root.handlers for handler in _installed_handlers):
+        return
+
+    level = level or os.getenv("LOG_LEVEL", "INFO").upper()
+    log_format = (log_format or os.getenv("LOG_FORMAT", "text")).lower()
+    if async_logging is None:
+        async_logging = os.getenv("LOG_ASYNC", "true").lower() in ("1", "true", "yes")
+
+    stream_handler = logging.StreamHandler(stream)
+    if log_format == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+
+    root.setLevel(level)
+    _remove_installed(root)
+    _stop_listener()
+
+    if not async_logging:
+        _install(root, stream_handler)
+        return
+
+    _install(root, RawQueueHandler(_start_listener([stream_handler])))
+    _register_hooks()
+
+
+def _install(root, handler):
+    root.addHandler(handler)
+    _installed_handlers.append(handler)
+
+
+def _remove_installed(root):
+    while _installed_handlers:
+        root.removeHandler(_installed_handlers.pop())
+
+
+
+def _register_hooks():
+    global _hooks_registered
+    if _hooks_registered:
+        return
+    _hooks_registered = True
+    atexit.register(_stop_listener)
+    # Tras un fork (gunicorn con preload) el hilo del listener no existe en el hijo
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_in_child)
+
+
+def _restart_in_child():
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    _remove_installed(root)
+    _install(root, RawQueueHandler(_start_listener(_listener.handlers)))
+
+
+def shutdown_logging():
+    """
+    Retira los handlers que instaló setup_logging y para el listener.
+
+    Al parar el listener se escriben los registros que quedaban en la cola.
+    """
+    _remove_installed(logging.getLogger())
+    _stop_listener()
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except Exception:
+            pass
+        _listener = None
+
+
+def parse_sample_rates(spec):
+    """
+    Interpreta una especificación "evento=tasa,evento=tasa".
+
+    Args:
+        spec: Cadena de configuración (p. ej. LOG_SAMPLE_RATES)
+
+    Returns:
+        Diccionario evento -> tasa entre 0 y 1
+    """
+    rates = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            event, rate = item.split("=", 1)
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+class SampledLogger:
+    """
+    Envoltorio de un logger para mensajes del camino caliente.
+
+    Comprueba el nivel antes de hacer nada, usa formato diferido (%s, los
+    argumentos solo se formatean si el mensaje se emite) y emite solo una
+    fracción de los mensajes de cada evento: con tasa 0.01 se registra uno
+    de cada 100.
+    """
+
+    def __init__(self, logger, rates=None, default_rate=1.0):
+        """
+        Inicializa el envoltorio.
+
+        Args:
+            logger: Logger subyacente
+            rates: Diccionario evento -> tasa de muestreo
+            default_rate: Tasa para eventos sin configuración propia
+        """
+        self.logger = logger
+        self.rates = rates or {}
+        self.default_rate = default_rate
+        self._counters = {}
+
+    @classmethod
+    def from_env(cls, logger):
+        """Crea el envoltorio a partir de LOG_SAMPLE_RATES y LOG_SAMPLE_RATE."""
+        return cls(
+            logger,
+            rates=parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")),
+            default_rate=float(os.getenv("LOG_SAMPLE_RATE", "1")),
+        )
+
+    def _should_log(self, event):
+        rate = self.rates.get(event, self.default_rate)
+        if rate >= 1.0:
+            return True, rate
+        if rate <= 0.0:
+            return False, rate
+
+        counter = self._counters.get(event)
+        if counter is None:
+            counter = self._counters.setdefault(event, itertools.count())
+        # next() sobre itertools.count es atómico bajo el GIL
+        return next(counter) % round(1.0 / rate) == 0, rate
+
+    def log(self, level, event, msg, *args):
+        """
+        Registra `msg % args` si el nivel está habilitado y el evento sale en la muestra.
+
+        Args:
+            level: Nivel de logging
+            event: Nombre del evento usado para el muestreo
+            msg: Mensaje con marcadores %
+            *args: Argumentos del mensaje (se formatean solo si se emite)
+        """
+        if not self.logger.isEnabledFor(level):
+            return
+        emit, rate = self._should_log(event)
+        if emit:
+            self.logger.log(level, msg, *args, extra={"event": event, "sample_rate": rate})
+
+    def debug(self, event, msg, *args):
+        self.log(logging.DEBUG, event, msg, *args)
+
+    def info(self, event, msg, *args):
+        self.log(logging.INFO, event, msg, *args)
+
+    def warning(self, event, msg, *args):
+        self.log(logging.WARNING, event, msg, *args)
@@ -0,0 +1,101 @@
+import os
+import logging
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Campos de /proc/<pid>/smaps_rollup que se reportan (en kB)
+_SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def process_memory(pid=None):
+    """
+    Obtiene el uso de memoria de un proceso.
+
+    En Linux se lee /proc/<pid>/smaps_rollup: RSS cuenta las páginas
+    compartidas completas en cada worker, mientras que PSS las reparte entre
+    los procesos que las comparten, por lo que la suma de PSS de todos los
+    workers es la memoria real consumida.
+
+    Args:
+        pid: PID del proceso (por defecto, el actual)
+
+    Returns:
+        Diccionario con valores en MB, o solo el RSS máximo si /proc no está disponible
+    """
+    pid = pid or os.getpid()
+    try:
+        memory = {}
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in _SMAPS_FIELDS:
+                    memory[name.lower() + "_mb"] = round(int(rest.split()[0]) / 1024.0, 1)
+        return {"pid": pid, **memory}
+    except (OSError, ValueError, IndexError):
+        # Fuera de Linux solo tenemos el pico de RSS del proceso actual
+        if resource is None:
+            return {"pid": pid}
+        max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"pid": pid, "max_rss_mb": round(max_rss_kb / 1024.0, 1)}
+
+
+def _is_gunicorn_master(pid):
+    """Indica si el proceso `pid` es un master de gunicorn, según su línea de comandos."""
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return b"gunicorn" in f.read()
+    except OSError:
+        return False
+
+
+def sibling_workers():
+    """
+    Devuelve los PIDs de los procesos hijos del master (workers de gunicorn).
+
+    Fuera de gunicorn (uvicorn directo, tests) el padre puede ser una shell
+    u otro programa cualquiera, así que solo se devuelve el proceso actual.
+    """
+    ppid = os.getppid()
+    if not _is_gunicorn_master(ppid):
+        return [os.getpid()]
+    try:
+        with open(f"/proc/{ppid}/task/{ppid}/children") as f:
+            return [int(pid) for pid in f.read().split()]
+    except (OSError, ValueError):
+        return [os.getpid()]
+
+
+def workers_memory_report():
+    """
+    Resume la memoria de todos los workers hermanos de este proceso.
+
+    Returns:
+        Diccionario con el detalle por worker y los totales de RSS y PSS
+    """
+    workers = [process_memory(pid) for pid in sibling_workers()]
+    return {
+        "workers": workers,
+        "total_rss_mb": round(sum(w.get("rss_mb", 0.0) for w in workers), 1),
+        "total_pss_mb": round(sum(w.get("pss_mb", 0.0) for w in workers), 1),
+    }
+
+
+def log_memory_report(label):
+    """
+    Registra en el log la memoria del proceso actual y de sus workers hermanos.
+
+    Args:
+        label: Texto que identifica el momento del reporte
+    """
+    report = workers_memory_report()
+    logger.info(f"[{label}] Memoria de este worker: {process_memory()}")
+    logger.info(
+        f"[{label}] {len(report['workers'])} workers - RSS total: {report['total_rss_mb']} MB, "
+        f"PSS total (memoria real): {report['total_pss_mb']} MB"
+    )
+    return report
@@ -0,0 +1,344 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import logging
+
+import requests
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class ChecksumMismatchError(Exception):
+    """Se lanza cuando el archivo descargado no coincide con el manifiesto."""
+
+
+def file_sha256(path):
+    """Calcula el SHA-256 de un archivo leyéndolo por bloques."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(manifest_url=None, timeout=10):
+    """
+    Obtiene el checksum y tamaño esperados del modelo.
+
+    Se combinan MODEL_SHA256 / MODEL_SIZE con un manifiesto JSON opcional
+    ({"sha256": ..., "size": ...}) publicado en MODEL_MANIFEST_URL.
+
+    Args:
+        manifest_url: URL del manifiesto (por defecto, MODEL_MANIFEST_URL)
+        timeout: Tiempo máximo de la petición en segundos
+
+    Returns:
+        Diccionario con "sha256" y "size" (None si no se conocen)
+    """
+    manifest = {
+        "sha256": os.getenv("MODEL_SHA256"),
+        "size": int(os.getenv("MODEL_SIZE")) if os.getenv("MODEL_SIZE") else None,
+    }
+    manifest_url = manifest_url or os.getenv("MODEL_MANIFEST_URL")
+    if manifest_url:
+        try:
+            response = requests.get(manifest_url, timeout=timeout)
+            response.raise_for_status()
+            remote = response.json()
+            manifest["sha256"] = remote.get("sha256") or manifest["sha256"]
+            if remote.get("size"):
+                manifest["size"] = int(remote["size"])
+        except Exception as e:
+            logger.error(f"✗ No se pudo leer el manifiesto {manifest_url}: {str(e)}")
+    if manifest["sha256"]:
+        manifest["sha256"] = manifest["sha256"].lower()
+    return manifest
+
+
+def _sidecar_path(path):
+    return path + ".sha256.json"
+
+
+def _write_sidecar(path, sha256):
+    stat = os.stat(path)
+    with open(_sidecar_path(path), "w") as f:
+        json.dump({"sha256": sha256, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}, f)
+
+
+def verified_sha256(path):
+    """
+    Devuelve el SHA-256 de un archivo reutilizando el registro lateral si sigue vigente.
+
+    El registro (<archivo>.sha256.json) guarda tamaño y fecha de modificación,
+    así que un reinicio no vuelve a leer el modelo completo para verificarlo.
+
+    Args:
+        path: Ruta del archivo
+
+    Returns:
+        SHA-256 en hexadecimal, o None si el archivo no existe
+    """
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    try:
+        with open(_sidecar_path(path)) as f:
+            sidecar = json.load(f)
+        if sidecar.get("size") == stat.st_size and sidecar.get("mtime_ns") == stat.st_mtime_ns:
+            return sidecar["sha256"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sha256 = file_sha256(path)
+    _write_sidecar(path, sha256)
+    return sha256
+
+
+def is_valid_file(path, sha256=None, size=None):
+    """
+    Comprueba que un archivo local coincide con el checksum y tamaño esperados.
+
+    Args:
+        path: Ruta del archivo
+        sha256: Checksum esperado (None para no verificarlo)
+        size: Tamaño esperado en bytes (None para no verificarlo)
+
+    Returns:
+        True si el archivo existe y coincide
+    """
+    if not os.path.exists(path):
+        return False
+    if size is not None and os.path.getsize(path) != size:
+        return False
+    if sha256 is not None and verified_sha256(path) != sha256:
+        return False
+    return True
+
+
+def _publish(source, dest_path):
+    """Coloca `source` en `dest_path` de forma atómica (enlace duro o copia + rename)."""
+    tmp_path = f"{dest_path}.tmp-{os.getpid()}"
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, dest_path)
+
+
+def _validator_path(part_path):
+    return part_path + ".validator.json"
+
+
+def _response_validator(url, response):
+    """Validador de la versión descargada: ETag fuerte o, si no hay, Last-Modified."""
+    etag = response.headers.get("ETag")
+    if etag and etag.startswith("W/"):
+        # If-Range no admite ETags débiles
+        etag = None
+    return {"url": url, "etag": etag, "last_modified": response.headers.get("Last-Modified")}
+
+
+def _validator_changed(stored, current):
+    """Indica si la respuesta trae un validador distinto del guardado con la parte."""
+    for name in ("etag", "last_modified"):
+        if stored.get(name) and current.get(name):
+            return stored[name] != current[name]
+    return False
+
+
+def _read_validator(part_path):
+    try:
+        with open(_validator_path(part_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _discard_part(part_path):
+    """Borra la descarga parcial y su validador."""
+    for path in (part_path, _validator_path(part_path)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _stream_to_part(url, part_path, chunk_size, timeout):
+    """
+    Descarga (o continúa descargando) `url` en `part_path`.
+
+    Junto a la parte se guarda el validador de la respuesta (ETag o
+    Last-Modified) y la reanudación lo envía en If-Range: si el archivo
+    remoto cambió, el servidor responde 200 con el contenido completo y la
+    parte se reescribe desde cero en lugar de empalmar dos versiones.
+
+    Returns:
+        True si el servidor indicó que el archivo ya estaba completo
+    """
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    validator = _read_validator(part_path) if offset else None
+    if offset and (validator is None or validator.get("url") != url
+                   or not (validator.get("etag") or validator.get("last_modified"))):
+        # Sin validador no se puede saber de qué versión es la parte
+        logger.warning("⚠ Descarga parcial sin validador o de otra URL; se empieza de cero")
+        _discard_part(part_path)
+        offset = 0
+
+    headers = {}
+    if offset:
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator["etag"] or validator["last_modified"]}
+
+    with requests.get(url, stream=True, timeout=timeout, headers=headers) as response:
+        if response.status_code == 416:
+            # El rango empieza en el final: la parte está completa si su tamaño es el total remoto
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit() and int(total) == offset:
+                return True
+            _discard_part(part_path)
+            raise requests.exceptions.ChunkedEncodingError(
+                f"La descarga parcial ({offset} bytes) no coincide con el archivo remoto ({total or '?'} bytes)"
+            )
+        response.raise_for_status()
+
+        current = _response_validator(url, response)
+        if offset and response.status_code == 206:
+            if _validator_changed(validator, current):
+                _discard_part(part_path)
+                raise requests.exceptions.ChunkedEncodingError("El archivo remoto cambió durante la descarga")
+            mode = "ab"
+            logger.info(f"Reanudando descarga desde el byte {offset}")
+        else:
+            # El servidor ignoró el rango o el archivo cambió: empezar de cero
+            if offset:
+                logger.warning("⚠ El servidor devolvió el archivo completo; se descarta la descarga parcial")
+            mode = "wb"
+            with open(_validator_path(part_path), "w") as f:
+                json.dump(current, f)
+
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+    return False
+
+
+def download_model(url, dest_path, sha256=None, size=None, cache_dir=None,
+                   chunk_size=CHUNK_SIZE, max_retries=5, timeout=60):
+    """
+    Descarga el modelo por bloques, con reanudación, verificación y caché por contenido.
+
+    La descarga y la publicación se hacen bajo un bloqueo de archivo
+    (<dest>.part.lock), así que varios procesos no escriben a la vez la
+    misma parte. El contenido se escribe en <dest>.part (nunca se mantiene
+    completo en memoria); ante un fallo de red se reintenta con una petición Range desde
+    el último byte recibido. Solo tras verificar tamaño y SHA-256 se
+    renombra de forma atómica a `dest_path`. Si el checksum esperado ya está
+    en `cache_dir`, no se descarga nada.
+
+    Args:
+        url: URL del modelo
+        dest_path: Ruta final del modelo (MODEL_PATH)
+        sha256: Checksum esperado (opcional)
+        size: Tamaño esperado en bytes (opcional)
+        cache_dir: Carpeta de la caché por contenido (opcional)
+        chunk_size: Tamaño de bloque en bytes
+        max_retries: Número máximo de intentos
+        timeout: Tiempo máximo por petición en segundos
+
+    Returns:
+        SHA-256 del modelo publicado en `dest_path`
+
+    Raises:
+        ChecksumMismatchError: Si el archivo descargado no coincide con el manifiesto
+        requests.RequestException: Si se agotan los reintentos
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+
+    # Con varios workers cargando en modo lazy todos descargarían sobre el mismo
+    # .part: uno descarga bajo el bloqueo y el resto reutiliza su resultado
+    published_before = _file_signature(dest_path)
+    with open(dest_path + ".part.lock", "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if not sha256 and published_before != _file_signature(dest_path) and is_valid_file(dest_path, None, size):
+                logger.info("✓ Otro proceso acaba de descargar el modelo; no se descarga de nuevo")
+                return verified_sha256(dest_path)
+            return _download_locked(url, dest_path, sha256, size, cache_dir, chunk_size, max_retries, timeout)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _file_signature(path):
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _download_locked(url, dest_path, sha256, size, cache_dir, chunk_size, max_retries, timeout):
+    """Cuerpo de download_model; se ejecuta con el bloqueo de <dest>.part.lock tomado."""
+    if sha256 and is_valid_file(dest_path, sha256, size):
+        logger.info("✓ El modelo local ya coincide con el manifiesto; no se descarga")
+        return sha256
+
+    if sha256 and cache_dir:
+        cached_path = os.path.join(cache_dir, f"{sha256}.pkl")
+        if is_valid_file(cached_path, sha256, size):
+            logger.info(f"✓ Modelo encontrado en caché por contenido: {cached_path}")
+            _publish(cached_path, dest_path)
+            _write_sidecar(dest_path, sha256)
+            return sha256
+
+    part_path = dest_path + ".part"
+    for attempt in range(1, max_retries + 1):
+        try:
+            if _stream_to_part(url, part_path, chunk_size, timeout):
+                logger.info("La descarga parcial ya estaba completa en el servidor")
+
+            actual_size = os.path.getsize(part_path)
+            if size is not None and actual_size != size:
+                if actual_size < size:
+                    raise requests.exceptions.ChunkedEncodingError(
+                        f"Descarga incompleta: {actual_size} de {size} bytes"
+                    )
+                _discard_part(part_path)
+                raise ChecksumMismatchError(f"Tamaño inesperado: {actual_size} bytes, se esperaban {size}")
+
+            actual_sha256 = file_sha256(part_path)
+            if sha256 and actual_sha256 != sha256:
+                _discard_part(part_path)
+                raise ChecksumMismatchError(f"SHA-256 inesperado: {actual_sha256}, se esperaba {sha256}")
+
+            os.replace(part_path, dest_path)
+            _discard_part(part_path)
+            _write_sidecar(dest_path, actual_sha256)
+            logger.info(f"✓ Modelo descargado y verificado ({actual_size} bytes, sha256 {actual_sha256[:12]})")
+
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+                cached_path = os.path.join(cache_dir, f"{actual_sha256}.pkl")
+                if not os.path.exists(cached_path):
+                    _publish(dest_path, cached_path)
+            return actual_sha256
+        except ChecksumMismatchError:
+            # Un archivo corrupto no se arregla reanudando; solo se reintenta una vez desde cero
+            if attempt >= 2:
+                raise
+            logger.error("✗ Checksum incorrecto, se descarta la descarga y se reintenta desde cero")
+        except requests.RequestException as e:
+            if attempt >= max_retries:
+                raise
+            wait = min(2 ** attempt, 30)
+            logger.warning(f"⚠ Error de red en el intento {attempt}/{max_retries}: {str(e)}. Reintento en {wait}s")
+            time.sleep(wait)
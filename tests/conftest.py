@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(scope="session")
+def api():
+    """Módulo de la app FastAPI (requiere las dependencias completas, mlflow incluido)."""
+    pytest.importorskip("mlflow")
+    from src.api import app as api_module
+    return api_module
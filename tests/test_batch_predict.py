@@ -0,0 +1,140 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from src.api.codec import BINARY_DTYPE, BINARY_MEDIA_TYPE
+from src.api.models import FEATURE_NAMES
+from src.models.serving_model import ServingModel
+from src.monitoring.capture_policy import CapturePolicy
+
+
+class CountingForest:
+    """Envuelve un bosque de scikit-learn y cuenta las llamadas a predict_proba."""
+
+    def __init__(self, forest):
+        self.forest = forest
+        self.classes_ = forest.classes_
+        self.n_features_in_ = forest.n_features_in_
+        self.calls = []
+
+    def predict_proba(self, features):
+        self.calls.append(len(features))
+        return self.forest.predict_proba(features)
+
+
+class RecordingDetector:
+    """Detector de drift simulado que registra los lotes y las predicciones."""
+
+    def __init__(self):
+        self.capture = CapturePolicy()
+        self.samples = []
+        self.batches = []
+        self.predictions = []
+
+    def add_sample(self, sample_data, weight=None, prediction=None):
+        self.samples.append(sample_data)
+        return True
+
+    def add_samples(self, values, feature_names, predictions=None):
+        self.batches.append((values.copy(), list(feature_names)))
+        return True
+
+    def add_predictions(self, predictions, probabilities):
+        self.predictions.append((np.asarray(predictions).copy(), np.asarray(probabilities).copy()))
+
+
+@pytest.fixture(scope="module")
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, len(FEATURE_NAMES)))
+    y = (X[:, 0] + X[:, 3] > 0.5).astype(int)
+    return RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(X, y)
+
+
+@pytest.fixture
+def batch_app(api, forest, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    model = CountingForest(forest)
+    detector = RecordingDetector()
+    monkeypatch.setattr(api, "current_model", ServingModel(model, "v1"))
+    monkeypatch.setattr(api, "micro_batcher", None)
+    monkeypatch.setattr(api, "prediction_cache", None)
+    monkeypatch.setattr(api, "drift_queue", None)
+    monkeypatch.setattr(api, "drift_detector", detector)
+    return SimpleNamespace(api=api, client=TestClient(api.app), model=model, detector=detector)
+
+
+def transactions(rows):
+    return {"transactions": [dict(zip(FEATURE_NAMES, row)) for row in rows.tolist()]}
+
+
+def test_batch_matches_sklearn_with_one_inference(batch_app, forest):
+    rows = np.random.default_rng(1).normal(size=(50, len(FEATURE_NAMES)))
+    response = batch_app.client.post("/predict/batch", json=transactions(rows))
+    assert response.status_code == 200
+    body = response.json()
+
+    assert body["count"] == 50
+    assert body["model_version"] == "v1" and response.headers["x-model-version"] == "v1"
+    np.testing.assert_array_equal([p["prediction"] for p in body["predictions"]], forest.predict(rows))
+    np.testing.assert_allclose([p["probability"] for p in body["predictions"]], forest.predict_proba(rows)[:, 1])
+    # Una sola pasada por el bosque para todo el lote
+    assert batch_app.model.calls == [50]
+
+
+def test_batch_matches_single_predictions(batch_app):
+    rows = np.random.default_rng(2).normal(size=(8, len(FEATURE_NAMES)))
+    batch = batch_app.client.post("/predict/batch", json=transactions(rows)).json()["predictions"]
+    single = [
+        batch_app.client.post("/predict", json=transaction).json()
+        for transaction in transactions(rows)["transactions"]
+    ]
+    assert batch == [{"prediction": s["prediction"], "probability": s["probability"]} for s in single]
+
+
+def test_binary_body_matches_json(batch_app):
+    rows = np.random.default_rng(3).normal(size=(20, len(FEATURE_NAMES))).astype(BINARY_DTYPE)
+    from_json = batch_app.client.post("/predict/batch", json=transactions(rows.astype(np.float64))).json()
+    from_binary = batch_app.client.post(
+        "/predict/batch", content=rows.tobytes(), headers={"Content-Type": BINARY_MEDIA_TYPE}
+    ).json()
+    assert from_binary == from_json
+
+
+def test_drift_samples_are_registered_in_one_call(batch_app):
+    rows = np.random.default_rng(4).normal(size=(30, len(FEATURE_NAMES)))
+    batch_app.client.post("/predict/batch", json=transactions(rows))
+    assert len(batch_app.detector.batches) == 1
+    values, feature_names = batch_app.detector.batches[0]
+    np.testing.assert_array_equal(values, rows)
+    assert feature_names == FEATURE_NAMES
+    assert len(batch_app.detector.predictions) == 1
+    assert len(batch_app.detector.predictions[0][0]) == 30
+
+
+def test_empty_batch_skips_inference(batch_app):
+    response = batch_app.client.post("/predict/batch", json={"transactions": []})
+    assert response.status_code == 200
+    assert response.json() == {"predictions": [], "count": 0, "model_version": "v1"}
+    assert batch_app.model.calls == []
+
+
+def test_oversized_batch_is_rejected(batch_app, monkeypatch):
+    monkeypatch.setattr(batch_app.api, "MAX_BATCH_SIZE", 5)
+    rows = np.zeros((6, len(FEATURE_NAMES)))
+    assert batch_app.client.post("/predict/batch", json=transactions(rows)).status_code == 413
+    assert batch_app.model.calls == []
+
+
+def test_invalid_rows_are_rejected(batch_app):
+    body = transactions(np.zeros((3, len(FEATURE_NAMES))))
+    del body["transactions"][1][FEATURE_NAMES[0]]
+    assert batch_app.client.post("/predict/batch", json=body).status_code == 422
+    response = batch_app.client.post(
+        "/predict/batch", content=b"\x00" * 7, headers={"Content-Type": BINARY_MEDIA_TYPE}
+    )
+    assert response.status_code == 422
+    assert batch_app.model.calls == []
@@ -0,0 +1,97 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.monitoring.capture_policy import (
+    CapturePolicy,
+    RateCapture,
+    ReservoirCapture,
+    StratifiedCapture,
+    parse_class_rates,
+)
+
+N = 200000
+EDGES = np.linspace(-4.0, 4.0, 17)
+
+
+@pytest.fixture(autouse=True)
+def seeded():
+    random.seed(0)
+    np.random.seed(0)
+
+
+@pytest.fixture(scope="module")
+def population():
+    rng = np.random.default_rng(0)
+    labels = (rng.random(N) < 0.02).astype(int)
+    # El fraude (clase 1) tiene otra distribución: un estimador sesgado lo delataría
+    values = np.where(labels == 1, rng.normal(2.0, 1.0, N), rng.normal(0.0, 1.0, N))
+    return values, labels
+
+
+def weighted_estimates(values, labels, weights):
+    captured = weights > 0
+    return {
+        "total": weights.sum(),
+        "fraud_share": weights[labels == 1].sum() / weights.sum(),
+        "mean": np.average(values[captured], weights=weights[captured]),
+        "histogram": np.histogram(values, bins=EDGES, weights=weights)[0] / weights.sum(),
+    }
+
+
+def assert_unbiased(estimates, values, labels, tolerance):
+    assert estimates["total"] == pytest.approx(N, rel=tolerance)
+    assert estimates["fraud_share"] == pytest.approx(labels.mean(), rel=5 * tolerance)
+    assert estimates["mean"] == pytest.approx(values.mean(), abs=tolerance)
+    expected = np.histogram(values, bins=EDGES)[0] / N
+    np.testing.assert_allclose(estimates["histogram"], expected, atol=tolerance)
+
+
+@pytest.mark.parametrize("policy", [
+    CapturePolicy(),
+    RateCapture(0.1),
+    ReservoirCapture(5000),
+    StratifiedCapture({0: 0.05, 1: 1.0}),
+], ids=lambda p: p.mode)
+def test_weighted_estimates_match_population(policy, population):
+    values, labels = population
+    weights = policy.decide_many(N, predictions=labels)
+    assert policy.seen == N
+    assert policy.captured == np.count_nonzero(weights)
+    assert_unbiased(weighted_estimates(values, labels, weights), values, labels, tolerance=0.03)
+
+
+@pytest.mark.parametrize("policy", [
+    RateCapture(0.1),
+    ReservoirCapture(5000),
+    StratifiedCapture({0: 0.05, 1: 1.0}),
+], ids=lambda p: p.mode)
+def test_scalar_decisions_match_population(policy, population):
+    values, labels = population
+    weights = np.array([policy.decide(prediction) for prediction in labels.tolist()])
+    assert_unbiased(weighted_estimates(values, labels, weights), values, labels, tolerance=0.03)
+
+
+def test_reservoir_captures_warmup_with_unit_weight():
+    policy = ReservoirCapture(100)
+    weights = policy.decide_many(100)
+    np.testing.assert_array_equal(weights, np.ones(100))
+    assert policy.window_weight(37.5) == 1.0
+
+
+def test_stratified_keeps_all_fraud():
+    labels = np.array([1] * 50 + [0] * 50)
+    weights = StratifiedCapture({0: 0.5, 1: 1.0}).decide_many(len(labels), predictions=labels)
+    np.testing.assert_array_equal(weights[:50], np.ones(50))
+    assert set(np.unique(weights[50:]).tolist()) <= {0.0, 2.0}
+
+
+def test_invalid_rates_are_rejected():
+    with pytest.raises(ValueError):
+        RateCapture(0.0)
+    with pytest.raises(ValueError):
+        StratifiedCapture({0: 1.5})
+    with pytest.raises(ValueError):
+        parse_class_rates("0:0.1,1")
+    assert parse_class_rates(" 0:0.05, 1:1 ") == {0: 0.05, 1: 1.0}
@@ -0,0 +1,116 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from src.api.codec import BINARY_MEDIA_TYPE, decode_batch, decode_prediction
+from src.api.models import FEATURE_NAMES, BatchPredictionInput, PredictionInput
+
+VALID = dict(zip(FEATURE_NAMES, [-1.25, 0.5, 3.0, -0.75, 2.0]))
+
+# Valores de V1 tal como llegan en el JSON (texto), incluidos los que orjson no acepta
+V1_LITERALS = [
+    "2.0", "2", "-0.0", "1e-310", "NaN", "Infinity", "-Infinity", "1e400",
+    "1" + "0" * 30, "1" + "0" * 400, '"1.5"', '" 2 "', '"abc"', "true", "false", "null", "[1]", "{}",
+]
+
+
+def row_body(v1_literal, drop=None, extra=None):
+    fields = {name: json.dumps(value) for name, value in VALID.items() if name != drop}
+    if "V1" in fields:
+        fields["V1"] = v1_literal
+    fields.update(extra or {})
+    return "{" + ", ".join(f'"{name}": {value}' for name, value in fields.items()) + "}"
+
+
+def pydantic_prediction(body):
+    """Resultado del camino original: json.loads + PredictionInput."""
+    try:
+        parsed = PredictionInput(**json.loads(body))
+    except (TypeError, ValueError):
+        return None
+    return np.array([[getattr(parsed, name) for name in FEATURE_NAMES]], dtype=np.float64)
+
+
+def pydantic_batch(body):
+    """Resultado del camino original: json.loads + BatchPredictionInput."""
+    try:
+        parsed = BatchPredictionInput(**json.loads(body))
+    except (TypeError, ValueError):
+        return None
+    return np.array(
+        [[getattr(t, name) for name in FEATURE_NAMES] for t in parsed.transactions], dtype=np.float64
+    ).reshape(-1, len(FEATURE_NAMES))
+
+
+def decoded(decode, *args):
+    try:
+        return decode(*args)
+    except HTTPException as e:
+        assert e.status_code == 422
+        return None
+
+
+def assert_parity(expected, actual):
+    if expected is None:
+        assert actual is None
+    else:
+        assert actual is not None
+        assert actual.dtype == np.float64
+        np.testing.assert_array_equal(actual, expected)
+
+
+@pytest.mark.parametrize("literal", V1_LITERALS)
+def test_prediction_matches_pydantic(literal):
+    body = row_body(literal)
+    assert_parity(pydantic_prediction(body), decoded(decode_prediction, body.encode()))
+
+
+@pytest.mark.parametrize("body", [
+    row_body("2.0", drop="V14"),
+    row_body("2.0", extra={"Amount": "10.0"}),
+    "[]",
+    "null",
+    "7",
+    '"texto"',
+    "{",
+    "",
+])
+def test_prediction_shape_errors_match_pydantic(body):
+    assert_parity(pydantic_prediction(body), decoded(decode_prediction, body.encode()))
+
+
+@pytest.mark.parametrize("literal", V1_LITERALS)
+def test_batch_matches_pydantic(literal):
+    body = '{"transactions": [' + row_body("0.25") + ", " + row_body(literal) + "]}"
+    assert_parity(pydantic_batch(body), decoded(decode_batch, body.encode(), "application/json"))
+
+
+@pytest.mark.parametrize("body", [
+    '{"transactions": []}',
+    '{"transactions": [' + row_body("2.0", drop="V4") + "]}",
+    '{"transactions": {}}',
+    '{"transactions": [[1, 2, 3, 4, 5]]}',
+    '{"transactions": ["x"]}',
+    '{"transactions": null}',
+    '{"items": []}',
+    "[]",
+])
+def test_batch_shape_errors_match_pydantic(body):
+    assert_parity(pydantic_batch(body), decoded(decode_batch, body.encode(), "application/json; charset=utf-8"))
+
+
+def test_binary_batch_matches_json_batch():
+    rows = np.random.default_rng(0).normal(size=(50, len(FEATURE_NAMES))).astype("<f4")
+    json_body = json.dumps({"transactions": [dict(zip(FEATURE_NAMES, row.tolist())) for row in rows]})
+
+    binary = decode_batch(rows.tobytes(), BINARY_MEDIA_TYPE)
+    assert binary.dtype == np.float64 and binary.flags.c_contiguous
+    np.testing.assert_array_equal(binary, pydantic_batch(json_body))
+    np.testing.assert_array_equal(binary, decode_batch(json_body.encode(), "application/json"))
+
+
+@pytest.mark.parametrize("body", [b"\x00" * 7, np.array([[np.nan] * len(FEATURE_NAMES)], dtype="<f4").tobytes()])
+def test_binary_batch_rejects_partial_rows_and_non_finite(body):
+    assert decoded(decode_batch, body, BINARY_MEDIA_TYPE) is None
@@ -0,0 +1,177 @@
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.monitoring.dashboard_cache import DashboardCache, etag_matches, make_etag
+from src.monitoring.history_store import DriftHistoryStore
+from src.monitoring.output_monitor import OutputMonitor
+
+T0 = datetime(2026, 1, 1)
+
+
+class Renderer:
+    """Render simulado que cuenta cuántas veces se ejecuta."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        return f"<div>render {self.calls}</div>", T0.isoformat()
+
+
+def test_cache_renders_once_per_key():
+    cache = DashboardCache()
+    renderer = Renderer()
+    assert cache.get((1, 1), renderer) == cache.get((1, 1), renderer)
+    cache.get((1, 2), renderer)
+    assert renderer.calls == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+    cache.invalidate()
+    cache.get((1, 2), renderer)
+    assert renderer.calls == 3
+
+
+def test_etag_comparison_is_weak():
+    etag = make_etag((1, 5), None)
+    assert etag.startswith('W/"') and etag == make_etag((1, 5), None)
+    assert etag != make_etag((1, 6), None)
+    assert etag_matches(etag, etag)
+    assert etag_matches(etag[2:], etag)
+    assert etag_matches(f'W/"otro", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('W/"otro"', etag)
+
+
+@pytest.fixture
+def dashboard(api, tmp_path, monkeypatch):
+    """App con un historial SQLite real y un render de gráficas simulado."""
+    from fastapi.testclient import TestClient
+
+    store = DriftHistoryStore(str(tmp_path / "drift_history.db"), compact_every=0)
+    store.append(T0.isoformat(), {"V14": 0.1})
+    reference = tmp_path / "reference_stats.json"
+    reference.write_text("{}")
+    renderer = Renderer()
+    monkeypatch.setattr(api, "render_drift_plots", renderer)
+    monkeypatch.setattr(api, "dashboard_cache", DashboardCache())
+    monkeypatch.setattr(api, "drift_detector", SimpleNamespace(history_store=store, reference_stats_path=str(reference)))
+    return SimpleNamespace(client=TestClient(api.app), store=store, reference=reference, renderer=renderer)
+
+
+def test_unchanged_history_answers_304_without_rendering(dashboard):
+    first = dashboard.client.get("/monitoring/drift-dashboard")
+    assert first.status_code == 200
+    assert "render 1" in first.text
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    again = dashboard.client.get("/monitoring/drift-dashboard", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+    assert again.content == b""
+    # Sin If-None-Match se sirve desde la caché, sin volver a renderizar
+    assert "render 1" in dashboard.client.get("/monitoring/drift-dashboard").text
+    assert dashboard.renderer.calls == 1
+
+
+def test_new_check_or_reference_changes_etag(dashboard):
+    etag = dashboard.client.get("/monitoring/drift-dashboard").headers["etag"]
+
+    dashboard.store.append((T0 + timedelta(minutes=1)).isoformat(), {"V14": 0.2})
+    response = dashboard.client.get("/monitoring/drift-dashboard", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert "render 2" in response.text
+    etag = response.headers["etag"]
+
+    # Reemplazar la referencia (reentrenamiento) también invalida la página
+    stat = os.stat(dashboard.reference)
+    os.utime(dashboard.reference, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    response = dashboard.client.get("/monitoring/drift-dashboard", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert dashboard.renderer.calls == 3
+
+
+def test_empty_history_is_not_cached(dashboard, tmp_path, api, monkeypatch):
+    empty = DriftHistoryStore(str(tmp_path / "empty.db"), compact_every=0)
+    monkeypatch.setattr(api, "drift_detector", SimpleNamespace(history_store=empty, reference_stats_path=None))
+    response = dashboard.client.get("/monitoring/drift-dashboard")
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+    assert dashboard.renderer.calls == 0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def output_route(api, monkeypatch):
+    """Ruta de la tabla de salida con un OutputMonitor real y un reloj simulado."""
+    from fastapi.testclient import TestClient
+
+    monitor = OutputMonitor(min_samples=10)
+    monitor.record_batch(np.zeros(50, dtype=int), np.full(50, 0.05))
+    calls = []
+
+    def output_report():
+        calls.append(1)
+        return monitor.report()
+
+    clock = Clock()
+    monkeypatch.setattr(api, "time", SimpleNamespace(time=clock, perf_counter=api.time.perf_counter))
+    monkeypatch.setattr(api, "DRIFT_DASHBOARD_OUTPUT_REFRESH", 10.0)
+    monkeypatch.setattr(api, "output_table_cache", DashboardCache("Tabla de salida del modelo"))
+    monkeypatch.setattr(api, "drift_detector", SimpleNamespace(output_report=output_report))
+    return SimpleNamespace(client=TestClient(api.app), clock=clock, calls=calls)
+
+
+def test_output_table_is_refreshed_by_interval(output_route):
+    first = output_route.client.get("/monitoring/drift-dashboard/output")
+    assert first.status_code == 200
+    assert "Salida del modelo" in first.text and "sin referencia" in first.text
+    etag = first.headers["etag"]
+
+    # Dentro del mismo intervalo: mismo ETag, 304 y sin recalcular el informe
+    output_route.clock.now += 5.0
+    assert output_route.client.get("/monitoring/drift-dashboard/output", headers={"If-None-Match": etag}).status_code == 304
+    assert output_route.client.get("/monitoring/drift-dashboard/output").text == first.text
+    assert len(output_route.calls) == 1
+
+    # En el intervalo siguiente se regenera aunque el cliente envíe el ETag anterior
+    output_route.clock.now += 10.0
+    response = output_route.client.get("/monitoring/drift-dashboard/output", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(output_route.calls) == 2
+
+
+def test_output_table_does_not_change_dashboard_etag(dashboard, output_route, api, monkeypatch):
+    store = dashboard.store
+    monkeypatch.setattr(api, "drift_detector", SimpleNamespace(
+        history_store=store, reference_stats_path=None, output_report=lambda: {}
+    ))
+    etag = dashboard.client.get("/monitoring/drift-dashboard").headers["etag"]
+    # La salida avanza con cada predicción; la página del dashboard no
+    output_route.clock.now += 60.0
+    dashboard.client.get("/monitoring/drift-dashboard/output")
+    assert dashboard.client.get("/monitoring/drift-dashboard", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_output_table_without_detector_is_empty(api, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(api, "drift_detector", None)
+    response = TestClient(api.app).get("/monitoring/drift-dashboard/output")
+    assert response.status_code == 200
+    assert response.text == ""
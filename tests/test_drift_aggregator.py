@@ -0,0 +1,132 @@
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pytest
+
+from src.monitoring.drift_aggregator import DriftAggregator, fcntl
+from src.monitoring.quantile_sketch import KLLSketch
+from src.monitoring.sample_window import SampleWindow
+
+EDGES = [np.linspace(-3.0, 3.0, 7), np.linspace(0.0, 10.0, 6)]
+
+fork = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="requiere fork")
+
+
+def worker_state(seed, n):
+    """Ventana, conteos temporales, sketches y salida de un worker simulado."""
+    rng = np.random.default_rng(seed)
+    rows = np.column_stack([rng.normal(size=n), rng.uniform(0.0, 10.0, size=n)])
+    window = SampleWindow(["a", "b"], capacity=1000, bin_edges=EDGES)
+    window.extend(rows)
+    sketch = KLLSketch(k=64)
+    sketch.update_many(rows[:, 0])
+    output_counts = np.array([[n, 0], [n - 3, 3]])
+    return {
+        "window": window,
+        "time_windows": {"15m": (window.bin_counts.copy(), n), "decayed": (window.bin_counts * 0.5, n * 0.5)},
+        "window_sketches": {"15m": [sketch, None]},
+        "output_windows": {"15m": (output_counts, n)},
+        "output_total": n,
+    }
+
+
+def publish_state(aggregator, state):
+    aggregator.publish(
+        state["window"], state["time_windows"], state["window_sketches"], state["output_windows"],
+        state["output_total"]
+    )
+
+
+def _publish_in_child(shared_dir, seed, n):
+    publish_state(DriftAggregator(shared_dir), worker_state(seed, n))
+
+
+def publish_from_other_worker(shared_dir, seed, n):
+    """Publica desde otro proceso (cada worker escribe worker-<pid>.npz)."""
+    child = multiprocessing.get_context("fork").Process(target=_publish_in_child, args=(shared_dir, seed, n))
+    child.start()
+    child.join(timeout=30)
+    assert child.exitcode == 0
+
+
+@pytest.mark.skipif(fcntl is None, reason="requiere fcntl")
+def test_only_one_aggregator_is_leader_until_it_closes(tmp_path):
+    first, second = DriftAggregator(str(tmp_path)), DriftAggregator(str(tmp_path))
+    assert first.is_leader()
+    assert not second.is_leader()
+    # El líder lo sigue siendo sin volver a competir por el bloqueo
+    assert first.is_leader() and not second.is_leader()
+
+    first.close()
+    assert second.is_leader()
+    assert not first.is_leader()
+    second.close()
+
+
+@fork
+def test_merged_counts_are_the_sum_of_every_worker(tmp_path):
+    shared_dir = str(tmp_path)
+    publish_from_other_worker(shared_dir, seed=1, n=300)
+    publish_from_other_worker(shared_dir, seed=2, n=500)
+    local = worker_state(3, 200)
+    aggregator = DriftAggregator(shared_dir)
+    publish_state(aggregator, local)
+
+    states = [worker_state(seed, n) for seed, n in ((1, 300), (2, 500), (3, 200))]
+    merged = aggregator.merged()
+    np.testing.assert_array_equal(merged["bin_counts"], sum(s["window"].bin_counts for s in states))
+    assert merged["size"] == merged["total"] == 1000
+
+    counts, samples = merged["windows"]["15m"]
+    np.testing.assert_array_equal(counts, sum(s["time_windows"]["15m"][0] for s in states))
+    assert samples == 1000 and isinstance(samples, int)
+    assert merged["windows"]["decayed"][1] == pytest.approx(500.0)
+
+    output_counts, predictions = merged["outputs"]["15m"]
+    np.testing.assert_array_equal(output_counts, [[1000, 0], [991, 9]])
+    assert predictions == 1000
+
+    sketches = merged["sketches"]["15m"]
+    assert len(sketches[0]) == 1000 and sketches[1] is None
+    aggregator.close()
+
+
+@fork
+def test_stale_workers_are_ignored_and_then_removed(tmp_path):
+    shared_dir = str(tmp_path)
+    aggregator = DriftAggregator(shared_dir, stale_after=30.0)
+    publish_state(aggregator, worker_state(1, 100))
+    publish_from_other_worker(shared_dir, seed=2, n=400)
+    stale = next(name for name in os.listdir(shared_dir) if name != os.path.basename(aggregator.worker_path))
+
+    # Sin publicar desde hace más de stale_after: no cuenta, pero el archivo se conserva
+    old = time.time() - 60
+    os.utime(os.path.join(shared_dir, stale), (old, old))
+    assert aggregator.merged()["size"] == 100
+    assert stale in os.listdir(shared_dir)
+
+    # Pasado el triple de stale_after se borra
+    older = time.time() - 100
+    os.utime(os.path.join(shared_dir, stale), (older, older))
+    assert aggregator.merged()["size"] == 100
+    assert stale not in os.listdir(shared_dir)
+    aggregator.close()
+
+
+def test_publish_skips_unchanged_windows_until_heartbeat(tmp_path):
+    aggregator = DriftAggregator(str(tmp_path), heartbeat=60.0)
+    state = worker_state(1, 100)
+    publish_state(aggregator, state)
+    mtime = os.stat(aggregator.worker_path).st_mtime_ns
+    assert aggregator.is_fresh(state["window"], state["output_total"])
+
+    publish_state(aggregator, state)
+    assert os.stat(aggregator.worker_path).st_mtime_ns == mtime
+    # Predicciones nuevas (aunque la ventana no cambie) obligan a publicar
+    assert not aggregator.is_fresh(state["window"], state["output_total"] + 1)
+
+    aggregator.close()
+    assert not os.path.exists(aggregator.worker_path)
+    assert aggregator.merged() is None
@@ -0,0 +1,128 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.monitoring.drift_detector import DriftDetector
+from src.monitoring.history_store import DriftHistoryStore
+
+# Features con distinto número de bins (relleno), sin histograma y con histograma inválido
+BINS = {"a": 10, "b": 4, "c": 25}
+
+
+def scalar_psi(reference, values):
+    """PSI de una feature como se calculaba antes, con np.histogram sobre las muestras."""
+    ref = np.asarray(reference["histogram"], dtype=float)
+    ref = np.maximum(ref / ref.sum(), 1e-6)
+    current = np.histogram(values, bins=reference["bins"])[0].astype(float)
+    current = np.maximum(current / current.sum(), 1e-6)
+    return float(np.sum((current - ref) * np.log(current / ref)))
+
+
+@pytest.fixture
+def reference():
+    rng = np.random.default_rng(0)
+    reference = {}
+    for name, n_bins in BINS.items():
+        histogram, bins = np.histogram(rng.normal(size=5000), bins=n_bins)
+        reference[name] = {"bins": bins.tolist(), "histogram": histogram.tolist()}
+    reference["sin_histograma"] = {"mean": 0.0}
+    reference["invalido"] = {"bins": [0.0, 1.0, 2.0], "histogram": [0, 0]}
+    return reference
+
+
+@pytest.fixture
+def detector(tmp_path, reference):
+    path = tmp_path / "reference_stats.json"
+    path.write_text(json.dumps(reference))
+    store = DriftHistoryStore(str(tmp_path / "drift_history.db"))
+    return DriftDetector(str(path), history_store=store, window_size=2000, auto_check=False)
+
+
+def add_rows(detector, values):
+    names = list(BINS) + ["sin_histograma", "invalido"]
+    assert detector.add_samples(values, names)
+
+
+def test_vectorized_psi_matches_per_feature_histograms(detector, reference):
+    rng = np.random.default_rng(1)
+    values = np.column_stack([
+        rng.normal(0.3, 1.2, 1500),   # desplazada
+        rng.normal(size=1500),
+        rng.normal(size=1500) * 3,    # muchas fuera de rango
+        rng.normal(size=1500),
+        rng.uniform(0, 2, 1500),
+    ])
+    values[::13, 0] = np.nan
+    add_rows(detector, values)
+
+    psi = detector.calculate_psi_all()
+    for f, name in enumerate(BINS):
+        column = values[:, f]
+        assert psi[name] == pytest.approx(scalar_psi(reference[name], column[~np.isnan(column)]), rel=1e-12)
+        assert detector.calculate_psi(name) == psi[name]
+    assert psi["sin_histograma"] is None
+    assert psi["invalido"] is None
+
+
+def test_psi_requires_one_hundred_samples(detector):
+    add_rows(detector, np.zeros((99, 5)))
+    assert detector.calculate_psi_all() is None
+    assert detector.check_drift()["status"] == "insufficient_data"
+
+
+def test_feature_without_samples_in_range_has_no_psi(detector):
+    values = np.zeros((200, 5))
+    values[:, 1] = 1e6
+    add_rows(detector, values)
+    psi = detector.calculate_psi_all()
+    assert psi["b"] is None
+    assert psi["a"] is not None
+
+
+def test_check_drift_flags_only_shifted_features(detector):
+    rng = np.random.default_rng(2)
+    values = rng.normal(size=(2000, 5))
+    values[:, 0] += 2.0
+    add_rows(detector, values)
+
+    result = detector.check_drift()
+    assert result["status"] == "drift_detected"
+    assert result["features"]["a"]["drifting"] is True
+    assert result["features"]["b"]["drifting"] is False
+    assert set(result["features"]) == set(BINS)
+    # Solo se guardan en el historial las features con PSI
+    assert set(detector.load_history()["drift_scores"]) == set(BINS)
+
+
+def test_recent_windows_see_drift_hidden_in_the_full_window(tmp_path, reference, monkeypatch):
+    clock = {"now": 1_800_000_000 * 10 ** 9}
+    monkeypatch.setattr("time.time_ns", lambda: clock["now"])
+    path = tmp_path / "reference_stats.json"
+    path.write_text(json.dumps(reference))
+    detector = DriftDetector(
+        str(path), history_store=DriftHistoryStore(str(tmp_path / "drift_history.db")),
+        window_size=20000, auto_check=False, windows={"15m": 900, "1h": 3600}, decay_half_life=600.0
+    )
+    rng = np.random.default_rng(3)
+    add_rows(detector, rng.normal(size=(10000, 5)))
+    # Media hora después llega un desplazamiento en "a"
+    clock["now"] += 1800 * 10 ** 9
+    shifted = rng.normal(size=(500, 5))
+    shifted[:, 0] += 2.0
+    add_rows(detector, shifted)
+
+    result = detector.check_drift()
+    windows = result["windows"]
+    assert result["features"]["a"]["drifting"] is False
+    assert windows["15m"]["sample_count"] == 500
+    assert windows["15m"]["features"]["a"]["drifting"] is True
+    # Los conteos de la ventana son los de las muestras recientes, no los de toda la ventana
+    assert windows["15m"]["features"]["a"]["psi"] == pytest.approx(
+        scalar_psi(reference["a"], shifted[:, 0]), rel=1e-9
+    )
+    assert windows["1h"]["sample_count"] == 10500
+    # Con semivida de 10 minutos, las muestras antiguas pesan 1/8
+    assert windows["decayed"]["sample_count"] == pytest.approx(500 + 10000 / 8, abs=0.01)
+    assert windows["decayed"]["half_life_seconds"] == 600.0
+    assert windows["decayed"]["features"]["a"]["drifting"] is True
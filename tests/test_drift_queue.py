@@ -0,0 +1,134 @@
+import asyncio
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from src.monitoring.drift_detector import DriftDetector
+from src.monitoring.drift_queue import DriftIngestQueue
+from src.monitoring.history_store import DriftHistoryStore
+
+FEATURES = ["a", "b"]
+
+
+class RecordingDetector:
+    """Detector simulado: registra los lotes y puede fallar en las primeras llamadas."""
+
+    def __init__(self, raise_times=0, reject_times=0):
+        self.raise_times = raise_times
+        self.reject_times = reject_times
+        self.batches = []
+
+    def add_samples(self, values, feature_names, weights=None):
+        if self.raise_times:
+            self.raise_times -= 1
+            raise RuntimeError("fallo al registrar")
+        if self.reject_times:
+            self.reject_times -= 1
+            return False
+        self.batches.append((values.copy(), weights.copy()))
+        return True
+
+
+def test_full_queue_drops_oldest_and_counts_rows():
+    queue = DriftIngestQueue(RecordingDetector(), FEATURES, max_rows=3)
+    queue.put_many(np.zeros((4, 2)))
+    for i in range(3):
+        queue.put(np.array([i, i], dtype=float), weight=2.0)
+    # El lote de 4 filas era la entrada más antigua: se descartan sus 4 filas
+    assert queue.stats() == {"enqueued": 7, "ingested": 0, "dropped": 4, "flushes": 0, "failures": 0, "pending": 3}
+
+    queue.put(np.array([9.0, 9.0]))
+    assert queue.stats()["dropped"] == 5
+    assert queue.flush() == 3
+    values, weights = queue.detector.batches[0]
+    np.testing.assert_array_equal(values, [[1, 1], [2, 2], [9, 9]])
+    np.testing.assert_array_equal(weights, [2.0, 2.0, 1.0])
+
+
+def test_flush_splits_into_batches_and_counts_rejections():
+    detector = RecordingDetector(reject_times=1)
+    queue = DriftIngestQueue(detector, FEATURES, max_batch=4)
+    for _ in range(3):
+        queue.put_many(np.ones((3, 2)))
+    # Primer lote (6 filas: las entradas no se parten) rechazado, segundo registrado
+    assert queue.flush() == 3
+    assert [len(values) for values, _ in detector.batches] == [3]
+    assert queue.stats()["failures"] == 1 and queue.stats()["ingested"] == 3
+
+
+def test_background_flush_survives_errors():
+    detector = RecordingDetector(raise_times=2)
+
+    async def scenario():
+        queue = DriftIngestQueue(detector, FEATURES, flush_interval=0.01)
+        queue.start()
+        for round_ in range(4):
+            queue.put(np.array([round_, round_], dtype=float))
+            await asyncio.sleep(0.05)
+        alive = not queue._task.done()
+        await queue.stop()
+        return queue, alive
+
+    queue, alive = asyncio.run(scenario())
+    assert alive
+    assert queue.stats()["failures"] == 2
+    # Las filas de los vaciados fallidos se pierden; las siguientes se registran
+    assert queue.stats()["ingested"] == 2 and queue.stats()["pending"] == 0
+    assert queue.executor is None
+
+
+def test_stop_flushes_pending_rows():
+    detector = RecordingDetector()
+
+    async def scenario():
+        queue = DriftIngestQueue(detector, FEATURES, flush_interval=60.0)
+        queue.start()
+        queue.put_many(np.ones((5, 2)))
+        await queue.stop()
+        return queue
+
+    assert asyncio.run(scenario()).stats()["ingested"] == 5
+
+
+@pytest.fixture
+def detector(tmp_path):
+    rng = np.random.default_rng(0)
+    reference = {}
+    for name in FEATURES:
+        histogram, bins = np.histogram(rng.normal(size=5000), bins=10)
+        reference[name] = {"bins": bins.tolist(), "histogram": histogram.tolist()}
+    path = tmp_path / "reference_stats.json"
+    path.write_text(json.dumps(reference))
+    store = DriftHistoryStore(str(tmp_path / "drift_history.db"))
+    return DriftDetector(str(path), history_store=store, window_size=500, auto_check=False)
+
+
+def test_direct_writes_and_checks_from_another_thread_stay_consistent(detector):
+    # Sin cola: add_sample en el hilo de las peticiones y check_drift en el del planificador
+    rng = np.random.default_rng(1)
+    stop = threading.Event()
+    results = []
+
+    def checker():
+        while not stop.is_set():
+            results.append(detector.check_drift())
+
+    thread = threading.Thread(target=checker)
+    thread.start()
+    for row in rng.normal(size=(3000, 2)).tolist():
+        detector.add_sample(dict(zip(FEATURES, row)))
+    stop.set()
+    thread.join()
+
+    assert results and all(result["status"] != "error" for result in results)
+    for result in results:
+        if result["status"] != "insufficient_data":
+            assert result["sample_count"] <= 500
+    counts, size = detector.window_counts()
+    assert size == 500
+    for f, name in enumerate(FEATURES):
+        column = detector.samples.column(name)
+        expected = np.histogram(column, bins=detector.reference[name]["bins"])[0]
+        np.testing.assert_array_equal(counts[f, :len(expected)], expected)
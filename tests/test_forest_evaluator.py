@@ -0,0 +1,105 @@
+import json
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from src.models.forest_evaluator import FlatForest, compile_forest
+from src.models.shared_model import _source_signature, load_mmap_forest
+
+
+@pytest.fixture(scope="module")
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 5))
+    y = (X[:, 0] + 0.5 * X[:, 1] ** 2 - X[:, 3] > 0.3).astype(int)
+    return RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X, y)
+
+
+def assert_same_output(flat, forest, X):
+    np.testing.assert_array_equal(flat.predict_proba(X), forest.predict_proba(X))
+    np.testing.assert_array_equal(flat.predict(X), forest.predict(X))
+
+
+def test_predict_proba_matches_sklearn_on_random_rows(forest):
+    flat = FlatForest.from_sklearn(forest)
+    X = np.random.default_rng(1).normal(scale=3.0, size=(2000, 5))
+    assert_same_output(flat, forest, X)
+
+
+def test_predict_proba_matches_sklearn_on_split_thresholds(forest):
+    flat = FlatForest.from_sklearn(forest)
+    # Filas con valores exactamente sobre los umbrales y justo a cada lado
+    X = flat.probe_matrix(n_random=1000, seed=2)
+    internal = forest.estimators_[0].tree_.children_left != -1
+    tree = forest.estimators_[0].tree_
+    edge = np.zeros((int(internal.sum()) * 3, 5))
+    for i, (f, t) in enumerate(zip(tree.feature[internal], tree.threshold[internal])):
+        edge[3 * i:3 * i + 3, f] = [t, np.nextafter(t, -np.inf), np.nextafter(t, np.inf)]
+    assert_same_output(flat, forest, np.vstack([X, edge]))
+
+
+def test_predict_proba_matches_sklearn_with_nan(forest):
+    flat = FlatForest.from_sklearn(forest)
+    X = np.random.default_rng(3).normal(size=(200, 5))
+    X[::3, 0] = np.nan
+    X[1::4, 2] = np.nan
+    assert_same_output(flat, forest, X)
+
+
+def test_save_load_mmap_round_trip(forest, tmp_path):
+    flat = FlatForest.from_sklearn(forest)
+    flat.save(tmp_path, metadata={"version": "abc"})
+    loaded, meta = FlatForest.load(tmp_path, mmap_mode="r")
+    assert meta["version"] == "abc"
+    assert not loaded.threshold.flags.owndata
+    X = flat.probe_matrix(n_random=500, seed=4)
+    np.testing.assert_array_equal(loaded.predict_proba(X), flat.predict_proba(X))
+    assert_same_output(loaded, forest, X)
+
+
+def test_compile_forest_verifies_parity(forest):
+    assert isinstance(compile_forest(forest), FlatForest)
+    assert compile_forest(object()) is None
+
+
+def test_predict_proba_matches_sklearn_when_trained_with_nan():
+    rng = np.random.default_rng(5)
+    X = rng.normal(size=(600, 4))
+    y = (X[:, 0] - X[:, 1] > 0).astype(int)
+    X[rng.random(600) < 0.2, 0] = np.nan
+    forest = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(X, y)
+    flat = FlatForest.from_sklearn(forest)
+    X_test = rng.normal(size=(500, 4))
+    X_test[::2, 0] = np.nan
+    assert_same_output(flat, forest, X_test)
+
+
+def test_cache_from_previous_format_is_recompiled(tmp_path):
+    rng = np.random.default_rng(6)
+    X = rng.normal(size=(400, 3))
+    y = (X[:, 0] > 0).astype(int)
+    X[rng.random(400) < 0.3, 0] = np.nan
+    forest = RandomForestClassifier(n_estimators=5, max_depth=5, random_state=0).fit(X, y)
+    model_path = tmp_path / "model.pkl"
+    model_path.write_bytes(b"pickle")
+    cache_dir = tmp_path / "model.flat"
+
+    # Caché escrita antes de missing_left: sin versión de formato ni missing_left.npy
+    FlatForest.from_sklearn(forest).save(cache_dir, metadata={"source": _source_signature(str(model_path))})
+    meta = json.loads((cache_dir / "meta.json").read_text())
+    del meta["format_version"]
+    (cache_dir / "meta.json").write_text(json.dumps(meta))
+    (cache_dir / "missing_left.npy").unlink()
+    with pytest.raises(ValueError):
+        FlatForest.load(cache_dir)
+
+    calls = []
+    flat = load_mmap_forest(str(model_path), str(cache_dir), lambda: calls.append(1) or forest)
+    assert calls == [1]
+    X_test = rng.normal(size=(300, 3))
+    X_test[::2, 0] = np.nan
+    assert_same_output(flat, forest, X_test)
+    # La caché recompilada ya es válida: no se vuelve a cargar el pickle
+    load_mmap_forest(str(model_path), str(cache_dir), lambda: calls.append(1) or forest)
+    assert calls == [1]
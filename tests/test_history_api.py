@@ -0,0 +1,82 @@
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from src.monitoring.history_store import DriftHistoryStore
+
+T0 = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def client(api, tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    store = DriftHistoryStore(str(tmp_path / "drift_history.db"), compact_every=0)
+    for i in range(6):
+        # Verificaciones de dos en dos con el mismo timestamp: el cursor debe desempatar por id
+        store.append((T0 + timedelta(minutes=i // 2)).isoformat(), {"V14": i / 10, "V1": i / 100})
+    monkeypatch.setattr(api, "drift_detector", SimpleNamespace(history_store=store))
+    # Sin el contexto de TestClient: no se ejecuta el lifespan (carga del modelo, planificador...)
+    return TestClient(api.app)
+
+
+def test_without_parameters_returns_legacy_format(client):
+    body = client.get("/api/drift/history").json()
+    assert body["timestamps"] == [(T0 + timedelta(minutes=i // 2)).isoformat() for i in range(6)]
+    assert body["drift_scores"]["V14"] == [i / 10 for i in range(6)]
+
+
+def test_json_page_filters_range_and_features(client):
+    response = client.get("/api/drift/history", params={
+        "from": (T0 + timedelta(minutes=1)).isoformat(), "to": str((T0 + timedelta(minutes=1)).timestamp()),
+        "features": "V1", "limit": 10,
+    })
+    body = response.json()
+    assert [item["scores"] for item in body["items"]] == [{"V1": 0.02}, {"V1": 0.03}]
+    assert all("ts" not in item for item in body["items"])
+    assert body["next_cursor"] is None
+
+
+def test_cursor_pages_through_equal_timestamps(client):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 1, "features": "V14"}
+        if cursor is not None:
+            params["cursor"] = cursor
+        body = client.get("/api/drift/history", params=params).json()
+        seen.extend(item["scores"]["V14"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [i / 10 for i in range(6)]
+
+
+def test_ndjson_streams_every_matching_row(client):
+    response = client.get("/api/drift/history", params={"features": "V14,V1", "format": "ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["scores"] for row in rows] == [{"V14": i / 10, "V1": i / 100} for i in range(6)]
+    assert len({row["id"] for row in rows}) == 6
+
+
+def test_legacy_format_honours_filters(client):
+    body = client.get("/api/drift/history", params={"format": "legacy", "features": "V1", "limit": 3}).json()
+    assert list(body["drift_scores"]) == ["V1"]
+    assert len(body["timestamps"]) == 3
+
+
+@pytest.mark.parametrize("params", [
+    {"from": "ayer"},
+    {"to": "0001-01-01T00:00:00"},
+    {"from": "1e20"},
+    {"cursor": "no-es-un-cursor"},
+    {"format": "csv"},
+])
+def test_invalid_parameters_return_400(client, params):
+    assert client.get("/api/drift/history", params=params).status_code == 400
+
+
+def test_limit_below_one_is_rejected(client):
+    assert client.get("/api/drift/history", params={"limit": 0}).status_code == 422
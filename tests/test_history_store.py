@@ -0,0 +1,117 @@
+import json
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from src.monitoring.history_store import DriftHistoryStore
+
+T0 = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DriftHistoryStore(str(tmp_path / "drift_history.db"), compact_every=0)
+
+
+def fill(store, n, features=("V14", "V1"), start=T0, step=timedelta(minutes=1), seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        scores = {feature: float(rng.gamma(1.0, 0.03)) for feature in features}
+        store.append((start + i * step).isoformat(), scores, status="normal", sample_count=100)
+
+
+def test_downsampled_history_keeps_extremes_of_each_interval(store):
+    fill(store, 600)
+    full = store.load_history()
+    reduced = store.load_history_downsampled(50)
+
+    assert len(reduced["timestamps"]) <= 100
+    for feature, values in full["drift_scores"].items():
+        series = reduced["drift_scores"][feature]
+        assert len(series) == len(reduced["timestamps"])
+        assert max(series) == max(values) and min(series) == min(values)
+    assert reduced["timestamps"][0] == full["timestamps"][0]
+    assert reduced["timestamps"][-1] == full["timestamps"][-1]
+    assert reduced["timestamps"] == sorted(reduced["timestamps"], key=datetime.fromisoformat)
+
+
+def test_downsampled_history_of_short_history_is_complete(store):
+    fill(store, 30)
+    assert store.load_history_downsampled(50) == store.load_history()
+
+
+def test_downsampled_history_aligns_features_added_later(store):
+    fill(store, 300, features=("V14",))
+    fill(store, 300, features=("V14", "V1"), start=T0 + timedelta(hours=5), seed=1)
+    reduced = store.load_history_downsampled(20)
+    v1 = reduced["drift_scores"]["V1"]
+    assert len(v1) == len(reduced["timestamps"])
+    # Intervalos anteriores a la nueva feature: sin dato
+    assert v1[0] is None and v1[-1] is not None
+
+
+def test_legacy_json_is_migrated_once(tmp_path):
+    legacy = tmp_path / "drift_history.json"
+    timestamps = [(T0 + timedelta(minutes=i)).isoformat() for i in range(4)]
+    # V1 se añadió después: su lista es más corta y se alinea con los últimos timestamps
+    legacy.write_text(json.dumps({
+        "timestamps": timestamps,
+        "drift_scores": {"V14": [0.01, 0.02, 0.03, 0.04], "V1": [0.5, 0.6]},
+    }))
+
+    store = DriftHistoryStore(str(tmp_path / "drift_history.db"), legacy_json_path=str(legacy))
+    rows = store.query()
+    assert [row["timestamp"] for row in rows] == timestamps
+    assert [row["scores"] for row in rows] == [
+        {"V14": 0.01}, {"V14": 0.02}, {"V14": 0.03, "V1": 0.5}, {"V14": 0.04, "V1": 0.6},
+    ]
+    assert not legacy.exists() and (tmp_path / "drift_history.json.migrated").exists()
+
+    # Un segundo arranque con otro JSON no vuelve a importar
+    legacy.write_text(json.dumps({"timestamps": timestamps, "drift_scores": {}}))
+    assert DriftHistoryStore(str(tmp_path / "drift_history.db"), legacy_json_path=str(legacy)).count() == 4
+
+
+def test_two_connections_append_without_losing_rows(tmp_path):
+    path = str(tmp_path / "drift_history.db")
+    first, second = DriftHistoryStore(path), DriftHistoryStore(path)
+
+    def writer(store, offset):
+        for i in range(50):
+            store.append((T0 + timedelta(seconds=2 * i + offset)).isoformat(), {"V14": offset + i / 100})
+
+    threads = [threading.Thread(target=writer, args=(store, offset)) for store, offset in ((first, 0), (second, 1))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    rows = first.query()
+    assert len(rows) == second.count() == 100
+    # Solo inserciones: los ids no se reutilizan y el orden por tiempo intercala ambos escritores
+    assert len({row["id"] for row in rows}) == 100
+    assert [row["scores"]["V14"] for row in rows[:4]] == [0.0, 1.0, 0.01, 1.01]
+
+
+def test_retention_trims_by_age(tmp_path):
+    store = DriftHistoryStore(str(tmp_path / "drift_history.db"), retention_days=5, compact_every=0)
+    now = datetime.now()
+    for days in (30, 10, 4, 1, 0):
+        store.append((now - timedelta(days=days)).isoformat(), {"V14": float(days)})
+
+    assert store.compact() == 2
+    assert [row["scores"]["V14"] for row in store.query()] == [4.0, 1.0, 0.0]
+
+
+def test_retention_trims_by_row_count_on_automatic_compaction(tmp_path):
+    store = DriftHistoryStore(str(tmp_path / "drift_history.db"), max_rows=3, compact_every=4)
+    fill(store, 3)
+    assert store.count() == 3
+    # La cuarta inserción dispara la compactación: quedan las tres más recientes
+    fill(store, 1, start=T0 + timedelta(hours=1))
+    rows = store.query()
+    assert len(rows) == 3
+    assert rows[-1]["timestamp"] == (T0 + timedelta(hours=1)).isoformat()
+    assert rows[0]["timestamp"] == (T0 + timedelta(minutes=1)).isoformat()
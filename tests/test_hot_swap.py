@@ -0,0 +1,140 @@
+import asyncio
+from types import SimpleNamespace
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from src.api.models import FEATURE_NAMES
+from src.models.serving_model import ServingModel
+
+N_FEATURES = len(FEATURE_NAMES)
+
+
+def train_model(seed, n_features=N_FEATURES):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(300, n_features))
+    y = (X[:, seed % n_features] > 0).astype(int)
+    return RandomForestClassifier(n_estimators=5, max_depth=4, random_state=seed).fit(X, y)
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    monkeypatch.delenv("MODEL_PATH", raising=False)
+    monkeypatch.delenv("MODEL_SHA256", raising=False)
+    monkeypatch.delenv("MODEL_MANIFEST_URL", raising=False)
+    return tmp_path
+
+
+@pytest.fixture
+def app_state(api, monkeypatch):
+    """Aísla el modelo vigente y el estado del reemplazo de la app."""
+    monkeypatch.setattr(api, "current_model", None)
+    monkeypatch.setattr(api, "swap_status", {"state": "idle"})
+    monkeypatch.setattr(api, "_swap_task", None)
+    monkeypatch.setattr(api, "MODEL_LOAD_MODE", "lazy")
+    return api
+
+
+def write_model(model_dir, name, seed, **kwargs):
+    path = model_dir / name
+    joblib.dump(train_model(seed, **kwargs), path)
+    return str(path)
+
+
+def test_smoke_test_rejects_wrong_feature_count():
+    with pytest.raises(ValueError):
+        ServingModel.build(train_model(0, n_features=N_FEATURES + 3), "v1").smoke_test(N_FEATURES)
+
+
+def test_smoke_test_rejects_invalid_probabilities():
+    class Broken:
+        def predict_proba(self, features):
+            return np.full((len(features), 2), np.nan)
+
+    with pytest.raises(ValueError):
+        ServingModel(Broken(), "v1").smoke_test(N_FEATURES)
+
+
+def test_swap_publishes_candidate_and_keeps_in_flight_snapshot(app_state, model_dir):
+    api = app_state
+    api.set_model(api.load_serving_model(write_model(model_dir, "model-v1.pkl", 1), version="v1"))
+    in_flight = api.current_model
+    rows = np.random.default_rng(0).normal(size=(20, N_FEATURES))
+    before = in_flight.predict_matrix(rows)
+
+    asyncio.run(api.swap_model(write_model(model_dir, "model-v2.pkl", 2), version="v2"))
+
+    assert api.current_model.version == "v2"
+    assert api.swap_status["state"] == "completed"
+    assert api.swap_status["previous_version"] == "v1"
+    # Una petición que tomó la instantánea anterior termina con la misma versión
+    assert in_flight.version == "v1"
+    after = in_flight.predict_matrix(rows)
+    np.testing.assert_array_equal(after[0], before[0])
+    np.testing.assert_array_equal(after[1], before[1])
+
+
+def test_failed_candidate_keeps_serving_model(app_state, model_dir):
+    api = app_state
+    api.set_model(api.load_serving_model(write_model(model_dir, "model-v1.pkl", 1), version="v1"))
+    serving = api.current_model
+
+    # El candidato espera otro número de features: no supera la predicción de prueba
+    asyncio.run(api.swap_model(write_model(model_dir, "model-v2.pkl", 2, n_features=N_FEATURES + 3), version="v2"))
+
+    assert api.current_model is serving
+    assert api.swap_status["state"] == "failed"
+    assert "error" in api.swap_status
+
+
+def test_swap_endpoint_rejects_paths_outside_model_dir(app_state, model_dir, tmp_path_factory):
+    from fastapi.testclient import TestClient
+
+    outside = write_model(tmp_path_factory.mktemp("fuera"), "model.pkl", 3)
+    response = TestClient(app_state.app).post("/models/swap", json={"model_path": outside})
+    assert response.status_code == 400
+    response = TestClient(app_state.app).post("/models/swap", json={"model_path": str(model_dir / ".." / "x.pkl")})
+    assert response.status_code == 400
+    assert app_state.swap_status == {"state": "idle"}
+
+
+def test_swap_endpoint_validates_url_and_version(app_state, model_dir, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app_state.app)
+    monkeypatch.setenv("MODEL_SWAP_URL_PREFIXES", "https://models.example.com/")
+    response = client.post("/models/swap", json={"model_url": "https://otro.example.com/model.pkl"})
+    assert response.status_code == 400
+    # La versión forma parte del nombre del archivo descargado
+    response = client.post("/models/swap", json={
+        "model_url": "https://models.example.com/model.pkl",
+        "version": "../../etc/v2",
+    })
+    assert response.status_code == 400
+    assert app_state.swap_status == {"state": "idle"}
+
+
+def test_concurrent_swap_is_rejected(app_state, model_dir, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(app_state, "_swap_task", SimpleNamespace(done=lambda: False))
+    response = TestClient(app_state.app).post(
+        "/models/swap", json={"model_path": write_model(model_dir, "model-v2.pkl", 2)}
+    )
+    assert response.status_code == 409
+
+
+def test_current_model_reports_version_and_swap(app_state, model_dir):
+    from fastapi.testclient import TestClient
+
+    api = app_state
+    api.set_model(api.load_serving_model(write_model(model_dir, "model-v1.pkl", 1), version="v1"))
+    asyncio.run(api.swap_model(write_model(model_dir, "model-v2.pkl", 2), version="v2"))
+
+    body = TestClient(api.app).get("/models/current").json()
+    assert body["model"]["version"] == "v2"
+    assert body["model"]["compiled"] is True
+    assert body["swap"]["state"] == "completed"
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.api.inference_pool import InferencePool, PoolSaturatedError
+
+
+def blocking(release, value=None):
+    """Tarea bloqueante que no termina hasta que se libera el evento."""
+    release.wait(5.0)
+    return value
+
+
+def test_results_are_returned_off_the_event_loop():
+    pool = InferencePool(max_workers=2, max_queue=4)
+
+    async def scenario():
+        loop_thread = threading.current_thread()
+        threads = await asyncio.gather(*(pool.run(threading.current_thread) for _ in range(4)))
+        return loop_thread, threads
+
+    try:
+        loop_thread, threads = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert all(thread is not loop_thread for thread in threads)
+    assert all(thread.name.startswith("inference") for thread in threads)
+    stats = pool.stats()
+    assert stats["submitted"] == stats["completed"] == 4
+    assert stats["pending"] == 0
+
+
+def test_full_queue_rejects_immediately():
+    pool = InferencePool(max_workers=1, max_queue=2)
+    release = threading.Event()
+
+    async def scenario():
+        # Una tarea en ejecución y dos en cola llenan el pool
+        accepted = [asyncio.ensure_future(pool.run(blocking, release, i)) for i in range(3)]
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        with pytest.raises(PoolSaturatedError):
+            await pool.run(blocking, release)
+        rejected_after = time.perf_counter() - start
+        release.set()
+        return await asyncio.gather(*accepted), rejected_after
+
+    try:
+        results, rejected_after = asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+    assert results == [0, 1, 2]
+    # El rechazo no espera a que se libere un hueco
+    assert rejected_after < 0.05
+    stats = pool.stats()
+    assert stats["rejected"] == 1
+    assert stats["submitted"] == stats["completed"] == 3
+
+
+def test_timeout_keeps_slot_until_the_task_finishes():
+    pool = InferencePool(max_workers=1, max_queue=0, timeout=0.05)
+    release = threading.Event()
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(blocking, release)
+        # El hilo sigue ocupado: el hueco no se libera al abandonar la espera
+        assert pool.stats()["pending"] == 1
+        with pytest.raises(PoolSaturatedError):
+            await pool.run(blocking, release)
+        release.set()
+        await asyncio.sleep(0.05)
+        return await pool.run(lambda: "libre")
+
+    try:
+        result = asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+    assert result == "libre"
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["rejected"] == 1
+    assert stats["pending"] == 0
+
+
+def test_per_call_timeout_overrides_pool_default():
+    pool = InferencePool(max_workers=1, max_queue=1, timeout=0.01)
+
+    async def scenario():
+        return await pool.run(time.sleep, 0.05, timeout=1.0)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert pool.stats()["timeouts"] == 0
+
+
+def test_errors_are_counted_and_propagated():
+    pool = InferencePool(max_workers=1, max_queue=1)
+
+    def fail():
+        raise ValueError("fallo de inferencia")
+
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(pool.run(fail))
+    finally:
+        pool.shutdown()
+    stats = pool.stats()
+    assert stats["errors"] == 1
+    assert stats["pending"] == 0
+
+
+def test_queue_wait_is_measured():
+    pool = InferencePool(max_workers=1, max_queue=4)
+
+    async def scenario():
+        await asyncio.gather(*(pool.run(time.sleep, 0.02) for _ in range(3)))
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    waits = pool.stats()["queue_wait_ms"]
+    # La tercera tarea esperó a las dos anteriores
+    assert waits["max"] >= 30.0
+    assert waits["p50"] <= waits["max"]
+
+
+def test_app_translates_saturation_and_timeout_to_http(api, monkeypatch):
+    from fastapi import HTTPException
+
+    async def saturated(*args, **kwargs):
+        raise PoolSaturatedError("llena")
+
+    async def timed_out(*args, **kwargs):
+        raise asyncio.TimeoutError()
+
+    monkeypatch.setattr(api.inference_pool, "run", saturated)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(api.run_inference(None, None))
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers == {"Retry-After": "1"}
+
+    monkeypatch.setattr(api.inference_pool, "run", timed_out)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(api.run_inference(None, None))
+    assert excinfo.value.status_code == 504
@@ -0,0 +1,257 @@
+import math
+import multiprocessing
+import re
+
+import numpy as np
+import pytest
+
+from src.api.models import FEATURE_NAMES
+from src.monitoring.metrics import CONTENT_TYPE, MetricsRegistry
+
+# Línea de muestra del formato de texto 0.0.4: nombre{etiquetas} valor
+SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(.*)\})? (\S+)$')
+LABEL_PAIR = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"(,|$)')
+
+
+def parse_exposition(text):
+    """
+    Interpreta el texto de exposición y comprueba su estructura.
+
+    Returns:
+        Diccionario {familia: {"type", "help", "samples": [(nombre, etiquetas, valor)]}}
+    """
+    assert text.endswith("\n")
+    families, current = {}, None
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            name, _, documentation = line[7:].partition(" ")
+            assert name not in families, f"familia duplicada: {name}"
+            current = families[name] = {"help": documentation, "type": None, "samples": []}
+        elif line.startswith("# TYPE "):
+            name, _, metric_type = line[7:].partition(" ")
+            assert families[name] is current and metric_type in ("counter", "gauge", "histogram")
+            current["type"] = metric_type
+        else:
+            match = SAMPLE_LINE.match(line)
+            assert match, f"línea no válida: {line!r}"
+            name, _, raw_labels, value = match.groups()
+            labels = {}
+            if raw_labels:
+                pairs = LABEL_PAIR.findall(raw_labels)
+                assert "".join(f'{k}="{v}"{sep}' for k, v, sep in pairs) == raw_labels
+                labels = {key: value for key, value, _ in pairs}
+            family = next(f for f in families if name in (f, f + "_bucket", f + "_sum", f + "_count"))
+            assert families[family] is current, "las muestras deben seguir a su HELP/TYPE"
+            current["samples"].append((name, labels, float(value)))
+    return families
+
+
+def histogram_series(family):
+    """Agrupa las muestras de un histograma por combinación de etiquetas (sin le)."""
+    series = {}
+    for name, labels, value in family["samples"]:
+        key = tuple(sorted((k, v) for k, v in labels.items() if k != "le"))
+        entry = series.setdefault(key, {"buckets": [], "sum": None, "count": None})
+        if name.endswith("_bucket"):
+            entry["buckets"].append((float(labels["le"]), value))
+        else:
+            entry[name.rsplit("_", 1)[1]] = value
+    return series
+
+
+def assert_valid_histogram(family):
+    for entry in histogram_series(family).values():
+        bounds = [bound for bound, _ in entry["buckets"]]
+        counts = [count for _, count in entry["buckets"]]
+        assert bounds == sorted(bounds) and bounds[-1] == math.inf
+        assert counts == sorted(counts), "los buckets deben ser acumulados"
+        assert counts[-1] == entry["count"]
+        assert entry["sum"] is not None
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    latency = registry.histogram("app_latency_seconds", "Latencia", ("endpoint", "stage"), buckets=(0.01, 0.1, 1.0))
+    errors = registry.counter("app_errors_total", "Errores", ("endpoint", "status"))
+    load = registry.gauge("app_load_seconds", "Carga")
+    registry.callback("app_queue_depth", "Profundidad", "gauge", lambda: {("drift",): 3, ('a"b\\c\n',): 1},
+                      ("queue",))
+    registry.callback("app_broken", "Falla al leer", "gauge", lambda: 1 / 0)
+
+    for value in (0.005, 0.05, 0.05, 0.5, 5.0):
+        latency.labels("predict", "validation").observe(value)
+    latency.labels(endpoint="predict_batch", stage="serialization").observe(0.1)
+    errors.labels("predict", 503).inc()
+    errors.labels("predict", "503").inc(2)
+    load.set(1.5)
+    return registry
+
+
+def test_exposition_format_is_valid(registry):
+    families = parse_exposition(registry.render())
+    assert {name: family["type"] for name, family in families.items()} == {
+        "app_latency_seconds": "histogram", "app_errors_total": "counter", "app_load_seconds": "gauge",
+        "app_queue_depth": "gauge", "app_broken": "gauge",
+    }
+    assert CONTENT_TYPE.startswith("text/plain; version=0.0.4")
+
+
+def test_histogram_buckets_are_cumulative_per_label_set(registry):
+    family = parse_exposition(registry.render())["app_latency_seconds"]
+    assert_valid_histogram(family)
+    series = histogram_series(family)
+    validation = series[(("endpoint", "predict"), ("stage", "validation"))]
+    assert validation["buckets"] == [(0.01, 1), (0.1, 3), (1.0, 4), (math.inf, 5)]
+    assert validation["sum"] == pytest.approx(5.605)
+    # El límite es inclusivo (le): 0.1 cae en el bucket 0.1
+    assert series[(("endpoint", "predict_batch"), ("stage", "serialization"))]["buckets"][1] == (0.1, 1)
+
+
+def test_label_values_are_normalized_and_escaped(registry):
+    families = parse_exposition(registry.render())
+    # 503 y "503" son la misma serie
+    assert families["app_errors_total"]["samples"] == [("app_errors_total", {"endpoint": "predict", "status": "503"}, 3)]
+    queue = {labels["queue"]: value for _, labels, value in families["app_queue_depth"]["samples"]}
+    assert queue == {"drift": 3, 'a\\"b\\\\c\\n': 1}
+    assert families["app_load_seconds"]["samples"] == [("app_load_seconds", {}, 1.5)]
+    # Un callback que falla deja la familia sin muestras en lugar de romper el scrapeo
+    assert families["app_broken"]["samples"] == []
+
+
+def _increment_in_child(registry, errors, queue):
+    errors.labels("predict", "500").inc(10)
+    queue.put(registry.render())
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="requiere fork")
+def test_each_worker_process_exports_its_own_registry():
+    registry = MetricsRegistry()
+    errors = registry.counter("app_errors_total", "Errores", ("endpoint", "status"))
+    errors.labels("predict", "503").inc()
+    # Como los workers de gunicorn: el hijo hereda el registro pero sus cambios no vuelven al padre
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    child = context.Process(target=_increment_in_child, args=(registry, errors, queue))
+    child.start()
+    child_text = queue.get(timeout=10)
+    child.join(timeout=10)
+
+    child_samples = parse_exposition(child_text)["app_errors_total"]["samples"]
+    parent_samples = parse_exposition(registry.render())["app_errors_total"]["samples"]
+    assert ("app_errors_total", {"endpoint": "predict", "status": "500"}, 10) in child_samples
+    assert parent_samples == [("app_errors_total", {"endpoint": "predict", "status": "503"}, 1)]
+
+
+def test_app_metrics_endpoint_scrapes_cleanly(api):
+    from fastapi.testclient import TestClient
+
+    response = TestClient(api.app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE
+    families = parse_exposition(response.text)
+    stages = families["fraud_api_stage_duration_seconds"]
+    assert_valid_histogram(stages)
+    label_sets = {(labels["endpoint"], labels["stage"]) for _, labels, _ in stages["samples"]}
+    assert ("predict", "validation") in label_sets and ("predict_batch", "serialization") in label_sets
+    assert families["fraud_api_request_errors_total"]["type"] == "counter"
+
+
+class ThresholdModel:
+    """Modelo simulado con la interfaz de scikit-learn: fraude si la primera feature es positiva."""
+
+    classes_ = [0, 1]
+
+    def predict_proba(self, features):
+        p = (features[:, 0] > 0).astype(float)
+        return np.column_stack([1.0 - p, p])
+
+
+def scrape(client):
+    """Conteos de las etapas y de los errores por etiquetas en un scrapeo de /metrics."""
+    families = parse_exposition(client.get("/metrics").text)
+    stages = {
+        (labels["endpoint"], labels["stage"]): value
+        for name, labels, value in families["fraud_api_stage_duration_seconds"]["samples"]
+        if name.endswith("_count")
+    }
+    errors = {
+        (labels["endpoint"], labels["status"]): value
+        for _, labels, value in families["fraud_api_request_errors_total"]["samples"]
+    }
+    unavailable = {
+        labels["endpoint"]: value
+        for _, labels, value in families["fraud_api_model_unavailable_total"]["samples"]
+    }
+    return stages, errors, unavailable
+
+
+def delta(after, before):
+    return {key: value - before.get(key, 0) for key, value in after.items() if value != before.get(key, 0)}
+
+
+@pytest.fixture
+def serving_app(api, monkeypatch):
+    """App con un modelo simulado, sin micro-batcher, caché ni detector de drift."""
+    from src.models.serving_model import ServingModel
+
+    monkeypatch.setattr(api, "current_model", ServingModel(ThresholdModel(), "v1"))
+    monkeypatch.setattr(api, "micro_batcher", None)
+    monkeypatch.setattr(api, "prediction_cache", None)
+    monkeypatch.setattr(api, "drift_detector", None)
+    return api
+
+
+def test_predict_records_each_stage_once(serving_app):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(serving_app.app)
+    before, _, _ = scrape(client)
+    response = client.post("/predict", json={name: 1.0 for name in FEATURE_NAMES})
+    assert response.status_code == 200
+    after, _, _ = scrape(client)
+
+    # Sin detector de drift no se mide drift_add_sample ni output_monitor
+    assert delta(after, before) == {
+        ("predict", "validation"): 1,
+        ("predict", "feature_assembly"): 1,
+        ("predict", "predict"): 1,
+        ("predict", "serialization"): 1,
+    }
+
+
+def test_predict_batch_records_one_inference_for_the_batch(serving_app):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(serving_app.app)
+    before, _, _ = scrape(client)
+    rows = [{name: float(i) for name in FEATURE_NAMES} for i in range(10)]
+    response = client.post("/predict/batch", json={"transactions": rows})
+    assert response.status_code == 200
+    after, _, _ = scrape(client)
+
+    assert delta(after, before) == {
+        ("predict_batch", "validation"): 1,
+        ("predict_batch", "predict"): 1,
+        ("predict_batch", "serialization"): 1,
+    }
+
+
+def test_failed_requests_are_counted_by_status(serving_app, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(serving_app.app)
+    stages_before, errors_before, unavailable_before = scrape(client)
+    assert client.post("/predict", json={"V14": "no es un número"}).status_code == 422
+
+    async def no_model():
+        return None
+
+    monkeypatch.setattr(serving_app, "ensure_model", no_model)
+    assert client.post("/predict", json={name: 1.0 for name in FEATURE_NAMES}).status_code == 503
+    stages_after, errors_after, unavailable_after = scrape(client)
+
+    assert delta(errors_after, errors_before) == {("predict", "422"): 1, ("predict", "503"): 1}
+    assert delta(unavailable_after, unavailable_before) == {"predict": 1}
+    # Ninguna de las dos llegó a la inferencia
+    assert ("predict", "predict") not in delta(stages_after, stages_before)
@@ -0,0 +1,113 @@
+import asyncio
+
+import numpy as np
+
+from src.api.micro_batcher import MicroBatcher
+
+
+class SlowModel:
+    """Inferencia simulada: predice la primera feature y anota el tamaño de cada lote."""
+
+    def __init__(self, delay=0.05, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.batches = []
+
+    async def __call__(self, features):
+        self.batches.append(len(features))
+        context = f"lote-{len(self.batches)}"
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ValueError("fallo de inferencia")
+        return features[:, 0] > 0, features[:, 0] * 0.5, context
+
+
+def run(coroutine_fn):
+    async def main():
+        batcher, result = await coroutine_fn()
+        await batcher.stop()
+        return batcher, result
+    return asyncio.run(main())
+
+
+def test_lone_request_is_dispatched_without_waiting():
+    model = SlowModel(delay=0.0)
+
+    async def scenario():
+        batcher = MicroBatcher(model, max_batch_size=64, max_wait_ms=200.0)
+        results = [await batcher.submit(np.array([float(i), 0.0])) for i in range(1, 4)]
+        return batcher, results
+
+    batcher, results = run(scenario)
+    assert model.batches == [1, 1, 1]
+    assert [probability for _, probability, _ in results] == [0.5, 1.0, 1.5]
+    # La ventana de 200 ms no se aplica a peticiones que llegan de una en una
+    assert batcher.stats()["added_latency_ms"]["max"] < 50.0
+
+
+def test_concurrent_requests_are_coalesced_and_get_their_own_row():
+    model = SlowModel(delay=0.05)
+
+    async def scenario():
+        batcher = MicroBatcher(model, max_batch_size=64, max_wait_ms=20.0)
+        first = asyncio.ensure_future(batcher.submit(np.array([-1.0, 0.0])))
+        await asyncio.sleep(0.01)
+        # Llegan mientras el primer lote está en inferencia: se agrupan en uno
+        rows = [np.array([float(i), 0.0]) for i in range(1, 21)]
+        results = await asyncio.gather(*(batcher.submit(row) for row in rows))
+        return batcher, (await first, results)
+
+    batcher, (first, results) = run(scenario)
+    assert model.batches == [1, 20]
+    assert first == (False, -0.5, "lote-1")
+    for i, (prediction, probability, context) in enumerate(results, start=1):
+        assert prediction and probability == i * 0.5 and context == "lote-2"
+    stats = batcher.stats()
+    assert stats["batches"] == 2 and stats["rows"] == 21
+    assert stats["batch_size_buckets"]["1"] == 1 and stats["batch_size_buckets"]["32"] == 2
+
+
+def test_full_batch_is_dispatched_before_the_window_closes():
+    model = SlowModel(delay=0.05)
+
+    async def scenario():
+        batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=5000.0)
+        first = asyncio.ensure_future(batcher.submit(np.array([1.0, 0.0])))
+        await asyncio.sleep(0.01)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(np.array([1.0, 0.0])) for _ in range(16))), timeout=2.0
+        )
+        await first
+        return batcher, results
+
+    batcher, results = run(scenario)
+    assert len(results) == 16
+    assert model.batches == [1, 8, 8]
+
+
+def test_inference_error_reaches_every_row_of_the_batch():
+    model = SlowModel(delay=0.0, fail=True)
+
+    async def scenario():
+        batcher = MicroBatcher(model, max_batch_size=64, max_wait_ms=5.0)
+        results = await asyncio.gather(
+            *(batcher.submit(np.array([1.0, 0.0])) for _ in range(3)), return_exceptions=True
+        )
+        return batcher, results
+
+    _, results = run(scenario)
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_stop_waits_for_in_flight_batches():
+    model = SlowModel(delay=0.05)
+
+    async def scenario():
+        batcher = MicroBatcher(model, max_batch_size=64, max_wait_ms=5.0)
+        pending = asyncio.ensure_future(batcher.submit(np.array([2.0, 0.0])))
+        await asyncio.sleep(0.01)
+        await batcher.stop()
+        return batcher, pending.result()
+
+    _, result = asyncio.run(scenario())
+    assert result == (True, 1.0, "lote-1")
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils import model_downloader
+from src.utils.model_downloader import ChecksumMismatchError, download_model
+
+# El fixture no_backoff sustituye time.sleep (módulo compartido); el servidor usa el original
+real_sleep = time.sleep
+
+
+class ModelServer:
+    """Servidor HTTP local con soporte de Range e If-Range (ETag fuerte)."""
+
+    def __init__(self, body, etag='"v1"'):
+        self.body = body
+        self.etag = etag
+        self.cut_after = None
+        self.delay = 0.0
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                byte_range = self.headers.get("Range")
+                if_range = self.headers.get("If-Range")
+                server.requests.append({"range": byte_range, "if_range": if_range})
+                real_sleep(server.delay)
+                body = server.body
+                if byte_range and (if_range is None or if_range == server.etag):
+                    start = int(byte_range.split("=")[1].rstrip("-"))
+                    if start >= len(body):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(body)}")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    data = body[start:]
+                else:
+                    self.send_response(200)
+                    data = body
+                self.send_header("ETag", server.etag)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                if server.cut_after is not None:
+                    # Corta la conexión a mitad de respuesta una sola vez
+                    self.wfile.write(data[:server.cut_after])
+                    server.cut_after = None
+                    self.wfile.flush()
+                    self.connection.close()
+                    return
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/model.pkl"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = ModelServer(b"A" * 5000)
+    yield server
+    server.close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(model_downloader.time, "sleep", lambda seconds: None)
+
+
+def sha256_of(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_interrupted_download_resumes_with_if_range(server, tmp_path):
+    dest = tmp_path / "model.pkl"
+    server.cut_after = 2000
+
+    digest = download_model(server.url, str(dest), size=5000, chunk_size=500)
+
+    assert dest.read_bytes() == server.body
+    assert digest == sha256_of(server.body)
+    resumed = server.requests[-1]
+    assert resumed == {"range": "bytes=2000-", "if_range": '"v1"'}
+    assert not (tmp_path / "model.pkl.part").exists()
+
+
+def test_changed_validator_restarts_from_zero(server, tmp_path):
+    dest = tmp_path / "model.pkl"
+    # Parte de una versión anterior del modelo
+    (tmp_path / "model.pkl.part").write_bytes(b"A" * 3000)
+    (tmp_path / "model.pkl.part.validator.json").write_text(
+        json.dumps({"url": server.url, "etag": '"v1"', "last_modified": None})
+    )
+    server.body, server.etag = b"B" * 6000, '"v2"'
+
+    download_model(server.url, str(dest))
+
+    assert dest.read_bytes() == b"B" * 6000
+    assert server.requests[0]["if_range"] == '"v1"'
+
+
+def test_part_without_validator_is_not_resumed(server, tmp_path):
+    dest = tmp_path / "model.pkl"
+    (tmp_path / "model.pkl.part").write_bytes(b"Z" * 100)
+
+    download_model(server.url, str(dest))
+
+    assert dest.read_bytes() == server.body
+    assert server.requests[0]["range"] is None
+
+
+def test_sha256_mismatch_is_rejected_and_nothing_published(server, tmp_path):
+    dest = tmp_path / "model.pkl"
+
+    with pytest.raises(ChecksumMismatchError):
+        download_model(server.url, str(dest), sha256=sha256_of(b"otro modelo"))
+
+    assert not dest.exists()
+    assert not (tmp_path / "model.pkl.part").exists()
+
+
+def test_matching_sha256_is_served_from_content_cache(server, tmp_path):
+    dest = tmp_path / "model.pkl"
+    cache_dir = tmp_path / "cache"
+    digest = sha256_of(server.body)
+    download_model(server.url, str(dest), sha256=digest, cache_dir=str(cache_dir))
+    dest.unlink()
+    n_requests = len(server.requests)
+
+    assert download_model(server.url, str(dest), sha256=digest, cache_dir=str(cache_dir)) == digest
+    assert dest.read_bytes() == server.body
+    assert len(server.requests) == n_requests
+
+
+def test_concurrent_downloads_share_one_part_file(server, tmp_path):
+    dest = tmp_path / "model.pkl"
+    server.body = bytes(range(256)) * 4000
+    # Respuesta lenta: todos los workers piden el modelo antes de que se publique
+    server.delay = 0.3
+    results, errors = [], []
+    barrier = threading.Barrier(4)
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(download_model(server.url, str(dest), chunk_size=4096))
+        except Exception as e:  # pragma: no cover - se comprueba abajo
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert dest.read_bytes() == server.body
+    assert set(results) == {sha256_of(server.body)}
+    # Solo el primero descarga; el resto reutiliza el archivo publicado
+    assert len(server.requests) == 1
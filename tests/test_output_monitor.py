@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from src.api.models import FEATURE_NAMES
+from src.monitoring.output_monitor import OutputMonitor, load_output_reference
+from src.monitoring.reference_builder import build_output_reference, split_dataset
+
+
+def training_frame(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(n, len(FEATURE_NAMES))), columns=FEATURE_NAMES)
+    df["Class"] = (df["V14"] + rng.normal(scale=0.5, size=n) < -1.5).astype(int)
+    return df
+
+
+def test_without_reference_status_is_no_reference():
+    monitor = OutputMonitor(min_samples=10)
+    monitor.record_batch(np.zeros(50, dtype=int), np.full(50, 0.05))
+    result = monitor.report()["all"]
+    assert result["status"] == "no_reference"
+    assert result["fraud_rate"] == 0.0
+    assert "psi" not in result and "drifting" not in result
+
+
+def test_reference_built_from_validation_predictions(tmp_path):
+    df = training_frame()
+    X_train, X_val, y_train, _ = split_dataset(df)
+    assert len(X_val) == 400
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(X_train, y_train)
+
+    path = tmp_path / "output_reference.json"
+    reference = build_output_reference(model, X_val, str(path))
+    assert reference == load_output_reference(str(path))
+    assert reference["count"] == len(X_val)
+    assert sum(reference["probability"]["histogram"]) == len(X_val)
+
+    # Las mismas predicciones no se desvían de la referencia
+    monitor = OutputMonitor(reference=reference, min_samples=10)
+    monitor.record_batch(model.predict(X_val), model.predict_proba(X_val)[:, 1])
+    result = monitor.report()["all"]
+    assert result["status"] == "normal"
+    assert result["psi"] < 1e-6
+    assert abs(result["fraud_rate_z"]) < 1e-9
+
+    # Un modelo que marca todo como fraude sí se desvía
+    monitor.record_batch(np.ones(400, dtype=int), np.full(400, 0.95))
+    assert monitor.report()["all"]["status"] == "drift_detected"
@@ -0,0 +1,143 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.api import prediction_cache as cache_module
+from src.api.models import FEATURE_NAMES
+from src.api.prediction_cache import PredictionCache
+from src.models.serving_model import ServingModel
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+class CountingModel:
+    """Modelo simulado: probabilidad creciente con la primera feature; cuenta las llamadas."""
+
+    n_features_in_ = len(FEATURE_NAMES)
+    classes_ = np.array([0, 1])
+
+    def __init__(self, shift=0.0):
+        self.shift = shift
+        self.calls = 0
+
+    def predict_proba(self, features):
+        self.calls += 1
+        p = 1.0 / (1.0 + np.exp(-(features[:, 0] + self.shift)))
+        return np.column_stack([1.0 - p, p])
+
+
+def row(*values):
+    return np.array(values + (0.0,) * (len(FEATURE_NAMES) - len(values)), dtype=np.float64)
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = PredictionCache(maxsize=2, ttl=10.0)
+    a, b, c = (cache.make_key(row(float(i)), "v1") for i in range(3))
+    cache.put(a, "a")
+    cache.put(b, "b")
+    # Leer "a" la convierte en la más reciente: se desaloja "b"
+    assert cache.get(a) == "a"
+    cache.put(c, "c")
+    assert cache.get(b) is None
+    assert cache.get(a) == "a"
+    assert cache.get(c) == "c"
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3 and stats["misses"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = PredictionCache(maxsize=10, ttl=5.0)
+    key = cache.make_key(row(1.0), "v1")
+    cache.put(key, "resultado")
+    clock.now += 4.9
+    assert cache.get(key) == "resultado"
+    clock.now += 0.2
+    assert cache.get(key) is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["size"] == 0
+
+
+def test_key_includes_model_version():
+    cache = PredictionCache()
+    cache.put(cache.make_key(row(1.0), "v1"), "v1")
+    assert cache.get(cache.make_key(row(1.0), "v2")) is None
+
+
+def test_quantized_keys_match_nearby_rows():
+    exact = PredictionCache()
+    assert exact.make_key(row(0.1234), "v1") != exact.make_key(row(0.1231), "v1")
+    quantized = PredictionCache(decimals=2)
+    assert quantized.make_key(row(0.1234), "v1") == quantized.make_key(row(0.1231), "v1")
+    # -0.0 y 0.0 comparten clave tras el redondeo
+    assert quantized.make_key(row(-0.001), "v1") == quantized.make_key(row(0.0), "v1")
+
+
+def test_clear_counts_invalidation():
+    cache = PredictionCache()
+    cache.put(cache.make_key(row(1.0), "v1"), "a")
+    cache.clear()
+    assert cache.stats()["size"] == 0
+    assert cache.stats()["invalidations"] == 1
+
+
+@pytest.fixture
+def cached_app(api, monkeypatch):
+    """App con caché de predicciones, sin micro-batcher ni detector de drift."""
+    monkeypatch.setattr(api, "prediction_cache", PredictionCache(maxsize=100, ttl=60.0))
+    monkeypatch.setattr(api, "micro_batcher", None)
+    monkeypatch.setattr(api, "drift_detector", None)
+    monkeypatch.setattr(api, "current_model", None)
+    return api
+
+
+def test_retried_transaction_is_served_from_cache(cached_app):
+    from fastapi.testclient import TestClient
+
+    model = CountingModel()
+    cached_app.set_model(ServingModel(model, "v1"))
+    client = TestClient(cached_app.app)
+    body = dict(zip(FEATURE_NAMES, row(0.5).tolist()))
+
+    first = client.post("/predict", json=body).json()
+    second = client.post("/predict", json=body).json()
+
+    assert first == second
+    assert second["model_version"] == "v1"
+    assert model.calls == 1
+    assert cached_app.prediction_cache.stats()["hits"] == 1
+
+
+def test_model_swap_invalidates_cache(cached_app):
+    from fastapi.testclient import TestClient
+
+    cached_app.set_model(ServingModel(CountingModel(), "v1"))
+    client = TestClient(cached_app.app)
+    body = dict(zip(FEATURE_NAMES, row(0.5).tolist()))
+    before = client.post("/predict", json=body).json()
+
+    replacement = CountingModel(shift=3.0)
+    cached_app.set_model(ServingModel(replacement, "v2"))
+    assert cached_app.prediction_cache.stats()["size"] == 0
+    assert cached_app.prediction_cache.stats()["invalidations"] == 1
+
+    after = client.post("/predict", json=body).json()
+    assert after["model_version"] == "v2"
+    assert after["probability"] > before["probability"]
+    assert replacement.calls == 1
@@ -0,0 +1,118 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.api.models import FEATURE_NAMES
+from src.monitoring.quantile_sketch import (
+    HistogramDistribution,
+    KLLSketch,
+    compare_distributions,
+    load_reference_sketches,
+)
+from src.monitoring.reference_builder import build_reference_sketches
+
+# Error de rango admitido para k=128 (el esperado es del orden de 1/k)
+MAX_RANK_ERROR = 0.02
+
+
+@pytest.fixture(autouse=True)
+def seeded():
+    random.seed(0)
+    np.random.seed(0)
+
+
+def rank_error(sketch, values, weights=None):
+    """Máxima diferencia entre la CDF del sketch y la CDF exacta en 99 cuantiles."""
+    order = np.argsort(values)
+    values = values[order]
+    weights = np.ones(len(values)) if weights is None else weights[order]
+    cumulative = np.cumsum(weights) / weights.sum()
+    grid = values[(np.linspace(0.01, 0.99, 99) * (len(values) - 1)).astype(int)]
+    exact = cumulative[np.searchsorted(values, grid, side="right") - 1]
+    return np.abs(sketch.cdf(grid) - exact).max()
+
+
+@pytest.mark.parametrize("distribution", ["normal", "lognormal", "sorted"])
+def test_rank_error_is_bounded(distribution):
+    rng = np.random.default_rng(1)
+    values = {
+        "normal": rng.normal(size=50000),
+        "lognormal": rng.lognormal(sigma=2.0, size=50000),
+        "sorted": np.sort(rng.uniform(size=50000)),
+    }[distribution]
+    sketch = KLLSketch(k=128)
+    sketch.update_many(values)
+    assert len(sketch) == len(values)
+    assert sketch.size < 3 * 128 + 64
+    assert rank_error(sketch, values) < MAX_RANK_ERROR
+
+
+def test_scalar_updates_match_bounded_rank_error():
+    values = np.random.default_rng(2).exponential(size=20000)
+    sketch = KLLSketch(k=128)
+    for value in values.tolist():
+        sketch.update(value)
+    sketch.update(float("nan"))
+    assert len(sketch) == len(values)
+    assert rank_error(sketch, values) < MAX_RANK_ERROR
+
+
+def test_merged_sketches_keep_rank_error_bound():
+    rng = np.random.default_rng(3)
+    parts = [rng.normal(loc=i, size=15000) for i in range(4)]
+    merged = KLLSketch(k=128)
+    for part in parts:
+        sketch = KLLSketch(k=128)
+        sketch.update_many(part)
+        merged.merge(sketch)
+    values = np.concatenate(parts)
+    assert len(merged) == len(values)
+    assert rank_error(merged, values) < MAX_RANK_ERROR
+
+
+def test_weighted_updates_track_weighted_cdf():
+    rng = np.random.default_rng(4)
+    values = rng.normal(size=40000)
+    # Pesos como los de una captura muestreada: 1/tasa, no potencias de dos
+    weights = np.where(values > 0, 1.0, 10.0)
+    sketch = KLLSketch(k=128)
+    sketch.update_many(values, weights=weights)
+    assert rank_error(sketch, values, weights) < MAX_RANK_ERROR
+
+
+def test_serialization_round_trip():
+    sketch = KLLSketch(k=64)
+    sketch.update_many(np.random.default_rng(5).normal(size=5000))
+    for restored in (KLLSketch.from_array(sketch.to_array()), KLLSketch.from_dict(sketch.to_dict())):
+        assert len(restored) == len(sketch)
+        np.testing.assert_array_equal(restored.quantile([0.1, 0.5, 0.9]), sketch.quantile([0.1, 0.5, 0.9]))
+
+
+def test_compare_distributions_flags_binned_reference():
+    values = np.random.default_rng(6).normal(size=20000)
+    current = KLLSketch(k=128)
+    current.update_many(values[:10000])
+    exact = KLLSketch(k=512)
+    exact.update_many(values[10000:])
+    histogram, edges = np.histogram(values[10000:], bins=10)
+
+    from_sketch = compare_distributions(exact, current)
+    from_bins = compare_distributions(HistogramDistribution(edges.tolist(), histogram.tolist()), current)
+    assert from_sketch["reference_exact"] is True
+    assert from_bins["reference_exact"] is False
+    # Misma población: con el sketch no aparece el desplazamiento artificial de los bins en las colas
+    assert from_sketch["ks"] < MAX_RANK_ERROR
+    assert abs(from_sketch["quantile_shifts"]["p01"]) < abs(from_bins["quantile_shifts"]["p01"])
+
+
+def test_reference_builder_writes_loadable_sketches(tmp_path):
+    X_train = np.random.default_rng(7).normal(size=(5000, len(FEATURE_NAMES)))
+    path = tmp_path / "reference_sketches.json"
+    built = build_reference_sketches(X_train, str(path), k=256)
+    loaded = load_reference_sketches(str(path))
+    assert list(loaded) == FEATURE_NAMES
+    for f, feature in enumerate(FEATURE_NAMES):
+        assert len(loaded[feature]) == len(X_train)
+        np.testing.assert_array_equal(loaded[feature].quantile([0.5]), built[feature].quantile([0.5]))
+        assert rank_error(loaded[feature], X_train[:, f]) < MAX_RANK_ERROR
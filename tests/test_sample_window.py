@@ -0,0 +1,68 @@
+import numpy as np
+
+from src.monitoring.sample_window import SampleWindow
+
+EDGES = [np.linspace(-2.0, 2.0, 9), np.array([0.0, 1.0, 5.0, 10.0])]
+
+
+def expected_histograms(window):
+    return [np.histogram(window.column(name), bins=edges)[0] for name, edges in zip(window.feature_names, EDGES)]
+
+
+def assert_matches_np_histogram(window):
+    for name, expected in zip(window.feature_names, expected_histograms(window)):
+        np.testing.assert_array_equal(window.histogram(name), expected)
+
+
+def sample_rows(rng, n):
+    rows = np.column_stack([rng.normal(scale=1.5, size=n), rng.uniform(-1.0, 11.0, size=n)])
+    # Valores sobre los bordes (incluido el último, cerrado), fuera de rango y NaN
+    rows[::7, 0] = rng.choice(EDGES[0], size=len(rows[::7]))
+    rows[::5, 1] = rng.choice(EDGES[1], size=len(rows[::5]))
+    rows[::11, 0] = np.nan
+    return rows
+
+
+def test_append_keeps_histogram_equal_to_np_histogram():
+    rng = np.random.default_rng(0)
+    window = SampleWindow(["a", "b"], capacity=50, bin_edges=EDGES)
+    for i, row in enumerate(sample_rows(rng, 180)):
+        window.append(row)
+        if i % 17 == 0:
+            assert_matches_np_histogram(window)
+    assert_matches_np_histogram(window)
+
+
+def test_extend_keeps_histogram_equal_to_np_histogram():
+    rng = np.random.default_rng(1)
+    window = SampleWindow(["a", "b"], capacity=64, bin_edges=EDGES)
+    # Lotes menores que la ventana, que dan la vuelta y mayores que la capacidad
+    for n in (10, 30, 40, 1, 63, 200, 5):
+        window.extend(sample_rows(rng, n))
+        assert_matches_np_histogram(window)
+
+
+def test_mixed_append_extend_and_clear():
+    rng = np.random.default_rng(2)
+    window = SampleWindow(["a", "b"], capacity=32, bin_edges=EDGES)
+    for _ in range(20):
+        if rng.random() < 0.5:
+            window.append(sample_rows(rng, 1)[0])
+        else:
+            window.extend(sample_rows(rng, int(rng.integers(1, 40))))
+        assert_matches_np_histogram(window)
+    window.clear()
+    assert_matches_np_histogram(window)
+    window.extend(sample_rows(rng, 20))
+    assert_matches_np_histogram(window)
+
+
+def test_weighted_histogram_matches_weighted_np_histogram():
+    rng = np.random.default_rng(3)
+    window = SampleWindow(["a", "b"], capacity=40, bin_edges=EDGES)
+    for n in (15, 30, 12):
+        window.extend(sample_rows(rng, n), weights=rng.uniform(1.0, 10.0, size=n))
+    retained = window.columns[0, :len(window)]
+    present = ~np.isnan(retained)
+    expected = np.histogram(retained[present], bins=EDGES[0], weights=window.weights[:len(window)][present])[0]
+    np.testing.assert_allclose(window.histogram("a"), expected)
@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from src.models.shared_model import load_mmap_forest
+from src.utils import memory_report
+
+
+@pytest.fixture(scope="module")
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 5))
+    y = (X[:, 0] - X[:, 2] > 0).astype(int)
+    return RandomForestClassifier(n_estimators=8, max_depth=6, random_state=0).fit(X, y)
+
+
+@pytest.fixture
+def paths(tmp_path):
+    model_path = tmp_path / "model.pkl"
+    model_path.write_bytes(b"pickle v1")
+    return str(model_path), str(tmp_path / "model_flat")
+
+
+class Loader:
+    """Cargador simulado del pickle que cuenta sus llamadas."""
+
+    def __init__(self, model):
+        self.model = model
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.model
+
+
+def test_cache_is_compiled_once_and_memory_mapped(forest, paths):
+    model_path, cache_dir = paths
+    loader = Loader(forest)
+    first = load_mmap_forest(model_path, cache_dir, loader)
+    second = load_mmap_forest(model_path, cache_dir, loader)
+
+    assert loader.calls == 1
+    # Vistas sobre los archivos mapeados, sin copia en la memoria del proceso
+    for name in ("feature", "threshold", "children", "leaf_values", "missing_left"):
+        array = getattr(second, name)
+        assert not array.flags.owndata and isinstance(array.base, np.memmap)
+    X = np.random.default_rng(1).normal(size=(200, 5))
+    np.testing.assert_array_equal(first.predict_proba(X), forest.predict_proba(X))
+    np.testing.assert_array_equal(second.predict_proba(X), forest.predict_proba(X))
+
+
+def test_changed_pickle_rebuilds_cache(forest, paths):
+    model_path, cache_dir = paths
+    load_mmap_forest(model_path, cache_dir, Loader(forest))
+
+    rng = np.random.default_rng(2)
+    X = rng.normal(size=(400, 5))
+    retrained = RandomForestClassifier(n_estimators=4, random_state=1).fit(X, (X[:, 1] > 0).astype(int))
+    with open(model_path, "wb") as f:
+        f.write(b"pickle v2 con otro tamano")
+    loader = Loader(retrained)
+    flat = load_mmap_forest(model_path, cache_dir, loader)
+
+    assert loader.calls == 1
+    assert flat.n_estimators == 4
+    np.testing.assert_array_equal(flat.predict_proba(X), retrained.predict_proba(X))
+
+
+def test_missing_pickle_uses_existing_cache(forest, paths):
+    model_path, cache_dir = paths
+    load_mmap_forest(model_path, cache_dir, Loader(forest))
+    os.remove(model_path)
+    loader = Loader(forest)
+    assert load_mmap_forest(model_path, cache_dir, loader) is not None
+    assert loader.calls == 0
+
+
+def test_failed_load_returns_none(paths):
+    model_path, cache_dir = paths
+    assert load_mmap_forest(model_path, cache_dir, Loader(None)) is None
+    assert not os.path.exists(cache_dir)
+
+
+def _load_in_worker(model_path, cache_dir, forest, counter_path, queue):
+    def loader():
+        with open(counter_path, "a") as f:
+            f.write("x")
+        # Compilación lenta: los demás workers llegan mientras tanto
+        time.sleep(0.3)
+        return forest
+
+    flat = load_mmap_forest(model_path, cache_dir, loader)
+    X = np.random.default_rng(3).normal(size=(50, 5))
+    queue.put(flat.predict_proba(X).tolist() if flat is not None else None)
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="requiere fork")
+def test_concurrent_workers_compile_once(forest, paths, tmp_path):
+    model_path, cache_dir = paths
+    counter_path = str(tmp_path / "loads")
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    workers = [
+        context.Process(target=_load_in_worker, args=(model_path, cache_dir, forest, counter_path, queue))
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    results = [queue.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=10)
+
+    with open(counter_path) as f:
+        assert f.read() == "x"
+    expected = forest.predict_proba(np.random.default_rng(3).normal(size=(50, 5))).tolist()
+    assert all(result == expected for result in results)
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="requiere /proc/<pid>/smaps_rollup")
+def test_process_memory_reads_smaps_rollup():
+    memory = memory_report.process_memory()
+    assert memory["pid"] == os.getpid()
+    assert memory["rss_mb"] > 0
+    # PSS reparte las páginas compartidas: nunca supera al RSS
+    assert 0 < memory["pss_mb"] <= memory["rss_mb"]
+
+
+def test_report_outside_gunicorn_covers_only_this_process(monkeypatch):
+    monkeypatch.setattr(memory_report, "_is_gunicorn_master", lambda pid: False)
+    assert memory_report.sibling_workers() == [os.getpid()]
+
+
+def test_report_sums_sibling_workers(monkeypatch):
+    figures = {11: {"pid": 11, "rss_mb": 150.0, "pss_mb": 50.0}, 12: {"pid": 12, "rss_mb": 140.0, "pss_mb": 45.5}}
+    monkeypatch.setattr(memory_report, "sibling_workers", lambda: [11, 12])
+    monkeypatch.setattr(memory_report, "process_memory", lambda pid=None: figures.get(pid, {"pid": pid}))
+    report = memory_report.workers_memory_report()
+    assert report["workers"] == [figures[11], figures[12]]
+    assert report["total_rss_mb"] == 290.0
+    assert report["total_pss_mb"] == 95.5
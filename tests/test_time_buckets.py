@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from src.monitoring.time_buckets import TimeBucketedHistogram, parse_duration, parse_windows
+
+SHAPE = (2, 4)
+T0_NS = 1_800_000_000 * 10 ** 9
+SECOND = 10 ** 9
+
+
+def random_samples(rng, n, span_s):
+    """Muestras con bins aleatorios (-1 = fuera de rango) y marcas de tiempo ordenadas."""
+    bins = rng.integers(-1, SHAPE[1], size=(n, SHAPE[0]))
+    offsets = np.sort(rng.uniform(0, span_s, size=n))
+    return bins, (T0_NS + offsets * SECOND).astype(np.int64), rng.uniform(1.0, 5.0, size=n)
+
+
+def brute_force(bins, timestamps, weights, mask, decay=None):
+    counts = np.zeros(SHAPE)
+    factors = np.ones(len(bins)) if decay is None else decay
+    for row, weight, factor, keep in zip(bins, weights, factors, mask):
+        if keep:
+            for f, index in enumerate(row):
+                if index >= 0:
+                    counts[f, index] += weight * factor
+    return counts
+
+
+def test_windows_match_brute_force_by_bucket():
+    rng = np.random.default_rng(0)
+    histogram = TimeBucketedHistogram(SHAPE, bucket_seconds=60, retention_seconds=3600)
+    bins, timestamps, weights = random_samples(rng, 3000, span_s=2 * 3600)
+    for row, ts, weight in zip(bins, timestamps, weights):
+        histogram.add_sample(row, ts, weight=weight)
+
+    now_ns = int(timestamps[-1])
+    current = now_ns // SECOND // 60
+    buckets = timestamps // SECOND // 60
+    for seconds in (60, 900, 3600):
+        n = seconds // 60
+        mask = (buckets > current - n) & (buckets <= current)
+        counts, n_samples = histogram.window(seconds, now_ns)
+        np.testing.assert_allclose(counts, brute_force(bins, timestamps, weights, mask))
+        assert n_samples == mask.sum()
+
+
+def test_old_buckets_are_reused_and_late_samples_ignored():
+    # Retención de 5 minutos: anillo de 6 intervalos
+    histogram = TimeBucketedHistogram(SHAPE, bucket_seconds=60, retention_seconds=300)
+    histogram.add_sample([0, 1], T0_NS)
+    # Seis minutos después se reutiliza el hueco del primer minuto
+    now_ns = T0_NS + 360 * SECOND
+    histogram.add_sample([2, 3], now_ns)
+    counts, n_samples = histogram.window(86400, now_ns)
+    assert n_samples == 1
+    assert counts[0, 0] == 0 and counts[0, 2] == 1
+    # Una muestra más antigua que la retención no pisa el intervalo vigente
+    histogram.add_sample([1, 1], T0_NS)
+    assert histogram.window(86400, now_ns)[1] == 1
+
+
+def test_decayed_counts_halve_every_half_life():
+    histogram = TimeBucketedHistogram(SHAPE, half_life=600.0)
+    histogram.add_sample([1, 2], T0_NS, weight=4.0)
+    counts, n_samples = histogram.decayed(T0_NS + 600 * SECOND)
+    assert counts[0, 1] == pytest.approx(2.0)
+    assert n_samples == pytest.approx(0.5)
+    assert histogram.decayed(T0_NS + 1800 * SECOND)[0][1, 2] == pytest.approx(0.5)
+
+
+def test_decayed_counts_match_brute_force_across_rescaling():
+    rng = np.random.default_rng(1)
+    half_life = 60.0
+    histogram = TimeBucketedHistogram(SHAPE, bucket_seconds=60, retention_seconds=600, half_life=half_life)
+    # Más de 60 semividas: obliga a reescalar el origen de los pesos
+    bins, timestamps, weights = random_samples(rng, 2000, span_s=200 * half_life)
+    for row, ts, weight in zip(bins, timestamps, weights):
+        histogram.add_sample(row, ts, weight=weight)
+
+    now_ns = int(timestamps[-1]) + 30 * SECOND
+    decay = 2.0 ** (-(now_ns - timestamps) / SECOND / half_life)
+    counts, n_samples = histogram.decayed(now_ns)
+    expected = brute_force(bins, timestamps, weights, np.ones(len(bins), dtype=bool), decay)
+    np.testing.assert_allclose(counts, expected, rtol=1e-7)
+    assert n_samples == pytest.approx(decay.sum(), rel=1e-7)
+
+
+def test_add_counts_matches_individual_samples():
+    rng = np.random.default_rng(2)
+    bins = rng.integers(0, SHAPE[1], size=(50, SHAPE[0]))
+    one_by_one = TimeBucketedHistogram(SHAPE)
+    batched = TimeBucketedHistogram(SHAPE)
+    counts = np.zeros(SHAPE)
+    for row in bins:
+        one_by_one.add_sample(row, T0_NS)
+        counts[np.arange(SHAPE[0]), row] += 1
+    batched.add_counts(counts, len(bins), T0_NS)
+
+    now_ns = T0_NS + 120 * SECOND
+    for label, (expected, n_expected) in one_by_one.snapshot({"15m": 900}, now_ns).items():
+        actual, n_actual = batched.snapshot({"15m": 900}, now_ns)[label]
+        np.testing.assert_allclose(actual, expected)
+        assert n_actual == pytest.approx(n_expected)
+
+
+def test_clear_resets_windows_and_decay():
+    histogram = TimeBucketedHistogram(SHAPE)
+    histogram.add_sample([0, 0], T0_NS)
+    histogram.clear()
+    assert histogram.window(900, T0_NS)[1] == 0
+    assert histogram.decayed(T0_NS)[1] == 0.0
+
+
+def test_parse_windows():
+    assert parse_duration("90s") == 90 and parse_duration("1.5h") == 5400 and parse_duration("120") == 120
+    assert parse_windows(" 15m, 1h,,7d,nope ") == {"15m": 900, "1h": 3600, "7d": 7 * 86400}
+    assert parse_windows(None) == {}